@@ -33,6 +33,7 @@ function App() {
   });
 
   const [connected, setConnected] = useState(false);
+  const [socket, setSocket] = useState(null);
   const [selectedVehicleId, setSelectedVehicleId] = useState('UAV1');
 
   useEffect(() => {
@@ -40,6 +41,7 @@ function App() {
       transports: ['websocket'],
       reconnection: true
     });
+    setSocket(socket);
 
     socket.on('connect', () => {
       console.log('Connected to GCS Backend');
@@ -74,7 +76,7 @@ function App() {
         vehicles={vehicles}
       >
         <Routes>
-          <Route path="/" element={<Dashboard vehicles={vehicles} selectedVehicleId={selectedVehicleId} />} />
+          <Route path="/" element={<Dashboard vehicles={vehicles} selectedVehicleId={selectedVehicleId} socket={socket} />} />
           <Route path="/map" element={<MapPage vehicles={vehicles} />} />
           <Route path="/performance" element={<PerformancePage />} />
           <Route path="/system" element={<SystemPage />} />
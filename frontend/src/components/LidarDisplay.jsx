@@ -1,44 +1,42 @@
 import React, { useEffect, useRef, useState } from 'react';
 
-export default function LidarDisplay() {
+// Binary frame header '<B3xIIIdff' (32 bytes), followed by interleaved float32 (x, y) in meters
+const HEADER_SIZE = 32;
+
+export default function LidarDisplay({ socket }) {
     const canvasRef = useRef(null);
     const [stats, setStats] = useState({ count: 0, min: 0, max: 0 });
     const [connected, setConnected] = useState(false);
 
     // Lidar settings matches legacy overview.js
-    const WS_URL = 'ws://172.20.10.10:8765';
     const SCALE = 15; // px/m
 
     useEffect(() => {
         const canvas = canvasRef.current;
-        if (!canvas) return;
+        if (!canvas || !socket) return;
         const ctx = canvas.getContext('2d');
-        let ws = null;
         let animationFrameId;
 
-        const connect = () => {
-            console.log('[LIDAR] Connecting to', WS_URL);
-            ws = new WebSocket(WS_URL);
-
-            ws.onopen = () => setConnected(true);
-            ws.onclose = () => {
-                setConnected(false);
-                setTimeout(connect, 5000);
-            };
-            ws.onerror = (e) => console.error('[LIDAR] Error:', e);
-            ws.onmessage = (event) => {
-                try {
-                    const data = JSON.parse(event.data);
-                    if (data.type !== 'status' && data.type !== 'error') {
-                        drawLidar(data);
-                    }
-                } catch (e) {
-                    // console.error(e);
-                }
-            };
+        // The GCS backend holds the single upstream connection to the Pi and
+        // pushes decimated, rate-limited frames to the 'lidar' room.
+        // Reuse App's socket; subscribe again after every reconnect.
+        const handleConnect = () => {
+            setConnected(true);
+            socket.emit('lidar_subscribe');
+        };
+        const handleDisconnect = () => setConnected(false);
+        const handleScan = (buffer) => {
+            if (buffer instanceof ArrayBuffer) {
+                drawLidar(buffer);
+            }
         };
 
-        const drawLidar = (data) => {
+        socket.on('connect', handleConnect);
+        socket.on('disconnect', handleDisconnect);
+        socket.on('lidar_scan', handleScan);
+        if (socket.connected) handleConnect();
+
+        const drawLidar = (buffer) => {
             if (!ctx || !canvas) return;
 
             // Clear
@@ -67,50 +65,37 @@ export default function LidarDisplay() {
             ctx.lineTo(cx, canvas.height);
             ctx.stroke();
 
-            // Points
-            const ranges = data.ranges || data.data || [];
-            const angleMin = data.angle_min || data.angleMin || 0;
-            const angleInc = data.angle_increment || data.angleIncrement || 0;
-            const rangeMax = data.range_max || data.rangeMax || 16.0;
+            // Points (already cartesian in the sensor frame)
+            const view = new DataView(buffer);
+            const count = view.getUint32(8, true);
+            const rawCount = view.getUint32(12, true);
+            const minDist = view.getFloat32(28, true);
+            const points = new Float32Array(buffer, HEADER_SIZE, count * 2);
 
-            let validPoints = 0;
-            let minDist = Infinity;
             let maxDist = 0;
 
             ctx.fillStyle = '#00ff00';
 
-            ranges.forEach((range, i) => {
-                if (!isFinite(range) || range <= 0 || range > rangeMax) return;
-
-                validPoints++;
-                if (range < minDist) minDist = range;
-                if (range > maxDist) maxDist = range;
+            for (let i = 0; i < points.length; i += 2) {
+                const x = points[i];
+                const y = points[i + 1];
 
-                const angle = angleMin + i * angleInc;
-                // Transform polar to cartesian (Legacy: flipY=true, rotationOffset=0)
-                // x = r * cos(theta), y = r * sin(theta)
-                // Screen coords: x screen = cx + x, y screen = cy - y (flipY)
-
-                const x = range * Math.cos(angle);
-                const y = range * Math.sin(angle);
+                const dist = Math.hypot(x, y);
+                if (dist > maxDist) maxDist = dist;
 
                 const sx = cx + x * SCALE;
                 const sy = cy - y * SCALE; // Flip Y for screen coords
 
                 ctx.fillRect(sx, sy, 2, 2);
-            });
-
-            if (minDist === Infinity) minDist = 0;
+            }
 
             setStats({
-                count: validPoints,
-                min: minDist,
+                count: rawCount,
+                min: rawCount > 0 ? minDist : 0,
                 max: maxDist
             });
         };
 
-        connect();
-
         const handleResize = () => {
             canvas.width = canvas.parentElement.clientWidth;
             canvas.height = canvas.parentElement.clientHeight;
@@ -119,11 +104,14 @@ export default function LidarDisplay() {
         handleResize(); // Initial size
 
         return () => {
-            if (ws) ws.close();
+            socket.off('connect', handleConnect);
+            socket.off('disconnect', handleDisconnect);
+            socket.off('lidar_scan', handleScan);
+            if (socket.connected) socket.emit('lidar_unsubscribe');
             window.removeEventListener('resize', handleResize);
             cancelAnimationFrame(animationFrameId);
         };
-    }, []);
+    }, [socket]);
 
     return (
         <div className="flex flex-col h-full bg-black rounded-lg overflow-hidden border border-gray-800">
@@ -4,7 +4,7 @@ import AttitudeIndicator from '../components/AttitudeIndicator';
 import LidarDisplay from '../components/LidarDisplay';
 import clsx from 'clsx';
 
-export default function Dashboard({ vehicles, selectedVehicleId: globalSelectedId }) {
+export default function Dashboard({ vehicles, selectedVehicleId: globalSelectedId, socket }) {
     // State for local selections
     const [selectedAttitudeVehicle, setSelectedAttitudeVehicle] = useState('UAV1');
     const [selectedChartVehicle, setSelectedChartVehicle] = useState('UAV1');
@@ -203,7 +203,7 @@ export default function Dashboard({ vehicles, selectedVehicleId: globalSelectedI
                             <h6 className="text-xs font-bold text-gray-700 m-0"><i className="fas fa-radar"></i> UGV LIDAR 顯示</h6>
                         </div>
                         <div className="p-0 flex-1 bg-black relative">
-                            <LidarDisplay />
+                            <LidarDisplay socket={socket} />
                         </div>
                     </div>
                 </div>
@@ -218,7 +218,7 @@ export default function Dashboard({ vehicles, selectedVehicleId: globalSelectedI
                             </div>
                             <div className="aspect-video bg-black relative flex items-center justify-center group">
                                 <img
-                                    src={`http://172.20.10.${type === 'UAV' ? '5' : '10'}:8000/video_feed`}
+                                    src={`/api/vehicle/${type}1/video?profile=panel`}
                                     className="w-full h-full object-cover"
                                     onError={(e) => { e.target.style.display = 'none'; e.target.nextSibling.style.display = 'flex'; }}
                                     alt={`${type} Stream`}
@@ -4,14 +4,19 @@ UAV × UGV Control Center - Flask 應用主文件
 """
 import os
 import sys
+import json
+import tempfile
+import atexit
 import time
 import logging
 import threading
 import math
+import numpy as np
 import random
 import requests
 from pathlib import Path
-from flask import Flask, render_template, jsonify, request, send_from_directory
+from flask import (Flask, Response, render_template, jsonify, request, send_file, send_from_directory,
+                   stream_with_context)
 
 # 設定日誌
 logging.basicConfig(
@@ -29,6 +34,13 @@ import config
 from mavlink_module.connection import MAVLinkConnection
 from mavlink_module.telemetry import MAVLinkTelemetry
 from mavlink_module.rover_controller import RoverController
+from history_module import (HistoryStore, FlightRecorder, FlightLogReader, ReplayService,
+                            downsample, columns_to_points, DOWNSAMPLE_METHODS,
+                            write_export, memory_chunks, log_chunks, export_available, EXPORT_FORMATS)
+from stream_module import TelemetryBroadcaster, available_encodings
+from raspberry_pi_module import RaspberryPiClient, UDPTelemetryListener, MJPEGRelay, FrameEncoder, MJPEG_MIMETYPE
+from protocol_module import DataType, payload_codec, boot_to_unix
+from lidar_module import LidarRelay, OccupancyGrid, TILE_FORMATS
 
 # 創建 Flask 應用
 app = Flask(
@@ -39,7 +51,7 @@ app = Flask(
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'uav-ugv-control-center-2025')
 
 # 初始化 SocketIO
-from flask_socketio import SocketIO
+from flask_socketio import SocketIO, emit, join_room, leave_room
 # Remove async_mode='threading' so it can auto-detect eventlet/gevent
 socketio = SocketIO(app, cors_allowed_origins="*")
 
@@ -67,6 +79,18 @@ RASPBERRY_PI_PORT = RASPBERRY_PI_UAV_PORT
 RASPBERRY_PI_IMU_URL = RASPBERRY_PI_UAV_IMU_URL
 RASPBERRY_PI_STATUS_URL = RASPBERRY_PI_UAV_STATUS_URL
 
+# 樹莓派 HTTP 客戶端（每台樹莓派一個持久連線池，重用 TCP 連線並統計延遲與失敗次數）
+raspberry_pi_clients = {
+    'UAV1': RaspberryPiClient(f'http://{RASPBERRY_PI_UAV_IP}:{RASPBERRY_PI_UAV_PORT}', 'UAV1'),
+    'UGV1': RaspberryPiClient(f'http://{RASPBERRY_PI_UGV_IP}:{RASPBERRY_PI_UGV_PORT}', 'UGV1')
+}
+
+# 影像中繼（每個鏡頭只開一條到樹莓派的上游連線，所有瀏覽器共用）
+# 各設定檔（thumbnail / panel / full）的幀在共用的工作執行緒池中只編碼一次
+video_encoder = FrameEncoder()
+video_relays = {vehicle_id: MJPEGRelay(client, encoder=video_encoder)
+                for vehicle_id, client in raspberry_pi_clients.items()}
+
 # 載具狀態存儲
 vehicle_states = {
     'UAV1': {
@@ -84,7 +108,7 @@ vehicle_states = {
         'linkHealth': {'heartbeatHz': 20, 'latencyMs': 80, 'packetLossPercent': 1.2, 'linkType': 'UDP'},
         'systemHealth': {'cpu': 35, 'memory': 40, 'temperature': 55},
         'chargeStatus': {'charging': False, 'chargeVoltage': None, 'chargeCurrent': None},
-        'cameraUrl': f'http://{RASPBERRY_PI_UAV_IP}:{RASPBERRY_PI_UAV_PORT}/video_feed',
+        'cameraUrl': '/api/vehicle/UAV1/video',
         'lastChargingState': False
     },
     'UGV1': {
@@ -106,16 +130,27 @@ vehicle_states = {
         'linkHealth': {'heartbeatHz': 20, 'latencyMs': 75, 'packetLossPercent': 0.8, 'linkType': 'Serial'},
         'systemHealth': {'cpu': 30, 'memory': 35, 'temperature': 50},
         'chargeStatus': {'charging': False, 'chargeVoltage': None, 'chargeCurrent': None},
-        'cameraUrl': f'http://{RASPBERRY_PI_UGV_IP}:{RASPBERRY_PI_UGV_PORT}/video_feed',
+        'cameraUrl': '/api/vehicle/UGV1/video',
         'lastChargingState': False
     }
 }
 
-# 歷史數據存儲（用於圖表）
-history_data = {
-    'UAV1': {'attitude': [], 'rc': [], 'motion': [], 'altitude': []},
-    'UGV1': {'attitude': [], 'rc': [], 'motion': [], 'altitude': []}
-}
+# 回放緩衝設定（秒）- 控制保留多少歷史數據用於回放
+playback_buffer_seconds = 300  # 預設5分鐘
+
+# 飛行日誌（DATA_STORE_TYPE = 'file' 時把所有歷史數據點寫入 DATA_STORE_PATH，重新啟動後仍可回放）
+history_recorder = FlightRecorder() if config.DATA_STORE_TYPE == 'file' else None
+if history_recorder is not None:
+    atexit.register(history_recorder.close)
+
+# 日誌回放服務（以稀疏時間索引直接定位到要求的時間範圍）
+replay_service = ReplayService(FlightLogReader()) if history_recorder is not None else None
+
+# 歷史數據存儲（用於圖表）- 每個序列一個環形緩衝區，依回放緩衝時間淘汰舊數據
+history_data = HistoryStore(vehicle_states.keys(), playback_buffer_seconds, recorder=history_recorder)
+
+# 遙測廣播排程器：各數據來源只登記最新狀態，以 TELEMETRY_UPDATE_RATE 合併推送
+telemetry_broadcaster = TelemetryBroadcaster(socketio)
 
 # 訊息中心數據
 messages = []
@@ -134,9 +169,6 @@ companion_start_time = time.time() - (
     random.randint(1, 59)            # 1-59秒
 )
 
-# 回放緩衝設定（秒）- 控制保留多少歷史數據用於回放
-playback_buffer_seconds = 300  # 預設5分鐘
-
 def add_log(vehicle_id, level, message):
     """添加系統日誌"""
     global system_logs
@@ -178,24 +210,110 @@ def init_mavlink():
 
 def fetch_raspberry_pi_imu():
     """從樹莓派獲取 IMU 數據（高頻率更新以獲得流暢的姿態顯示）"""
-    try:
-        response = requests.get(RASPBERRY_PI_IMU_URL, timeout=0.5)  # 縮短超時時間以支持高頻率
-        if response.status_code == 200:
-            return response.json()
-        else:
-            logger.warning(f"樹莓派 IMU API 返回錯誤: {response.status_code}")
-            return None
-    except requests.exceptions.RequestException as e:
-        logger.debug(f"無法連接到樹莓派 IMU API: {e}")
-        return None
-    except Exception as e:
-        logger.error(f"解析樹莓派 IMU 數據錯誤: {e}")
-        return None
+    return raspberry_pi_clients['UAV1'].get_json('imu')
+
+# 心跳包模式編號對應的模式名稱
+HEARTBEAT_MODE_NAMES = {0: 'MANUAL', 2: 'GUIDED', 3: 'AUTO', 5: 'RTL'}
+
+def apply_ingested_sample(vehicle_id, data_type, record, record_history=True):
+    """套用樹莓派主動推送的數據包（由 UDP 接收線程呼叫，收到即更新載具狀態）"""
+    state = vehicle_states.get(vehicle_id)
+    if state is None:
+        return
+
+    current_time = time.time()
+
+    if data_type == DataType.ATTITUDE:
+        # 數據包中的姿態為弧度，狀態使用度數（偏航角 0-359 度）
+        state['attitude'] = {
+            'rollDeg': math.degrees(record.roll),
+            'pitchDeg': math.degrees(record.pitch),
+            'yawDeg': math.degrees(record.yaw) % 360.0
+        }
+        if record_history:
+            history_data.append(vehicle_id, 'attitude', current_time,
+                                state['attitude']['rollDeg'],
+                                state['attitude']['pitchDeg'],
+                                state['attitude']['yawDeg'])
+
+    elif data_type == DataType.GPS:
+        state['position']['lat'] = record.latitude
+        state['position']['lon'] = record.longitude
+        state['position']['altitude'] = record.altitude
+        state['gps'] = {
+            'fix': record.fix_type,
+            'satellites': record.satellites,
+            'hdop': record.hdop / 100.0  # 數據包中為 hdop × 100
+        }
+        if record_history:
+            history_data.append(vehicle_id, 'altitude', current_time,
+                                state['position']['altitude'])
+
+    elif data_type == DataType.HEARTBEAT:
+        state['armed'] = record.armed
+        state['mode'] = HEARTBEAT_MODE_NAMES.get(record.mode, state['mode'])
+
+    state['dataStale'] = False
+    state['lastUpdateTime'] = current_time
+    state['timestamp'] = current_time
+
+    # 登記最新狀態，由廣播排程器推送
+    telemetry_broadcaster.publish(vehicle_id, state)
+
+def apply_ingested_batch(vehicle_id, data_type, records):
+    """
+    套用一批同類型的推送數據（結構化陣列）：整批以向量化方式寫入歷史數據，
+    載具狀態只套用最後一筆
+    """
+    if vehicle_id not in vehicle_states or len(records) == 0:
+        return
+
+    # 以最後一筆對應收到的時間，其餘依載具時間戳推算
+    timestamps = boot_to_unix(records['timestamp'], time.time())
+
+    if data_type == DataType.ATTITUDE:
+        history_data.extend(vehicle_id, 'attitude', timestamps,
+                            np.degrees(records['roll']),
+                            np.degrees(records['pitch']),
+                            np.degrees(records['yaw']) % 360.0)
+    elif data_type == DataType.GPS:
+        history_data.extend(vehicle_id, 'altitude', timestamps, records['altitude'])
+
+    codec = payload_codec(data_type)
+    last = codec.from_values(records[-1].tolist())
+    apply_ingested_sample(vehicle_id, data_type, last, record_history=False)
+
+# 樹莓派推送數據接收器（UAV_INGEST_MODE = 'udp' 時啟動）
+telemetry_listener = UDPTelemetryListener(apply_ingested_sample, on_batch=apply_ingested_batch)
+
+# LIDAR 中繼（只向 UGV 樹莓派開一條 WebSocket，降採樣後以二進位幀推送給訂閱的客戶端）
+lidar_relay = LidarRelay(socketio)
+
+# 佔據柵格地圖（以 UGV 目前的位置與航向融合每圈掃描）
+occupancy_grid = OccupancyGrid()
+
+def integrate_lidar_scan(scan):
+    """把一圈掃描融合進佔據柵格（LIDAR 接收線程呼叫）"""
+    state = vehicle_states['UGV1']
+    # 沒有 GPS 定位時位置不可信，不融合
+    if state['gps'].get('fix', 0) < 2:
+        return
+    occupancy_grid.integrate_geo(scan,
+                                 state['position']['lat'],
+                                 state['position']['lon'],
+                                 state['attitude']['yawDeg'])
+
+if config.LIDAR_GRID_ENABLED:
+    lidar_relay.add_listener(integrate_lidar_scan)
 
 def update_raspberry_pi_data():
     """從樹莓派更新 UAV1 數據 - 使用樹莓派提供的 IMU 數據（新格式）"""
     global vehicle_states, history_data
-    
+
+    # 以固定時間點排程輪詢，請求耗時不會拉長輪詢週期
+    poll_interval = 1.0 / config.RASPBERRY_PI_POLL_RATE
+    next_poll = time.time()
+
     while True:
         try:
             # 從樹莓派獲取 IMU 數據
@@ -236,53 +354,30 @@ def update_raspberry_pi_data():
                 uav_state['lastUpdateTime'] = current_time
                 uav_state['timestamp'] = current_time
                 
-                # 更新歷史數據（用於性能圖表）
-                history = history_data['UAV1']
-                history['attitude'].append({
-                    'timestamp': current_time,
-                    'roll': uav_state['attitude']['rollDeg'],
-                    'pitch': uav_state['attitude']['pitchDeg'],
-                    'yaw': uav_state['attitude']['yawDeg']
-                })
-                history['rc'].append({
-                    'timestamp': current_time,
-                    'throttle': uav_state['rc']['throttle'],
-                    'roll': uav_state['rc']['roll'],
-                    'pitch': uav_state['rc']['pitch'],
-                    'yaw': uav_state['rc']['yaw']
-                })
-                history['motion'].append({
-                    'timestamp': current_time,
-                    'groundSpeed': uav_state['motion']['groundSpeed'],
-                    'throttle': uav_state['rc']['throttle']
-                })
-                
+                # 更新歷史數據（用於性能圖表，超過回放緩衝時間的數據由環形緩衝區自動淘汰）
+                history_data.append('UAV1', 'attitude', current_time,
+                                    uav_state['attitude']['rollDeg'],
+                                    uav_state['attitude']['pitchDeg'],
+                                    uav_state['attitude']['yawDeg'])
+                history_data.append('UAV1', 'rc', current_time,
+                                    uav_state['rc']['throttle'],
+                                    uav_state['rc']['roll'],
+                                    uav_state['rc']['pitch'],
+                                    uav_state['rc']['yaw'])
+                history_data.append('UAV1', 'motion', current_time,
+                                    uav_state['motion']['groundSpeed'],
+                                    uav_state['rc']['throttle'])
+
                 # 高度數據（UAV）- 使用樹莓派提供的高度
-                history['altitude'].append({
-                    'timestamp': current_time,
-                    'altitude': uav_state['position']['altitude']
-                })
-                
-                # 限制歷史數據長度（根據回放緩衝設定保留數據）
-                global playback_buffer_seconds
-                current_time = time.time()
-                cutoff_time = current_time - playback_buffer_seconds
-                
-                # 移除超過緩衝時間的舊數據
-                for key in history:
-                    # 過濾掉超過緩衝時間的數據
-                    history[key] = [d for d in history[key] if d.get('timestamp', 0) >= cutoff_time]
-                    
-                    # 同時限制最大數據點數（防止內存溢出）
-                    if len(history[key]) > 5000:
-                        history[key] = history[key][-5000:]
-                
+                history_data.append('UAV1', 'altitude', current_time,
+                                    uav_state['position']['altitude'])
+
                 # 添加日誌（樹莓派數據更新）
                 if random.random() < 0.01:  # 1% 機率
                     add_log('UAV1', 'info', f'樹莓派 IMU 數據更新: Roll {uav_state["attitude"]["rollDeg"]:.1f}°, Pitch {uav_state["attitude"]["pitchDeg"]:.1f}°, Alt {uav_state["position"]["altitude"]:.1f}m')
                 
-                # 發送 WebSocket 更新 (新增)
-                socketio.emit('telemetry_data', {'vehicleId': 'UAV1', 'state': uav_state})
+                # 登記最新狀態，由廣播排程器推送
+                telemetry_broadcaster.publish('UAV1', uav_state)
                 
             else:
                 # 無法獲取數據，標記為數據過期
@@ -294,7 +389,12 @@ def update_raspberry_pi_data():
             import traceback
             logger.debug(traceback.format_exc())
         
-        socketio.sleep(0.05) # 使用 socketio.sleep 而不是 time.sleep
+        next_poll += poll_interval
+        now = time.time()
+        if next_poll < now:
+            # 落後超過一個週期（例如請求超時）時重新對齊
+            next_poll = now
+        socketio.sleep(next_poll - now) # 使用 socketio.sleep 而不是 time.sleep
 
 def update_ugv_mock_data():
     """更新 UGV1 模擬數據（IMU 等）"""
@@ -328,53 +428,30 @@ def update_ugv_mock_data():
             state['lastUpdateTime'] = current_time
             state['timestamp'] = current_time
             
-            # 更新歷史數據（用於性能圖表）
-            history = history_data['UGV1']
-            history['attitude'].append({
-                'timestamp': current_time,
-                'roll': state['attitude']['rollDeg'],
-                'pitch': state['attitude']['pitchDeg'],
-                'yaw': state['attitude']['yawDeg']
-            })
-            history['rc'].append({
-                'timestamp': current_time,
-                'throttle': state['rc']['throttle'],
-                'roll': state['rc']['roll'],
-                'pitch': state['rc']['pitch'],
-                'yaw': state['rc']['yaw']
-            })
-            history['motion'].append({
-                'timestamp': current_time,
-                'groundSpeed': state['motion']['groundSpeed'],
-                'throttle': state['rc']['throttle']
-            })
-            
+            # 更新歷史數據（用於性能圖表，超過回放緩衝時間的數據由環形緩衝區自動淘汰）
+            history_data.append('UGV1', 'attitude', current_time,
+                                state['attitude']['rollDeg'],
+                                state['attitude']['pitchDeg'],
+                                state['attitude']['yawDeg'])
+            history_data.append('UGV1', 'rc', current_time,
+                                state['rc']['throttle'],
+                                state['rc']['roll'],
+                                state['rc']['pitch'],
+                                state['rc']['yaw'])
+            history_data.append('UGV1', 'motion', current_time,
+                                state['motion']['groundSpeed'],
+                                state['rc']['throttle'])
+
             # 高度數據（UGV 通常為 0）
-            history['altitude'].append({
-                'timestamp': current_time,
-                'altitude': state['position']['altitude']
-            })
-            
-            # 限制歷史數據長度（根據回放緩衝設定保留數據）
-            global playback_buffer_seconds
-            current_time = time.time()
-            cutoff_time = current_time - playback_buffer_seconds
-            
-            # 移除超過緩衝時間的舊數據
-            for key in history:
-                # 過濾掉超過緩衝時間的數據
-                history[key] = [d for d in history[key] if d.get('timestamp', 0) >= cutoff_time]
-                
-                # 同時限制最大數據點數（防止內存溢出）
-                if len(history[key]) > 5000:
-                    history[key] = history[key][-5000:]
-            
+            history_data.append('UGV1', 'altitude', current_time,
+                                state['position']['altitude'])
+
             # 偶爾添加日誌（模擬）
             if random.random() < 0.01:  # 1% 機率
                 add_log('UGV1', 'info', f'模擬數據更新: 速度 {state["motion"]["groundSpeed"]:.2f} m/s')
             
-            # 發送 WebSocket 更新 (新增)
-            socketio.emit('telemetry_data', {'vehicleId': 'UGV1', 'state': state})
+            # 登記最新狀態，由廣播排程器推送
+            telemetry_broadcaster.publish('UGV1', state)
             
             socketio.sleep(0.1)  # 10Hz 更新
         except:
@@ -452,12 +529,11 @@ def get_vehicle_history(vehicle_id):
     # 返回最近30秒的數據
     current_time = time.time()
     cutoff_time = current_time - 30
-    
-    history = history_data[vehicle_id]
+
     filtered_history = {
-        'attitude': [d for d in history['attitude'] if d['timestamp'] >= cutoff_time],
-        'rc': [d for d in history['rc'] if d['timestamp'] >= cutoff_time],
-        'motion': [d for d in history['motion'] if d['timestamp'] >= cutoff_time]
+        'attitude': history_data.window(vehicle_id, 'attitude', cutoff_time),
+        'rc': history_data.window(vehicle_id, 'rc', cutoff_time),
+        'motion': history_data.window(vehicle_id, 'motion', cutoff_time)
     }
     
     return jsonify({
@@ -467,22 +543,44 @@ def get_vehicle_history(vehicle_id):
 
 @app.route('/api/vehicle/<vehicle_id>/history/full')
 def get_vehicle_history_full(vehicle_id):
-    """獲取載具的完整歷史數據（用於回放）"""
+    """
+    獲取載具的完整歷史數據（用於回放）
+
+    查詢參數:
+        from / to: 時間範圍（Unix 秒），預設為整個回放緩衝
+        maxPoints: 每個序列的最大回傳點數，超過時在伺服器端降採樣
+        method: 降採樣方法，'lttb'（預設）或 'minmax'
+    """
     if vehicle_id not in history_data:
         return jsonify({
             'success': False,
             'error': f'Vehicle {vehicle_id} not found'
         }), 404
-    
-    history = history_data[vehicle_id]
-    
+
+    try:
+        start_param = request.args.get('from')
+        end_param = request.args.get('to')
+        max_points_param = request.args.get('maxPoints')
+        start_param = float(start_param) if start_param is not None else None
+        end_param = float(end_param) if end_param is not None else None
+        max_points = int(max_points_param) if max_points_param is not None else None
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'from/to 必須為數字，maxPoints 必須為整數'
+        }), 400
+
+    method = request.args.get('method', 'lttb')
+    if method not in DOWNSAMPLE_METHODS or (max_points is not None and max_points < 3):
+        return jsonify({
+            'success': False,
+            'error': f'無效的降採樣參數 (method: {DOWNSAMPLE_METHODS}, maxPoints >= 3)'
+        }), 400
+
     # 計算時間範圍
-    all_times = []
-    for key in ['attitude', 'rc', 'motion', 'altitude']:
-        if history[key]:
-            all_times.extend([d['timestamp'] for d in history[key]])
-    
-    if not all_times:
+    time_range = history_data.time_range(vehicle_id)
+
+    if time_range is None:
         return jsonify({
             'success': True,
             'data': {
@@ -495,24 +593,195 @@ def get_vehicle_history_full(vehicle_id):
             'endTime': time.time(),
             'duration': 0
         })
-    
-    start_time = min(all_times)
-    end_time = max(all_times)
-    duration = end_time - start_time
-    
+
+    start_time = max(time_range[0], start_param) if start_param is not None else time_range[0]
+    end_time = min(time_range[1], end_param) if end_param is not None else time_range[1]
+    duration = max(0.0, end_time - start_time)
+
+    if max_points is None:
+        data = history_data.snapshot(vehicle_id, start_param, end_param)
+    else:
+        # 在伺服器端降採樣，回傳點數與序列化時間不隨回放緩衝長度增長
+        data = {}
+        for series in history_data.series:
+            timestamps, columns = history_data.window_arrays(vehicle_id, series, start_param, end_param)
+            timestamps, columns = downsample(timestamps, columns, max_points, method)
+            data[series] = columns_to_points(timestamps, columns)
+
     return jsonify({
         'success': True,
-        'data': {
-            'attitude': history['attitude'],
-            'rc': history['rc'],
-            'motion': history['motion'],
-            'altitude': history['altitude']
-        },
+        'data': data,
         'startTime': start_time,
         'endTime': end_time,
         'duration': duration
     })
 
+def _parse_replay_params(params) -> tuple:
+    """
+    解析日誌回放參數（HTTP 查詢參數與 Socket.IO 事件共用）
+
+    返回:
+        tuple: (序列名稱, 起始時間, 結束時間, 倍速)，參數無效時拋出 ValueError
+    """
+    series = params.get('series', 'attitude')
+    if series not in history_data.series:
+        raise ValueError(f'未知的數據序列: {series} (可用: {list(history_data.series)})')
+
+    try:
+        start_time = float(params['from']) if params.get('from') is not None else None
+        end_time = float(params['to']) if params.get('to') is not None else None
+        speed = float(params['speed']) if params.get('speed') is not None else None
+    except (TypeError, ValueError):
+        raise ValueError('from/to/speed 必須為數字')
+
+    if speed is not None and speed < 0:
+        raise ValueError('speed 不可為負數')
+    return series, start_time, end_time, speed
+
+def _replay_frame(vehicle_id: str, series: str, timestamps, columns) -> dict:
+    return {
+        'vehicleId': vehicle_id,
+        'series': series,
+        'points': columns_to_points(timestamps, columns)
+    }
+
+@app.route('/api/vehicle/<vehicle_id>/replay/range')
+def get_vehicle_replay_range(vehicle_id):
+    """獲取載具飛行日誌的時間範圍與可回放的數據序列"""
+    if vehicle_id not in vehicle_states:
+        return jsonify({
+            'success': False,
+            'error': f'Vehicle {vehicle_id} not found'
+        }), 404
+
+    if replay_service is None:
+        return jsonify({
+            'success': False,
+            'error': '未啟用飛行日誌（DATA_STORE_TYPE=file）'
+        }), 404
+
+    history_recorder.flush()
+    time_range = replay_service.reader.time_range(vehicle_id)
+    return jsonify({
+        'success': True,
+        'series': replay_service.reader.series_names(vehicle_id),
+        'startTime': time_range[0] if time_range else None,
+        'endTime': time_range[1] if time_range else None
+    })
+
+@app.route('/api/vehicle/<vehicle_id>/replay')
+def stream_vehicle_replay(vehicle_id):
+    """
+    以分塊 HTTP 回應串流載具的飛行日誌（NDJSON，每行一個數據幀）
+
+    查詢參數:
+        series: 數據序列（預設 attitude）
+        from / to: 時間範圍（Unix 秒），預設為整個日誌
+        speed: 回放倍速，例如 10 表示 10 倍速；省略或 0 表示盡快返回
+    """
+    if vehicle_id not in vehicle_states:
+        return jsonify({
+            'success': False,
+            'error': f'Vehicle {vehicle_id} not found'
+        }), 404
+
+    if replay_service is None:
+        return jsonify({
+            'success': False,
+            'error': '未啟用飛行日誌（DATA_STORE_TYPE=file）'
+        }), 404
+
+    try:
+        series, start_time, end_time, speed = _parse_replay_params(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    # 讓尚在寫入緩衝區的最新數據也能被回放
+    history_recorder.flush()
+
+    def generate():
+        for timestamps, columns in replay_service.replay(vehicle_id, series, start_time, end_time,
+                                                         speed, sleep=socketio.sleep):
+            frame = _replay_frame(vehicle_id, series, timestamps, columns)
+            yield json.dumps(frame, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # 避免反向代理緩衝整個回應
+    return response
+
+@app.route('/api/vehicle/<vehicle_id>/export')
+def export_vehicle_history(vehicle_id):
+    """
+    匯出載具的歷史數據為列式檔案（下載）
+
+    查詢參數:
+        series: 數據序列（預設 attitude）
+        format: 'parquet'（預設）或 'feather'
+        from / to: 時間範圍（Unix 秒），預設為全部
+        source: 'log'（磁碟上的飛行日誌，啟用時為預設）或 'memory'（回放緩衝中的數據）
+    """
+    if vehicle_id not in vehicle_states:
+        return jsonify({
+            'success': False,
+            'error': f'Vehicle {vehicle_id} not found'
+        }), 404
+
+    if not export_available():
+        return jsonify({
+            'success': False,
+            'error': '匯出需要安裝 pandas 與 pyarrow（pip install pyarrow）'
+        }), 501
+
+    series = request.args.get('series', 'attitude')
+    fmt = request.args.get('format', 'parquet')
+    source = request.args.get('source', 'log' if replay_service is not None else 'memory')
+    if series not in history_data.series or fmt not in EXPORT_FORMATS or source not in ('log', 'memory'):
+        return jsonify({
+            'success': False,
+            'error': f'無效的匯出參數 (series: {list(history_data.series)}, '
+                     f'format: {list(EXPORT_FORMATS)}, source: log/memory)'
+        }), 400
+
+    try:
+        start_time = float(request.args['from']) if request.args.get('from') is not None else None
+        end_time = float(request.args['to']) if request.args.get('to') is not None else None
+    except ValueError:
+        return jsonify({'success': False, 'error': 'from/to 必須為數字'}), 400
+
+    if source == 'log':
+        if replay_service is None:
+            return jsonify({
+                'success': False,
+                'error': '未啟用飛行日誌（DATA_STORE_TYPE=file）'
+            }), 404
+        history_recorder.flush()
+        chunks = log_chunks(replay_service, vehicle_id, series, start_time, end_time)
+    else:
+        chunks = memory_chunks(history_data, vehicle_id, series, start_time, end_time)
+
+    def cooperative(chunks):
+        # 每批之間讓出控制權，匯出長時間記錄時不阻塞其他請求與推送
+        for chunk in chunks:
+            yield chunk
+            socketio.sleep(0)
+
+    # 寫入匿名暫存檔（關閉後自動刪除），記憶體用量只與 row group 大小有關
+    sink = tempfile.TemporaryFile()
+    try:
+        rows = write_export(sink, cooperative(chunks), history_data.series[series], fmt)
+    except Exception as e:
+        sink.close()
+        logger.error(f"匯出歷史數據失敗 ({vehicle_id}/{series}): {e}")
+        return jsonify({'success': False, 'error': f'匯出失敗: {e}'}), 500
+    sink.seek(0)
+
+    extension, mimetype = EXPORT_FORMATS[fmt]
+    response = send_file(sink, mimetype=mimetype, as_attachment=True,
+                         download_name=f'{vehicle_id}_{series}_{int(start_time or time.time())}{extension}')
+    response.headers['X-Export-Rows'] = str(rows)
+    return response
+
 @app.route('/api/messages')
 def get_messages():
     """獲取訊息中心的訊息"""
@@ -570,7 +839,8 @@ def update_system_settings():
             playback_buffer_seconds = 60
         elif playback_buffer_seconds > 3600:
             playback_buffer_seconds = 3600
-    
+        history_data.set_retention(playback_buffer_seconds)
+
     return jsonify({
         'success': True,
         'message': '設定已更新',
@@ -581,7 +851,7 @@ def update_system_settings():
 def get_raspberry_pi_status():
     """獲取樹莓派連接狀態"""
     try:
-        response = requests.get(RASPBERRY_PI_STATUS_URL, timeout=2.0)
+        response = raspberry_pi_clients['UAV1'].request('status', timeout=2.0)
         if response.status_code == 200:
             return jsonify({
                 'success': True,
@@ -601,6 +871,131 @@ def get_raspberry_pi_status():
             'error': str(e)
         }), 503
 
+@app.route('/api/vehicle/<vehicle_id>/video')
+def stream_vehicle_video(vehicle_id):
+    """
+    轉發載具鏡頭的 MJPEG 串流（所有觀看者共用一條上游連線，慢速客戶端只收到最新一幀）
+
+    查詢參數:
+        profile: 影像設定檔 thumbnail / panel / full
+        width: 顯示寬度（像素），未指定 profile 時自動選擇足夠的最小設定檔
+    """
+    relay = video_relays.get(vehicle_id)
+    if relay is None:
+        return jsonify({
+            'success': False,
+            'error': f'Vehicle {vehicle_id} 沒有鏡頭'
+        }), 404
+
+    try:
+        width = int(request.args['width']) if request.args.get('width') is not None else None
+        profile = video_encoder.resolve(request.args.get('profile'), width)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    response = Response(relay.stream(sleep=socketio.sleep, profile=profile), mimetype=MJPEG_MIMETYPE)
+    response.headers['Cache-Control'] = 'no-cache, no-store'
+    response.headers['X-Video-Profile'] = profile
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/vehicle/<vehicle_id>/video/snapshot')
+def get_vehicle_video_snapshot(vehicle_id):
+    """獲取鏡頭的最新一幀 JPEG（僅在中繼有觀看者、上游連線中時可用；profile 同串流）"""
+    relay = video_relays.get(vehicle_id)
+    profile = request.args.get('profile', 'full')
+    frame = relay.latest_frame(profile) if relay is not None else None
+    if frame is None:
+        return jsonify({
+            'success': False,
+            'error': f'Vehicle {vehicle_id} 沒有可用的影像幀'
+        }), 404
+
+    response = Response(frame.jpeg, mimetype='image/jpeg')
+    response.headers['Cache-Control'] = 'no-cache, no-store'
+    return response
+
+@app.route('/api/raspberry-pi/metrics')
+def get_raspberry_pi_metrics():
+    """獲取樹莓派 HTTP 連線統計（各端點延遲與失敗次數、影像中繼的觀看者與丟幀數）"""
+    return jsonify({
+        'success': True,
+        'clients': {vehicle_id: client.get_stats() for vehicle_id, client in raspberry_pi_clients.items()},
+        'ingestMode': config.UAV_INGEST_MODE,
+        'ingest': telemetry_listener.get_stats(),
+        'videoRelays': {vehicle_id: relay.get_stats() for vehicle_id, relay in video_relays.items()},
+        'videoEncoder': video_encoder.get_stats()
+    })
+
+@app.route('/api/lidar/scan')
+def get_lidar_scan():
+    """獲取最新一圈降採樣後的 LIDAR 二進位幀（格式同 lidar_scan 事件）"""
+    frame = lidar_relay.latest_frame()
+    if frame is None:
+        return jsonify({'success': False, 'error': '尚未收到 LIDAR 掃描'}), 404
+
+    response = Response(frame, mimetype='application/octet-stream')
+    response.headers['Cache-Control'] = 'no-cache, no-store'
+    return response
+
+@app.route('/api/lidar/metrics')
+def get_lidar_metrics():
+    """獲取 LIDAR 中繼統計（上游連線、降採樣比例、推送次數）"""
+    return jsonify({'success': True, 'relay': lidar_relay.get_stats(), 'grid': occupancy_grid.get_stats()})
+
+@app.route('/api/lidar/grid')
+def get_lidar_grid():
+    """
+    獲取佔據柵格資訊與變動過的圖塊清單
+    查詢參數: since（只列出版本大於此值的圖塊，傳入上次回應的 version 即可增量更新）
+    """
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'since 必須是整數'}), 400
+
+    return jsonify({'success': True, 'grid': occupancy_grid.get_info(since)})
+
+@app.route('/api/lidar/grid/tile/<int:tx>/<int:ty>')
+def get_lidar_grid_tile(tx, ty):
+    """
+    獲取佔據柵格圖塊（ETag 為圖塊版本，未變動時回傳 304）
+    查詢參數: format（png / bin，預設 png，未安裝 Pillow 時為 bin）
+    """
+    fmt = request.args.get('format')
+    try:
+        version, data = occupancy_grid.tile(tx, ty, fmt)
+    except IndexError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'success': False, 'error': str(e)}), 501
+
+    response = Response(data, mimetype=TILE_FORMATS[fmt or occupancy_grid.default_format()])
+    response.set_etag(str(version))
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@app.route('/api/lidar/grid/reset', methods=['POST'])
+def reset_lidar_grid():
+    """清空佔據柵格"""
+    occupancy_grid.reset()
+    return jsonify({'success': True, 'version': occupancy_grid.version})
+
+@app.route('/api/mavlink/metrics')
+def get_mavlink_metrics():
+    """獲取 MAVLink 接收與消息分派統計（各消息類型的佇列深度與丟棄數）"""
+    if mavlink_connection is None:
+        return jsonify({'success': False, 'error': 'MAVLink 未初始化'}), 503
+
+    return jsonify({
+        'success': True,
+        'connected': mavlink_connection.is_connected,
+        'receive': mavlink_connection.get_receive_stats(),
+        'dispatch': mavlink_connection.get_dispatch_stats()
+    })
+
 @app.route('/api/raspberry-pi/imu')
 def get_raspberry_pi_imu():
     """獲取樹莓派 IMU 數據（測試端點）"""
@@ -732,6 +1127,143 @@ def change_mode(vehicle_id):
         
     return jsonify({'success': False})
 
+# =================== Socket.IO 事件 ===================
+@socketio.on('connect')
+def handle_connect(auth=None):
+    """
+    客戶端連線 - 預設接收完整狀態的 telemetry_data
+    可在連線時協商編碼格式：auth { "encoding": "msgpack" } 或查詢參數 ?encoding=struct
+    """
+    requested = (auth or {}).get('encoding') or request.args.get('encoding')
+    room, encoding = telemetry_broadcaster.add_client(request.sid, requested or 'json')
+    join_room(room)
+
+    if requested:
+        emit('telemetry_encoding', {'encoding': encoding,
+                                    'available': list(available_encodings())})
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    """客戶端斷線"""
+    telemetry_broadcaster.remove_client(request.sid)
+    if replay_service is not None:
+        replay_service.stop_sessions(request.sid)
+    lidar_relay.unsubscribe(request.sid)
+
+@socketio.on('telemetry_subscribe')
+def handle_telemetry_subscribe(data):
+    """
+    選擇遙測推送模式與頻率
+    data: { "mode": "full" | "delta", "rateHz": 10, "encoding": "json" | "msgpack" | "struct" }
+    訂閱後改為每個推送週期接收一個 telemetry_batch 批次幀；增量模式立即收到每個載具的關鍵幀
+    """
+    data = data or {}
+    mode = data.get('mode', 'full')
+
+    try:
+        rate_hz = float(data['rateHz']) if data.get('rateHz') is not None else None
+        old_room, room, rate_hz = telemetry_broadcaster.subscribe(request.sid, mode, rate_hz,
+                                                                  data.get('encoding'))
+    except (TypeError, ValueError) as e:
+        return {'success': False, 'error': str(e)}
+
+    if old_room:
+        leave_room(old_room)
+    join_room(room)
+
+    if mode == 'delta':
+        telemetry_broadcaster.resync(request.sid)
+
+    return {'success': True, 'mode': mode, 'rateHz': rate_hz}
+
+@socketio.on('telemetry_resync')
+def handle_telemetry_resync(data):
+    """
+    增量模式的客戶端發現序號不連續時請求重新同步
+    data: { "vehicleId": "UAV1" }（省略時同步所有載具）
+    """
+    telemetry_broadcaster.resync(request.sid, (data or {}).get('vehicleId'))
+
+@socketio.on('lidar_subscribe')
+def handle_lidar_subscribe(data=None):
+    """
+    訂閱 LIDAR 掃描，之後以 lidar_scan 事件接收二進位幀：
+    32 字節幀頭 '<B3xIIIdff'（版本、序號、點數、原始有效點數、時間戳、最大量程、最近距離），
+    之後為 float32 交錯排列的 (x, y) 座標（米，感測器座標系）
+    """
+    join_room(lidar_relay.subscribe(request.sid))
+    return {'success': True, 'rateHz': lidar_relay.rate_hz, 'decimation': lidar_relay.decimation}
+
+@socketio.on('lidar_unsubscribe')
+def handle_lidar_unsubscribe(data=None):
+    """取消訂閱 LIDAR 掃描"""
+    if lidar_relay.unsubscribe(request.sid):
+        leave_room(LidarRelay.ROOM)
+    return {'success': True}
+
+def _run_replay_session(sid, replay_id, stop_event, vehicle_id, series, start_time, end_time, speed):
+    """在背景任務中回放日誌，將數據幀推送給發起回放的客戶端"""
+    frames = 0
+    try:
+        for timestamps, columns in replay_service.replay(vehicle_id, series, start_time, end_time, speed,
+                                                         sleep=socketio.sleep, stop_event=stop_event):
+            frame = _replay_frame(vehicle_id, series, timestamps, columns)
+            frame['replayId'] = replay_id
+            socketio.emit('replay_data', frame, to=sid)
+            frames += 1
+            if not speed:
+                # 不限速時仍讓出控制權，避免長時間佔用事件循環
+                socketio.sleep(0)
+    except Exception as e:
+        logger.error(f"日誌回放錯誤 ({vehicle_id}/{series}): {e}")
+    finally:
+        replay_service.end_session(sid, replay_id)
+        socketio.emit('replay_end', {
+            'replayId': replay_id,
+            'frames': frames,
+            'stopped': stop_event.is_set()
+        }, to=sid)
+
+@socketio.on('replay_start')
+def handle_replay_start(data):
+    """
+    開始回放飛行日誌，數據以 replay_data 事件推送，結束時收到 replay_end
+    data: { "vehicleId": "UAV1", "series": "attitude", "from": 1700000000, "to": 1700000170, "speed": 10 }
+    """
+    if replay_service is None:
+        return {'success': False, 'error': '未啟用飛行日誌（DATA_STORE_TYPE=file）'}
+
+    data = data or {}
+    vehicle_id = data.get('vehicleId')
+    if not vehicle_id:
+        return {'success': False, 'error': '缺少 vehicleId'}
+    # vehicleId 會成為日誌路徑的一部分，只接受已知的載具
+    if not isinstance(vehicle_id, str) or vehicle_id not in vehicle_states:
+        return {'success': False, 'error': f'Vehicle {vehicle_id} not found'}
+
+    try:
+        series, start_time, end_time, speed = _parse_replay_params(data)
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}
+
+    history_recorder.flush()
+    replay_id, stop_event = replay_service.start_session(request.sid)
+    socketio.start_background_task(_run_replay_session, request.sid, replay_id, stop_event,
+                                   vehicle_id, series, start_time, end_time, speed)
+    return {'success': True, 'replayId': replay_id}
+
+@socketio.on('replay_stop')
+def handle_replay_stop(data):
+    """
+    停止回放
+    data: { "replayId": 1 }（省略時停止此客戶端的所有回放）
+    """
+    if replay_service is None:
+        return {'success': False, 'error': '未啟用飛行日誌（DATA_STORE_TYPE=file）'}
+
+    stopped = replay_service.stop_sessions(request.sid, (data or {}).get('replayId'))
+    return {'success': True, 'stopped': stopped}
+
 # 模擬數據更新（用於 UAV1 - 只更新非 IMU 數據，IMU 數據來自樹莓派）
 def update_uav_other_data():
     """更新 UAV1 其他數據（位置、電池等），IMU 數據由樹莓派提供"""
@@ -783,25 +1315,9 @@ def update_uav_other_data():
             
             # 注意：歷史數據中的 attitude、rc、motion 由 update_raspberry_pi_data() 更新
             # 這裡只更新高度數據（如果需要）
-            history_data['UAV1']['altitude'].append({
-                'timestamp': current_time,
-                'altitude': state['position']['altitude']
-            })
-            
-            # 限制歷史數據長度（根據回放緩衝設定保留數據）
-            global playback_buffer_seconds
-            current_time = time.time()
-            cutoff_time = current_time - playback_buffer_seconds
-            
-            # 移除超過緩衝時間的舊數據
-            for key in history_data['UAV1']:
-                # 過濾掉超過緩衝時間的數據
-                history_data['UAV1'][key] = [d for d in history_data['UAV1'][key] if d.get('timestamp', 0) >= cutoff_time]
-                
-                # 同時限制最大數據點數（防止內存溢出）
-                if len(history_data['UAV1'][key]) > 5000:
-                    history_data['UAV1'][key] = history_data['UAV1'][key][-5000:]
-            
+            history_data.append('UAV1', 'altitude', current_time,
+                                state['position']['altitude'])
+
             socketio.sleep(0.1)
         except:
             socketio.sleep(1)
@@ -810,16 +1326,28 @@ if __name__ == '__main__':
     # 不再初始化 MAVLink（改為從樹莓派獲取數據）
     # init_mavlink()
     logger.info("使用樹莓派作為 UAV 數據源，UGV 使用模擬數據")
-    logger.info(f"樹莓派 IMU API: {RASPBERRY_PI_IMU_URL}")
-    
-    # 啟動樹莓派數據更新線程（更新 UAV1 的 IMU 數據）
-    socketio.start_background_task(update_raspberry_pi_data)
+    if config.UAV_INGEST_MODE == 'udp':
+        # 樹莓派主動推送：收到數據包即更新 UAV1 狀態
+        logger.info(f"樹莓派推送模式，UDP 監聽: {config.INGEST_UDP_HOST}:{config.INGEST_UDP_PORT}")
+        telemetry_listener.start()
+    else:
+        logger.info(f"樹莓派 IMU API: {RASPBERRY_PI_IMU_URL}")
+
+        # 啟動樹莓派數據更新線程（更新 UAV1 的 IMU 數據）
+        socketio.start_background_task(update_raspberry_pi_data)
     
     # 啟動 UAV1 其他數據更新線程（位置、電池等，不包含 IMU）
     socketio.start_background_task(update_uav_other_data)
     
     # 啟動 UGV1 模擬數據線程（包含 IMU 數據）
     socketio.start_background_task(update_ugv_mock_data)
+
+    # 啟動遙測廣播排程器（固定頻率合併推送所有載具狀態）
+    socketio.start_background_task(telemetry_broadcaster.run)
+
+    # 啟動 LIDAR 中繼（上游接收線程 + 固定頻率上限的推送循環）
+    if config.LIDAR_RELAY_ENABLED and lidar_relay.start():
+        socketio.start_background_task(lidar_relay.run)
     
     logger.info("啟動 UAV × UGV Control Center...")
     logger.info("總覽頁面: http://localhost:5000")
@@ -35,6 +35,42 @@ MAVLINK_BUFFER_SIZE = int(os.environ.get('MAVLINK_BUFFER_SIZE', '8192'))
 MAVLINK_TIMEOUT = float(os.environ.get('MAVLINK_TIMEOUT', '1.0'))
 MAVLINK_HIGHSPEED = os.environ.get('MAVLINK_HIGHSPEED', 'True').lower() in ('true', '1', 't')
 
+# MAVLink接收配置
+MAVLINK_READ_TIMEOUT = float(os.environ.get('MAVLINK_READ_TIMEOUT', '0.5'))  # 等待數據的最長時間（秒），用於檢查停止旗標
+MAVLINK_MAX_BATCH = int(os.environ.get('MAVLINK_MAX_BATCH', '256'))  # 每次喚醒最多解析的消息數
+MAVLINK_POLL_INTERVAL = float(os.environ.get('MAVLINK_POLL_INTERVAL', '0.005'))  # 無法 select 的連接（Windows 串口）無數據時的等待間隔（秒）
+
+# MAVLink消息分派配置（回調在執行緒池中執行，不阻塞接收執行緒）
+MAVLINK_DISPATCH_ENABLED = os.environ.get('MAVLINK_DISPATCH_ENABLED', 'True').lower() in ('true', '1', 't')
+MAVLINK_DISPATCH_WORKERS = int(os.environ.get('MAVLINK_DISPATCH_WORKERS', '4'))
+MAVLINK_DISPATCH_QUEUE_SIZE = int(os.environ.get('MAVLINK_DISPATCH_QUEUE_SIZE', '64'))  # 每種消息類型的佇列上限
+MAVLINK_DISPATCH_DEFAULT_POLICY = os.environ.get('MAVLINK_DISPATCH_DEFAULT_POLICY', 'drop_oldest')
+MAVLINK_DISPATCH_POLICIES = {
+    # 狀態類消息只需要最新值
+    'ATTITUDE': 'latest',
+    'VFR_HUD': 'latest',
+    'GLOBAL_POSITION_INT': 'latest',
+    'RC_CHANNELS': 'latest',
+    'SERVO_OUTPUT_RAW': 'latest',
+    'NAV_CONTROLLER_OUTPUT': 'latest',
+    # 事件類消息不可丟棄
+    'HEARTBEAT': 'never_drop',
+    'STATUSTEXT': 'never_drop',
+    'COMMAND_ACK': 'never_drop',
+    'PARAM_VALUE': 'never_drop',
+    'MISSION_ACK': 'never_drop',
+}
+
+# 遙測處理器訂閱各消息類型的最高頻率（Hz），超過時只處理每個間隔內最新的一則
+MAVLINK_CALLBACK_MAX_RATES = {
+    'ATTITUDE': float(os.environ.get('MAVLINK_MAX_RATE_ATTITUDE', '20')),
+    'VFR_HUD': float(os.environ.get('MAVLINK_MAX_RATE_VFR_HUD', '10')),
+    'GLOBAL_POSITION_INT': float(os.environ.get('MAVLINK_MAX_RATE_GLOBAL_POSITION_INT', '10')),
+    'RC_CHANNELS': float(os.environ.get('MAVLINK_MAX_RATE_RC_CHANNELS', '10')),
+    'SERVO_OUTPUT_RAW': float(os.environ.get('MAVLINK_MAX_RATE_SERVO_OUTPUT_RAW', '10')),
+    'NAV_CONTROLLER_OUTPUT': float(os.environ.get('MAVLINK_MAX_RATE_NAV_CONTROLLER_OUTPUT', '5')),
+}
+
 # =================== RC Override配置 ===================
 RC_OVERRIDE_ENABLED = os.environ.get('RC_OVERRIDE_ENABLED', 'True').lower() in ('true', '1', 't')
 RC_AUTHORIZED_SYSID = int(os.environ.get('RC_AUTHORIZED_SYSID', '255'))
@@ -61,10 +97,62 @@ WEB_PORT = int(os.environ.get('WEB_PORT', '5000'))
 WEB_DEBUG = os.environ.get('WEB_DEBUG', 'False').lower() in ('true', '1', 't')
 WEB_SECRET_KEY = os.environ.get('WEB_SECRET_KEY', 'pixhawk-rover-control-2024')
 
+# =================== 樹莓派連線配置 ===================
+RASPBERRY_PI_POOL_SIZE = int(os.environ.get('RASPBERRY_PI_POOL_SIZE', '4'))  # 每台樹莓派的持久連線數
+RASPBERRY_PI_CONNECT_TIMEOUT = float(os.environ.get('RASPBERRY_PI_CONNECT_TIMEOUT', '0.5'))  # 建立連線超時（秒）
+RASPBERRY_PI_READ_TIMEOUT = float(os.environ.get('RASPBERRY_PI_READ_TIMEOUT', '0.5'))  # 讀取回應超時（秒）
+RASPBERRY_PI_POLL_RATE = int(os.environ.get('RASPBERRY_PI_POLL_RATE', '20'))  # IMU 輪詢頻率（Hz）
+
+# 影像中繼（每個鏡頭一條上游連線，分發給所有瀏覽器）
+VIDEO_RELAY_CHUNK_SIZE = int(os.environ.get('VIDEO_RELAY_CHUNK_SIZE', '16384'))  # 每次從上游讀取的字節數
+VIDEO_RELAY_MAX_FRAME_SIZE = int(os.environ.get('VIDEO_RELAY_MAX_FRAME_SIZE', str(4 * 1024 * 1024)))  # 單幀最大字節數
+VIDEO_RELAY_READ_TIMEOUT = float(os.environ.get('VIDEO_RELAY_READ_TIMEOUT', '5.0'))  # 上游讀取超時（秒）
+VIDEO_RELAY_RECONNECT_DELAY = float(os.environ.get('VIDEO_RELAY_RECONNECT_DELAY', '2.0'))  # 上游斷線後的重試間隔（秒）
+VIDEO_RELAY_IDLE_TIMEOUT = float(os.environ.get('VIDEO_RELAY_IDLE_TIMEOUT', '10.0'))  # 沒有觀看者多久後關閉上游（秒）
+VIDEO_RELAY_STALL_TIMEOUT = float(os.environ.get('VIDEO_RELAY_STALL_TIMEOUT', '10.0'))  # 觀看者多久沒收到新幀即結束串流（秒）
+VIDEO_RELAY_POLL_INTERVAL = float(os.environ.get('VIDEO_RELAY_POLL_INTERVAL', '0.01'))  # 觀看者檢查新幀的間隔（秒）
+# 影像設定檔 {名稱: (最大寬度, JPEG 品質)}，full 直接轉發原始幀（縮放需安裝 Pillow）
+VIDEO_PROFILES = {
+    'thumbnail': (int(os.environ.get('VIDEO_PROFILE_THUMBNAIL_WIDTH', '320')),
+                  int(os.environ.get('VIDEO_PROFILE_THUMBNAIL_QUALITY', '50'))),
+    'panel': (int(os.environ.get('VIDEO_PROFILE_PANEL_WIDTH', '640')),
+              int(os.environ.get('VIDEO_PROFILE_PANEL_QUALITY', '70'))),
+    'full': (None, None),
+}
+VIDEO_DEFAULT_PROFILE = os.environ.get('VIDEO_DEFAULT_PROFILE', 'full')  # 未指定設定檔與寬度時使用
+VIDEO_ENCODE_WORKERS = int(os.environ.get('VIDEO_ENCODE_WORKERS', '2'))  # 縮放編碼的工作執行緒數量
+
+# UAV 遙測來源: poll = HTTP 輪詢樹莓派 /imu_data, udp = 樹莓派以 PacketCodec 數據包主動推送
+UAV_INGEST_MODE = os.environ.get('UAV_INGEST_MODE', 'poll')
+INGEST_UDP_HOST = os.environ.get('INGEST_UDP_HOST', '0.0.0.0')
+INGEST_UDP_PORT = int(os.environ.get('INGEST_UDP_PORT', '14650'))
+
+# =================== LIDAR配置 ===================
+LIDAR_RELAY_ENABLED = os.environ.get('LIDAR_RELAY_ENABLED', 'True').lower() in ('true', '1', 't')
+LIDAR_WS_URL = os.environ.get('LIDAR_WS_URL', 'ws://172.20.10.10:8765')  # UGV 樹莓派的 LIDAR WebSocket
+LIDAR_BROADCAST_RATE = float(os.environ.get('LIDAR_BROADCAST_RATE', '10'))  # 推送給瀏覽器的頻率上限（Hz）
+LIDAR_DECIMATION = os.environ.get('LIDAR_DECIMATION', 'angle')  # 降採樣方式: angle / voxel / none
+LIDAR_ANGLE_BIN_DEG = float(os.environ.get('LIDAR_ANGLE_BIN_DEG', '1.0'))  # 角度分格大小（度），每格保留最近的點
+LIDAR_VOXEL_SIZE = float(os.environ.get('LIDAR_VOXEL_SIZE', '0.05'))  # 體素格邊長（米）
+LIDAR_RECONNECT_DELAY = float(os.environ.get('LIDAR_RECONNECT_DELAY', '5.0'))  # 上游斷線後的重試間隔（秒）
+LIDAR_RECEIVE_TIMEOUT = float(os.environ.get('LIDAR_RECEIVE_TIMEOUT', '5.0'))  # 多久沒收到掃描視為斷線（秒）
+# 佔據柵格地圖（以 UGV 位姿把每圈掃描融合進 log-odds 柵格）
+LIDAR_GRID_ENABLED = os.environ.get('LIDAR_GRID_ENABLED', 'True').lower() in ('true', '1', 't')
+LIDAR_GRID_RESOLUTION = float(os.environ.get('LIDAR_GRID_RESOLUTION', '0.1'))  # 每格邊長（米）
+LIDAR_GRID_SIZE = float(os.environ.get('LIDAR_GRID_SIZE', '200.0'))  # 地圖邊長（米），以原點為中心
+LIDAR_GRID_TILE_SIZE = int(os.environ.get('LIDAR_GRID_TILE_SIZE', '128'))  # 圖塊邊長（格）
+LIDAR_GRID_ORIGIN = os.environ.get('LIDAR_GRID_ORIGIN', '')  # 原點 'lat,lon'，留空則以第一圈掃描時的 UGV 位置為原點
+LIDAR_GRID_MAX_RANGE = float(os.environ.get('LIDAR_GRID_MAX_RANGE', '12.0'))  # 融合的最大距離（米），更遠的光束只清除空閒格
+LIDAR_GRID_YAW_OFFSET_DEG = float(os.environ.get('LIDAR_GRID_YAW_OFFSET_DEG', '0.0'))  # LIDAR 安裝方向相對車頭的偏角（度，逆時針為正）
+LIDAR_GRID_LOG_ODDS_HIT = float(os.environ.get('LIDAR_GRID_LOG_ODDS_HIT', '0.85'))  # 光束終點（佔據）的 log-odds 增量
+LIDAR_GRID_LOG_ODDS_MISS = float(os.environ.get('LIDAR_GRID_LOG_ODDS_MISS', '-0.4'))  # 光束經過（空閒）的 log-odds 增量
+LIDAR_GRID_LOG_ODDS_LIMIT = float(os.environ.get('LIDAR_GRID_LOG_ODDS_LIMIT', '4.0'))  # log-odds 上下限，避免地圖無法更新
+
 # =================== 儀表板配置 ===================
 # 更新頻率配置
 DASHBOARD_UPDATE_INTERVAL = int(os.environ.get('DASHBOARD_UPDATE_INTERVAL', '200'))  # 儀表板更新間隔（毫秒）
 TELEMETRY_UPDATE_RATE = int(os.environ.get('TELEMETRY_UPDATE_RATE', '20'))  # 遙測更新頻率（Hz）
+TELEMETRY_KEYFRAME_INTERVAL = int(os.environ.get('TELEMETRY_KEYFRAME_INTERVAL', '100'))  # 增量模式下每隔多少幀送出完整關鍵幀
 
 # 姿態角可視化配置
 ATTITUDE_VISUALIZATION = {
@@ -103,6 +191,22 @@ SYSTEM_STATUS_ITEMS = [
 DATA_STORE_TYPE = os.environ.get('DATA_STORE_TYPE', 'memory')
 DATA_STORE_PATH = os.environ.get('DATA_STORE_PATH', './logs/data')
 DATA_RETENTION_DAYS = int(os.environ.get('DATA_RETENTION_DAYS', '7'))
+# 飛行日誌（DATA_STORE_TYPE = 'file' 時啟用）
+DATA_SEGMENT_SECONDS = int(os.environ.get('DATA_SEGMENT_SECONDS', '3600'))  # 每個日誌分段涵蓋的時間（秒）
+DATA_WRITE_BUFFER = int(os.environ.get('DATA_WRITE_BUFFER', '65536'))  # 每個分段的寫入緩衝區（字節）
+DATA_FLUSH_INTERVAL = float(os.environ.get('DATA_FLUSH_INTERVAL', '1.0'))  # 緩衝數據最長多久寫入磁碟（秒）
+# 日誌回放
+REPLAY_INDEX_STRIDE = int(os.environ.get('REPLAY_INDEX_STRIDE', '1024'))  # 稀疏時間索引每隔多少筆記錄取一個索引點
+REPLAY_INDEX_CACHE = int(os.environ.get('REPLAY_INDEX_CACHE', '512'))  # 最多快取多少個分段的索引
+REPLAY_CHUNK_SIZE = int(os.environ.get('REPLAY_CHUNK_SIZE', '4096'))  # 每次從分段讀出的最大記錄數
+REPLAY_FRAME_INTERVAL = float(os.environ.get('REPLAY_FRAME_INTERVAL', '0.1'))  # 依速度回放時每個推送幀的間隔（秒）
+# 歷史數據匯出（Parquet / Feather，需安裝 pyarrow）
+EXPORT_ROW_GROUP_SIZE = int(os.environ.get('EXPORT_ROW_GROUP_SIZE', '65536'))  # 每個 row group 的筆數
+EXPORT_COMPRESSION = os.environ.get('EXPORT_COMPRESSION', 'zstd')  # 壓縮演算法（zstd / lz4 / snappy / none）
+
+# 歷史數據環形緩衝區配置（用於性能圖表與回放）
+# 預設可容納最大回放緩衝（3600秒）的 20Hz 數據，列式存儲每點僅佔 8 字節/欄位
+HISTORY_MAX_POINTS = int(os.environ.get('HISTORY_MAX_POINTS', '72000'))  # 每個數據序列的最大數據點數
 
 # =================== 日誌配置 ===================
 LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
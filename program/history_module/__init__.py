@@ -0,0 +1,35 @@
+"""
+歷史數據模組 - 載具遙測歷史存儲
+提供固定容量、按時間索引的 NumPy 列式環形緩衝區，用於性能圖表與回放，
+以及寫入磁碟的分段飛行日誌（mmap 讀取）、按時間範圍的日誌回放與 Parquet / Feather 列式匯出
+"""
+
+from .store import TimeSeriesRing, HistoryStore, HISTORY_SERIES, columns_to_points
+from .recorder import FlightRecorder, FlightLogReader, LogSegment, record_dtype
+from .replay import ReplayService, SparseIndex
+from .export import write_export, memory_chunks, log_chunks, export_available, EXPORT_FORMATS
+from .downsample import downsample, lttb_indices, minmax_indices, DOWNSAMPLE_METHODS
+
+__all__ = [
+    'TimeSeriesRing',
+    'HistoryStore',
+    'HISTORY_SERIES',
+    'columns_to_points',
+    'FlightRecorder',
+    'FlightLogReader',
+    'LogSegment',
+    'record_dtype',
+    'ReplayService',
+    'SparseIndex',
+    'write_export',
+    'memory_chunks',
+    'log_chunks',
+    'export_available',
+    'EXPORT_FORMATS',
+    'downsample',
+    'lttb_indices',
+    'minmax_indices',
+    'DOWNSAMPLE_METHODS'
+]
+
+__version__ = '1.0.0'
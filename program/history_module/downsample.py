@@ -0,0 +1,136 @@
+"""
+歷史數據降採樣模組 - 伺服器端數據抽取
+提供 LTTB（Largest-Triangle-Three-Buckets）與最小/最大值分桶兩種降採樣方法，
+讓歷史數據端點的回傳點數與序列化時間不隨回放緩衝長度增長
+"""
+import logging
+from typing import Dict, Tuple
+
+import numpy as np
+
+# 設定日誌
+logger = logging.getLogger(__name__)
+
+# 支援的降採樣方法
+DOWNSAMPLE_METHODS = ('lttb', 'minmax')
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    以 LTTB 演算法選出保留的數據點索引
+
+    參數:
+        x: 時間戳陣列（單調遞增）
+        y: 數值陣列
+        threshold: 目標點數
+
+    返回:
+        np.ndarray: 保留的數據點索引（遞增）
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # 第一點與最後一點固定保留，其餘點平均分配到 threshold-2 個桶
+    every = (n - 2) / (threshold - 2)
+    edges = (np.arange(threshold - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    # 以第一點為時間原點，避免累積和在大時間戳下損失精度
+    x = np.asarray(x, dtype=np.float64) - x[0]
+
+    # 以累積和計算每個桶的平均值（最後一個桶的「下一個桶」為最後一點）
+    cum_x = np.concatenate(([0.0], np.cumsum(x, dtype=np.float64)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y, dtype=np.float64)))
+    next_start = edges[1:]
+    next_end = np.append(edges[2:], n)
+    next_count = next_end - next_start
+    avg_x = (cum_x[next_end] - cum_x[next_start]) / next_count
+    avg_y = (cum_y[next_end] - cum_y[next_start]) / next_count
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # 以上一個選中點、本桶候選點、下一桶平均點構成三角形，取面積最大者
+        area = np.abs(
+            (x[a] - avg_x[i]) * (y[start:end] - y[a]) -
+            (x[a] - x[start:end]) * (avg_y[i] - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+def minmax_indices(y: np.ndarray, buckets: int) -> np.ndarray:
+    """
+    以最小/最大值分桶選出保留的數據點索引，保留每個桶內的極值（適合觀察尖峰）
+
+    參數:
+        y: 數值陣列
+        buckets: 分桶數量（每桶保留2點）
+
+    返回:
+        np.ndarray: 保留的數據點索引（遞增）
+    """
+    n = len(y)
+    if buckets <= 0 or 2 * buckets + 2 >= n:
+        return np.arange(n)
+
+    # 補齊為等長的桶以便向量化計算，補齊的位置以 NaN 填充
+    size = -(-n // buckets)
+    padded = np.full(size * buckets, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+
+    # 空桶（全為 NaN）不參與計算
+    valid = ~np.all(np.isnan(padded), axis=1)
+    padded = padded[valid]
+    offsets = np.flatnonzero(valid) * size
+
+    mins = offsets + np.nanargmin(padded, axis=1)
+    maxs = offsets + np.nanargmax(padded, axis=1)
+
+    return np.unique(np.concatenate(([0, n - 1], mins, maxs)))
+
+def downsample(timestamps: np.ndarray,
+               columns: Dict[str, np.ndarray],
+               max_points: int,
+               method: str = 'lttb') -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    對多欄位時間序列降採樣
+
+    每個欄位分配相同的點數預算分別選點後取聯集，因此任一欄位的形狀都會被保留，
+    且總點數不超過 max_points
+
+    參數:
+        timestamps: 時間戳陣列
+        columns: {欄位名稱: 數值陣列}
+        max_points: 最大回傳點數
+        method: 降採樣方法（'lttb' 或 'minmax'）
+
+    返回:
+        Tuple[np.ndarray, Dict[str, np.ndarray]]: 降採樣後的 (時間戳陣列, 欄位數據)
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"不支援的降採樣方法: {method}")
+
+    n = len(timestamps)
+    if n <= max_points or not columns:
+        return timestamps, columns
+
+    budget = max(max_points // len(columns), 3)
+    selected = []
+    for values in columns.values():
+        if method == 'lttb':
+            selected.append(lttb_indices(timestamps, values, budget))
+        else:
+            selected.append(minmax_indices(values, (budget - 2) // 2))
+
+    indices = np.unique(np.concatenate(selected))
+    if len(indices) > max_points:
+        # 欄位多於 max_points // 3 時每欄至少選 3 點，聯集可能超過上限：均勻保留其中 max_points 點（含首尾）
+        indices = indices[np.round(np.linspace(0, len(indices) - 1, max_points)).astype(np.int64)]
+    return timestamps[indices], {name: values[indices] for name, values in columns.items()}
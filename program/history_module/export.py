@@ -0,0 +1,153 @@
+"""
+遙測歷史匯出模組 - 把載具的歷史數據匯出為列式 Parquet / Feather 檔案
+數據以 pandas DataFrame 分批轉為 Arrow 表格，每批寫成一個 row group（Feather 為一個 record batch），
+匯出長時間的飛行記錄時記憶體用量只與 EXPORT_ROW_GROUP_SIZE 有關；
+匯出的檔案可直接以 pandas.read_parquet / pandas.read_feather 載入分析
+"""
+import logging
+from pathlib import Path
+from typing import Optional, Dict, Tuple, Iterable, Iterator, List, BinaryIO
+import numpy as np
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# 導入配置
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+
+# 設定日誌
+logger = logging.getLogger(__name__)
+
+# 支援的匯出格式 {格式: (副檔名, MIME 類型)}
+EXPORT_FORMATS = {
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+    'feather': ('.feather', 'application/vnd.apache.arrow.file')
+}
+
+# 一批列數據: (時間戳陣列, {欄位名稱: 數值陣列})
+Chunk = Tuple[np.ndarray, Dict[str, np.ndarray]]
+
+def export_available() -> bool:
+    """是否已安裝匯出所需的 pandas 與 pyarrow"""
+    return pd is not None and pa is not None
+
+def memory_chunks(history_store, vehicle_id: str, series: str,
+                  start_time: Optional[float] = None,
+                  end_time: Optional[float] = None) -> Iterator[Chunk]:
+    """記憶體中環形緩衝區的數據（HistoryStore）"""
+    timestamps, columns = history_store.window_arrays(vehicle_id, series, start_time, end_time)
+    if len(timestamps):
+        yield timestamps, columns
+
+def log_chunks(replay_service, vehicle_id: str, series: str,
+               start_time: Optional[float] = None,
+               end_time: Optional[float] = None) -> Iterator[Chunk]:
+    """磁碟上的飛行日誌（ReplayService，以稀疏索引定位時間範圍）"""
+    for records in replay_service.iter_records(vehicle_id, series, start_time, end_time):
+        names = records.dtype.names[1:]
+        yield records['timestamp'], {name: records[name] for name in names}
+
+def regroup(chunks: Iterable[Chunk], size: int) -> Iterator[Chunk]:
+    """把大小不一的數據批次重新切分為每批 size 筆（最後一批可能較少）"""
+    pending: List[Chunk] = []
+    pending_count = 0
+
+    def merge() -> Chunk:
+        timestamps = np.concatenate([chunk[0] for chunk in pending])
+        columns = {name: np.concatenate([chunk[1][name] for chunk in pending])
+                   for name in pending[0][1]}
+        return timestamps, columns
+
+    for chunk in chunks:
+        pending.append(chunk)
+        pending_count += len(chunk[0])
+        if pending_count < size:
+            continue
+
+        timestamps, columns = merge()
+        offset = 0
+        while len(timestamps) - offset >= size:
+            yield timestamps[offset:offset + size], \
+                {name: values[offset:offset + size] for name, values in columns.items()}
+            offset += size
+
+        pending = [(timestamps[offset:], {name: values[offset:] for name, values in columns.items()})]
+        pending_count = len(timestamps) - offset
+
+    if pending_count:
+        yield merge()
+
+def chunk_to_frame(timestamps: np.ndarray, columns: Dict[str, np.ndarray]) -> 'pd.DataFrame':
+    """
+    把一批列數據轉為 DataFrame
+    欄位: time（UTC 時間，微秒精度）、timestamp（Unix 秒）與各數據欄位
+    """
+    frame = {
+        'time': pd.to_datetime(np.round(timestamps * 1e6).astype(np.int64), unit='us', utc=True),
+        'timestamp': timestamps
+    }
+    frame.update(columns)
+    return pd.DataFrame(frame, copy=False)
+
+def write_export(sink: BinaryIO,
+                 chunks: Iterable[Chunk],
+                 fields: Tuple[str, ...],
+                 fmt: str = 'parquet',
+                 row_group_size: Optional[int] = None,
+                 compression: Optional[str] = None) -> int:
+    """
+    以串流方式寫出匯出檔案
+
+    參數:
+        sink: 可寫入的二進位檔案
+        chunks: 數據批次
+        fields: 數據欄位名稱（決定檔案的欄位結構）
+        fmt: 'parquet' 或 'feather'
+        row_group_size: 每個 row group 的筆數
+        compression: 壓縮演算法（parquet: zstd/snappy/gzip/none，feather: zstd/lz4/none）
+
+    返回:
+        int: 寫出的筆數
+    """
+    if not export_available():
+        raise RuntimeError('匯出需要安裝 pandas 與 pyarrow')
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"未知的匯出格式: {fmt} (可用: {list(EXPORT_FORMATS)})")
+
+    row_group_size = row_group_size or config.EXPORT_ROW_GROUP_SIZE
+    compression = compression or config.EXPORT_COMPRESSION
+    if compression == 'none':
+        compression = None
+
+    schema = pa.schema([('time', pa.timestamp('us', tz='UTC')), ('timestamp', pa.float64())] +
+                       [(name, pa.float64()) for name in fields])
+
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(sink, schema, compression=compression or 'none')
+    else:
+        # Feather V2 即 Arrow IPC 檔案格式
+        writer = pa.ipc.new_file(sink, schema, options=pa.ipc.IpcWriteOptions(compression=compression))
+
+    rows = 0
+    try:
+        for timestamps, columns in regroup(chunks, row_group_size):
+            table = pa.Table.from_pandas(chunk_to_frame(timestamps, columns), schema=schema,
+                                         preserve_index=False)
+            writer.write_table(table)
+            rows += table.num_rows
+    finally:
+        writer.close()
+
+    logger.debug(f"已匯出 {rows} 筆數據 ({fmt})")
+    return rows
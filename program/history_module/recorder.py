@@ -0,0 +1,499 @@
+"""
+飛行日誌記錄模組 - 以分段的二進位檔案持久化遙測歷史
+每個載具的每個數據序列寫入獨立的分段檔案，檔案由「魔數 + JSON 檔頭 + 固定長度記錄」組成，
+以緩衝 I/O 追加寫入，依 DATA_SEGMENT_SECONDS 分段、依 DATA_RETENTION_DAYS 刪除過期分段；
+讀取端以 mmap 映射分段並用 np.frombuffer 直接取得記錄，不需要把整個檔案載入記憶體
+
+目錄結構: {DATA_STORE_PATH}/{載具ID}/{序列名稱}/{分段起始時間}.seg
+記錄格式: float64 時間戳 + 每個欄位一個 float64（小端序）
+"""
+import json
+import mmap
+import time
+import struct
+import threading
+import logging
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple, Iterable, Iterator
+import numpy as np
+
+# 導入配置
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+
+from .store import HISTORY_SERIES
+
+# 設定日誌
+logger = logging.getLogger(__name__)
+
+# 檔案格式
+LOG_MAGIC = b'GCSTLOG\x01'
+LOG_FORMAT_VERSION = 1
+SEGMENT_SUFFIX = '.seg'
+_HEADER_LENGTH = struct.Struct('<I')
+
+def record_dtype(fields: Tuple[str, ...]) -> np.dtype:
+    """序列的記錄 dtype（時間戳 + 各欄位，皆為小端序 float64）"""
+    return np.dtype([('timestamp', '<f8')] + [(name, '<f8') for name in fields])
+
+def encode_header(vehicle_id: str, series: str, fields: Tuple[str, ...], created: float) -> bytes:
+    """建立分段檔頭（長度補齊為 8 的倍數，使記錄區段對齊）"""
+    header = json.dumps({
+        'version': LOG_FORMAT_VERSION,
+        'vehicleId': vehicle_id,
+        'series': series,
+        'fields': list(fields),
+        'created': created
+    }, ensure_ascii=False).encode('utf-8')
+
+    size = len(LOG_MAGIC) + _HEADER_LENGTH.size + len(header)
+    header += b' ' * (-size % 8)
+    return LOG_MAGIC + _HEADER_LENGTH.pack(len(header)) + header
+
+def read_header(buffer) -> Tuple[Dict[str, Any], int]:
+    """
+    解析分段檔頭
+
+    返回:
+        Tuple[Dict, int]: (檔頭內容, 記錄區段起點)
+    """
+    if bytes(buffer[:len(LOG_MAGIC)]) != LOG_MAGIC:
+        raise ValueError("不是遙測日誌分段檔案")
+    offset = len(LOG_MAGIC)
+    (length,) = _HEADER_LENGTH.unpack_from(buffer, offset)
+    offset += _HEADER_LENGTH.size
+    header = json.loads(bytes(buffer[offset:offset + length]).decode('utf-8'))
+    if header.get('version') != LOG_FORMAT_VERSION:
+        raise ValueError(f"不支援的日誌版本: {header.get('version')}")
+    return header, offset + length
+
+def _segment_start(path: Path) -> float:
+    """由檔名取得分段起始時間"""
+    return float(path.stem)
+
+class _SegmentWriter:
+    """單一序列目前寫入中的分段"""
+
+    def __init__(self, path: Path, start_time: float, fields: Tuple[str, ...], buffer_size: int):
+        self.path = path
+        self.start_time = start_time
+        self.record = struct.Struct('<d' + 'd' * len(fields))
+        self.dtype = record_dtype(fields)
+        self.file = open(path, 'ab', buffering=buffer_size)
+        self.last_timestamp = float('-inf')
+        self.records = 0
+
+class FlightRecorder:
+    """
+    遙測飛行日誌記錄器（執行緒安全）
+
+    用法:
+        recorder = FlightRecorder()
+        recorder.record('UAV1', 'attitude', time.time(), (roll, pitch, yaw))
+    """
+
+    def __init__(self,
+                 root: Optional[str] = None,
+                 series: Optional[Dict[str, Tuple[str, ...]]] = None,
+                 segment_seconds: Optional[float] = None,
+                 retention_days: Optional[float] = None,
+                 buffer_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None):
+        """
+        初始化記錄器
+
+        參數:
+            root: 日誌根目錄
+            series: 數據序列定義，預設為 HISTORY_SERIES
+            segment_seconds: 每個分段涵蓋的時間長度（秒）
+            retention_days: 分段保留天數，超過時刪除
+            buffer_size: 每個分段的寫入緩衝區大小（字節）
+            flush_interval: 最長的緩衝時間（秒），超過時把緩衝區寫入磁碟
+        """
+        self.root = Path(root or config.DATA_STORE_PATH)
+        self.series = dict(series or HISTORY_SERIES)
+        self.segment_seconds = segment_seconds or config.DATA_SEGMENT_SECONDS
+        self.retention_days = config.DATA_RETENTION_DAYS if retention_days is None else retention_days
+        self.buffer_size = buffer_size or config.DATA_WRITE_BUFFER
+        self.flush_interval = config.DATA_FLUSH_INTERVAL if flush_interval is None else flush_interval
+
+        self.lock = threading.Lock()
+        self._writers: Dict[Tuple[str, str], _SegmentWriter] = {}
+        self._last_flush = time.monotonic()
+        self.closed = False
+
+        # 統計
+        self.stats = {
+            'records': 0,
+            'bytes': 0,
+            'segments_created': 0,
+            'segments_purged': 0,
+            'write_errors': 0
+        }
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.purge_expired()
+        logger.info(f"飛行日誌記錄器初始化完成 (目錄: {self.root}, 分段: {self.segment_seconds}s, 保留: {self.retention_days}天)")
+
+    def _writer(self, vehicle_id: str, series: str, timestamp: float) -> _SegmentWriter:
+        """取得序列目前的分段，超過分段時間時換新分段（呼叫端須持有鎖）"""
+        key = (vehicle_id, series)
+        writer = self._writers.get(key)
+        if writer is not None and timestamp < writer.start_time + self.segment_seconds:
+            return writer
+
+        if writer is not None:
+            writer.file.close()
+            self.purge_expired()
+
+        fields = self.series[series]
+        directory = self.root / vehicle_id / series
+        directory.mkdir(parents=True, exist_ok=True)
+
+        # 分段起始時間對齊分段長度，檔名即可用來定位時間範圍
+        start_time = timestamp - (timestamp % self.segment_seconds)
+        path = directory / f"{int(start_time):010d}{SEGMENT_SUFFIX}"
+        last_timestamp = self._recover_segment(path, fields) if path.exists() else None
+
+        writer = _SegmentWriter(path, start_time, fields, self.buffer_size)
+        if last_timestamp is None:
+            writer.file.write(encode_header(vehicle_id, series, fields, time.time()))
+            self.stats['segments_created'] += 1
+        else:
+            writer.last_timestamp = last_timestamp
+        self._writers[key] = writer
+        return writer
+
+    def _recover_segment(self, path: Path, fields: Tuple[str, ...]) -> Optional[float]:
+        """
+        重新開啟既有的分段（例如程式在同一分段時間內重新啟動）：
+        截掉上次異常結束時不完整的記錄，使追加的記錄保持對齊
+
+        返回:
+            Optional[float]: 最後一筆記錄的時間戳，分段無法使用時返回None（將被覆寫）
+        """
+        dtype = record_dtype(fields)
+        with open(path, 'r+b') as f:
+            data = f.read()
+            try:
+                header, offset = read_header(data)
+            except (ValueError, struct.error):
+                f.truncate(0)
+                return None
+            if tuple(header['fields']) != tuple(fields):
+                logger.warning(f"日誌分段欄位不符，重新建立: {path}")
+                f.truncate(0)
+                return None
+
+            count = (len(data) - offset) // dtype.itemsize
+            valid_size = offset + count * dtype.itemsize
+            if valid_size != len(data):
+                logger.warning(f"截掉日誌分段結尾不完整的記錄 ({len(data) - valid_size} 字節): {path}")
+                f.truncate(valid_size)
+
+        if count == 0:
+            return float('-inf')
+        return float(np.frombuffer(data, dtype=dtype, count=1,
+                                   offset=offset + (count - 1) * dtype.itemsize)['timestamp'][0])
+
+    def record(self, vehicle_id: str, series: str, timestamp: float, values: Iterable[float]) -> None:
+        """
+        記錄一個數據點
+
+        參數:
+            vehicle_id: 載具ID
+            series: 數據序列名稱
+            timestamp: 時間戳（秒）
+            values: 依序列欄位順序排列的數值
+        """
+        with self.lock:
+            if self.closed:
+                return
+            try:
+                writer = self._writer(vehicle_id, series, timestamp)
+                # 分段內的時間戳保持單調，讀取端才能以二分搜尋定位
+                if timestamp < writer.last_timestamp:
+                    timestamp = writer.last_timestamp
+                writer.last_timestamp = timestamp
+
+                writer.file.write(writer.record.pack(timestamp, *values))
+                writer.records += 1
+                self.stats['records'] += 1
+                self.stats['bytes'] += writer.record.size
+                self._maybe_flush()
+            except (OSError, struct.error) as e:
+                self.stats['write_errors'] += 1
+                logger.error(f"寫入飛行日誌失敗 ({vehicle_id} {series}): {e}")
+
+    def record_batch(self, vehicle_id: str, series: str,
+                     timestamps: np.ndarray, columns: np.ndarray) -> None:
+        """
+        批次記錄數據點
+
+        參數:
+            timestamps: 時間戳陣列（秒）
+            columns: 形狀為 (欄位數, 點數) 的數值陣列
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        if len(timestamps) == 0:
+            return
+        columns = np.asarray(columns, dtype=np.float64).reshape(len(self.series[series]), -1)
+
+        with self.lock:
+            if self.closed:
+                return
+            try:
+                start = 0
+                while start < len(timestamps):
+                    writer = self._writer(vehicle_id, series, float(timestamps[start]))
+
+                    # 同一分段內的數據點一次寫入
+                    segment_end = writer.start_time + self.segment_seconds
+                    end = start + int(np.searchsorted(timestamps[start:], segment_end, side='left'))
+                    end = max(end, start + 1)
+
+                    records = np.empty(end - start, dtype=writer.dtype)
+                    records['timestamp'] = np.maximum.accumulate(
+                        np.maximum(timestamps[start:end], writer.last_timestamp))
+                    for name, column in zip(writer.dtype.names[1:], columns[:, start:end]):
+                        records[name] = column
+
+                    writer.file.write(records.tobytes())
+                    writer.last_timestamp = float(records['timestamp'][-1])
+                    writer.records += len(records)
+                    self.stats['records'] += len(records)
+                    self.stats['bytes'] += records.nbytes
+                    start = end
+
+                self._maybe_flush()
+            except OSError as e:
+                self.stats['write_errors'] += 1
+                logger.error(f"批次寫入飛行日誌失敗 ({vehicle_id} {series}): {e}")
+
+    def _maybe_flush(self) -> None:
+        """距離上次寫入磁碟超過 flush_interval 時寫入所有緩衝區（呼叫端須持有鎖）"""
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_interval:
+            self._flush_locked()
+            self._last_flush = now
+
+    def _flush_locked(self) -> None:
+        for writer in self._writers.values():
+            writer.file.flush()
+
+    def flush(self) -> None:
+        """把所有緩衝區寫入磁碟"""
+        with self.lock:
+            self._flush_locked()
+            self._last_flush = time.monotonic()
+
+    def purge_expired(self) -> int:
+        """
+        刪除超過保留天數的分段（不刪除寫入中的分段）
+
+        返回:
+            int: 刪除的分段數量
+        """
+        if not self.retention_days or self.retention_days <= 0:
+            return 0
+
+        cutoff = time.time() - self.retention_days * 86400
+        active = {writer.path for writer in self._writers.values()}
+        purged = 0
+        for path in self.root.glob(f'*/*/*{SEGMENT_SUFFIX}'):
+            try:
+                # 分段的最後時間 = 起始時間 + 分段長度
+                if path in active or _segment_start(path) + self.segment_seconds >= cutoff:
+                    continue
+                path.unlink()
+                purged += 1
+            except (ValueError, OSError) as e:
+                logger.warning(f"刪除過期日誌分段失敗 {path}: {e}")
+
+        if purged:
+            self.stats['segments_purged'] += purged
+            logger.info(f"已刪除 {purged} 個過期日誌分段")
+        return purged
+
+    def close(self) -> None:
+        """寫入並關閉所有分段"""
+        with self.lock:
+            for writer in self._writers.values():
+                try:
+                    writer.file.close()
+                except OSError as e:
+                    logger.warning(f"關閉日誌分段失敗 {writer.path}: {e}")
+            self._writers.clear()
+            self.closed = True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取記錄統計"""
+        with self.lock:
+            stats = dict(self.stats)
+            stats['open_segments'] = len(self._writers)
+        stats['root'] = str(self.root)
+        return stats
+
+class LogSegment:
+    """
+    以 mmap 映射的唯讀分段
+    records 為直接指向映射記憶體的結構化陣列（不複製），使用完畢請呼叫 close()
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.start_time = _segment_start(self.path)
+        self._file = open(self.path, 'rb')
+        self._mmap = None
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.header, offset = read_header(self._mmap)
+        except (ValueError, struct.error) as e:
+            # 空檔案無法映射，或檔頭尚未完整寫入
+            if self._mmap is not None:
+                self._mmap.close()
+            self._file.close()
+            raise ValueError(f"無法讀取日誌分段 {self.path}: {e}")
+
+        self.fields = tuple(self.header['fields'])
+        self.dtype = record_dtype(self.fields)
+
+        # 記錄區在檔案中的起始偏移；寫入中的分段可能以不完整的記錄結尾，只映射完整的部分
+        self.data_offset = offset
+        count = (len(self._mmap) - offset) // self.dtype.itemsize
+        self.records = np.frombuffer(self._mmap, dtype=self.dtype, count=count, offset=offset)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __enter__(self) -> 'LogSegment':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def slice(self, start_time: Optional[float] = None,
+              end_time: Optional[float] = None) -> np.ndarray:
+        """以二分搜尋取得時間範圍內的記錄（仍為映射記憶體的視圖）"""
+        timestamps = self.records['timestamp']
+        lo = 0 if start_time is None else int(np.searchsorted(timestamps, start_time, side='left'))
+        hi = len(timestamps) if end_time is None else int(np.searchsorted(timestamps, end_time, side='right'))
+        return self.records[lo:max(lo, hi)]
+
+    def close(self) -> None:
+        # 先釋放指向映射記憶體的陣列，否則 mmap 無法關閉
+        self.records = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            # 仍有外部視圖引用映射記憶體，交由垃圾回收處理
+            pass
+        self._file.close()
+
+class FlightLogReader:
+    """
+    飛行日誌讀取器
+    依分段檔名定位時間範圍，只映射需要的分段
+    """
+
+    def __init__(self, root: Optional[str] = None, segment_seconds: Optional[float] = None):
+        self.root = Path(root or config.DATA_STORE_PATH)
+        self.segment_seconds = segment_seconds or config.DATA_SEGMENT_SECONDS
+
+    def vehicle_ids(self) -> List[str]:
+        """有日誌的載具ID"""
+        if not self.root.is_dir():
+            return []
+        return sorted(path.name for path in self.root.iterdir() if path.is_dir())
+
+    def series_names(self, vehicle_id: str) -> List[str]:
+        """載具有日誌的數據序列"""
+        directory = self.root / vehicle_id
+        if not directory.is_dir():
+            return []
+        return sorted(path.name for path in directory.iterdir() if path.is_dir())
+
+    def segments(self, vehicle_id: str, series: str,
+                 start_time: Optional[float] = None,
+                 end_time: Optional[float] = None) -> List[Path]:
+        """時間範圍內的分段檔案（依時間排序）"""
+        directory = self.root / vehicle_id / series
+        if not directory.is_dir():
+            return []
+
+        paths = []
+        for path in directory.glob(f'*{SEGMENT_SUFFIX}'):
+            try:
+                segment_start = _segment_start(path)
+            except ValueError:
+                continue
+            if end_time is not None and segment_start > end_time:
+                continue
+            if start_time is not None and segment_start + self.segment_seconds < start_time:
+                continue
+            paths.append(path)
+        return sorted(paths, key=_segment_start)
+
+    def iter_chunks(self, vehicle_id: str, series: str,
+                    start_time: Optional[float] = None,
+                    end_time: Optional[float] = None) -> Iterator[np.ndarray]:
+        """
+        逐個分段返回時間範圍內的記錄（複製後返回，分段隨即關閉）
+
+        返回:
+            Iterator[np.ndarray]: 結構化陣列，欄位為 timestamp 與序列欄位
+        """
+        for path in self.segments(vehicle_id, series, start_time, end_time):
+            try:
+                segment = LogSegment(path)
+            except (ValueError, OSError) as e:
+                logger.debug(f"略過無法讀取的日誌分段 {path}: {e}")
+                continue
+
+            # 先複製再關閉分段，不在生成器暫停期間佔用映射
+            with segment:
+                chunk = segment.slice(start_time, end_time).copy()
+            if len(chunk):
+                yield chunk
+
+    def read(self, vehicle_id: str, series: str,
+             start_time: Optional[float] = None,
+             end_time: Optional[float] = None) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        讀取時間範圍內的列數據
+
+        返回:
+            Tuple[np.ndarray, Dict[str, np.ndarray]]: (時間戳陣列, {欄位名稱: 數值陣列})
+        """
+        chunks = list(self.iter_chunks(vehicle_id, series, start_time, end_time))
+        fields = HISTORY_SERIES.get(series, ())
+        if not chunks:
+            return np.empty(0), {name: np.empty(0) for name in fields}
+
+        records = np.concatenate(chunks)
+        names = records.dtype.names[1:]
+        return records['timestamp'], {name: records[name] for name in names}
+
+    def time_range(self, vehicle_id: str) -> Optional[Tuple[float, float]]:
+        """
+        載具日誌的時間範圍
+
+        返回:
+            Tuple[float, float]: (最早時間, 最晚時間)，無數據時返回None
+        """
+        starts, ends = [], []
+        for series in self.series_names(vehicle_id):
+            paths = self.segments(vehicle_id, series)
+            for path in (paths[:1] + paths[-1:]):
+                try:
+                    with LogSegment(path) as segment:
+                        if len(segment):
+                            starts.append(float(segment.records['timestamp'][0]))
+                            ends.append(float(segment.records['timestamp'][-1]))
+                except (ValueError, OSError):
+                    continue
+
+        if not starts:
+            return None
+        return min(starts), max(ends)
@@ -0,0 +1,258 @@
+"""
+飛行日誌回放模組 - 以稀疏時間索引定位並按時間範圍回放日誌
+每個分段每隔 REPLAY_INDEX_STRIDE 筆記錄建立一個（時間戳, 檔案偏移）索引點，
+查詢時先在索引中二分搜尋出所在的區塊，再只在該區塊內搜尋，
+因此回看數小時的飛行記錄時可直接跳到指定時間，不需要從頭掃描分段
+"""
+import time
+import threading
+import itertools
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Dict, Any, Tuple, Iterator, Callable
+import numpy as np
+
+# 導入配置
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+
+from .recorder import FlightLogReader, LogSegment
+
+# 設定日誌
+logger = logging.getLogger(__name__)
+
+class SparseIndex:
+    """
+    單一分段的稀疏時間索引
+    timestamps[i] 為第 i * stride 筆記錄的時間戳，offsets[i] 為該記錄在檔案中的字節偏移
+    """
+
+    def __init__(self, stride: int):
+        if stride <= 0:
+            raise ValueError(f"索引間隔必須大於0: {stride}")
+
+        self.stride = stride
+        self.timestamps = np.empty(0, dtype=np.float64)
+        self.offsets = np.empty(0, dtype=np.int64)
+        self.count = 0  # 已索引的分段記錄數
+
+    def update(self, segment: LogSegment) -> None:
+        """補上分段新增記錄的索引點（寫入中的分段會持續增長）"""
+        count = len(segment)
+        if count == self.count:
+            return
+
+        positions = np.arange(len(self.timestamps) * self.stride, count, self.stride)
+        if len(positions):
+            self.timestamps = np.concatenate((self.timestamps, segment.records['timestamp'][positions]))
+            self.offsets = np.concatenate(
+                (self.offsets, segment.data_offset + positions * segment.dtype.itemsize))
+        self.count = count
+
+    def locate(self, segment: LogSegment, timestamp: float, side: str = 'left') -> int:
+        """
+        以索引定位記錄位置（語義同 np.searchsorted）
+
+        返回:
+            int: 第一筆時間戳 >= timestamp（side='right' 時為 > timestamp）的記錄索引
+        """
+        block = int(np.searchsorted(self.timestamps, timestamp, side=side))
+        if block == 0:
+            return 0
+
+        # 答案位於前一個索引點與此索引點之間
+        itemsize = segment.dtype.itemsize
+        lo = int(self.offsets[block - 1] - segment.data_offset) // itemsize
+        hi = self.count if block == len(self.offsets) else \
+            int(self.offsets[block] - segment.data_offset) // itemsize
+        timestamps = segment.records['timestamp'][lo:hi]
+        return lo + int(np.searchsorted(timestamps, timestamp, side=side))
+
+class ReplayService:
+    """
+    飛行日誌回放服務
+
+    用法:
+        service = ReplayService(FlightLogReader())
+        for timestamps, columns in service.replay('UAV1', 'attitude', start, end, speed=10):
+            ...  # 依 10 倍速分批取得數據
+    """
+
+    def __init__(self,
+                 reader: Optional[FlightLogReader] = None,
+                 index_stride: Optional[int] = None,
+                 chunk_size: Optional[int] = None,
+                 frame_interval: Optional[float] = None,
+                 cache_size: Optional[int] = None):
+        """
+        初始化回放服務
+
+        參數:
+            reader: 飛行日誌讀取器
+            index_stride: 稀疏索引的記錄間隔
+            chunk_size: 每次讀出的最大記錄數
+            frame_interval: 依速度回放時每個推送幀的間隔（秒）
+            cache_size: 最多快取的分段索引數量
+        """
+        self.reader = reader or FlightLogReader()
+        self.index_stride = index_stride or config.REPLAY_INDEX_STRIDE
+        self.chunk_size = chunk_size or config.REPLAY_CHUNK_SIZE
+        self.frame_interval = frame_interval or config.REPLAY_FRAME_INTERVAL
+        self.cache_size = cache_size or config.REPLAY_INDEX_CACHE
+
+        self.lock = threading.Lock()
+        self._indexes: 'OrderedDict[Path, SparseIndex]' = OrderedDict()
+
+        # 進行中的 Socket.IO 回放 {客戶端ID: {回放ID: 停止事件}}
+        self._sessions: Dict[str, Dict[int, threading.Event]] = {}
+        self._session_ids = itertools.count(1)
+
+        self.stats = {
+            'index_hits': 0,
+            'index_builds': 0,
+            'records_replayed': 0
+        }
+
+    def _get_index(self, segment: LogSegment) -> SparseIndex:
+        """取得（必要時建立或補齊）分段的稀疏索引"""
+        with self.lock:
+            index = self._indexes.get(segment.path)
+            if index is None or index.count > len(segment):
+                # 首次使用，或分段被重新建立（例如截斷損壞的尾端）
+                index = SparseIndex(self.index_stride)
+                self._indexes[segment.path] = index
+                self.stats['index_builds'] += 1
+            else:
+                self._indexes.move_to_end(segment.path)
+                self.stats['index_hits'] += 1
+
+            index.update(segment)
+            while len(self._indexes) > self.cache_size:
+                self._indexes.popitem(last=False)
+            return index
+
+    def iter_records(self, vehicle_id: str, series: str,
+                     start_time: Optional[float] = None,
+                     end_time: Optional[float] = None) -> Iterator[np.ndarray]:
+        """
+        依時間順序返回範圍內的記錄（每批最多 chunk_size 筆，已複製）
+
+        返回:
+            Iterator[np.ndarray]: 結構化陣列，欄位為 timestamp 與序列欄位
+        """
+        for path in self.reader.segments(vehicle_id, series, start_time, end_time):
+            try:
+                segment = LogSegment(path)
+            except (ValueError, OSError) as e:
+                logger.debug(f"略過無法讀取的日誌分段 {path}: {e}")
+                continue
+
+            try:
+                index = self._get_index(segment)
+                lo = 0 if start_time is None else index.locate(segment, start_time, 'left')
+                hi = len(segment) if end_time is None else index.locate(segment, end_time, 'right')
+
+                for offset in range(lo, hi, self.chunk_size):
+                    chunk = segment.records[offset:min(offset + self.chunk_size, hi)].copy()
+                    self.stats['records_replayed'] += len(chunk)
+                    yield chunk
+            finally:
+                segment.close()
+
+    def replay(self, vehicle_id: str, series: str,
+               start_time: Optional[float] = None,
+               end_time: Optional[float] = None,
+               speed: Optional[float] = None,
+               sleep: Callable[[float], None] = time.sleep,
+               stop_event: Optional[threading.Event] = None
+               ) -> Iterator[Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+        """
+        回放時間範圍內的數據
+
+        參數:
+            speed: 回放倍速，None 或 0 表示不等待、盡快返回
+            sleep: 等待函數（在 eventlet 下請傳入 socketio.sleep）
+            stop_event: 設定後停止回放
+
+        返回:
+            Iterator[Tuple[np.ndarray, Dict[str, np.ndarray]]]: (時間戳陣列, {欄位名稱: 數值陣列})
+            依速度回放時每批涵蓋 frame_interval * speed 秒的日誌時間
+        """
+        log_start = None
+        wall_start = time.monotonic()
+        span = self.frame_interval * speed if speed else None
+
+        for records in self.iter_records(vehicle_id, series, start_time, end_time):
+            if stop_event is not None and stop_event.is_set():
+                return
+
+            timestamps = records['timestamp']
+            if span is None:
+                groups = (records,)
+            else:
+                if log_start is None:
+                    log_start = float(timestamps[0])
+                # 依推送幀切分：同一幀內的記錄一起送出
+                frames = np.floor((timestamps - log_start) / span)
+                groups = np.split(records, np.flatnonzero(np.diff(frames)) + 1)
+
+            for group in groups:
+                if span is not None:
+                    due = wall_start + (float(group['timestamp'][0]) - log_start) / speed
+                    # 分段等待，長時間的數據空檔中仍能及時響應停止
+                    while True:
+                        if stop_event is not None and stop_event.is_set():
+                            return
+                        remaining = due - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        sleep(min(remaining, self.frame_interval))
+
+                names = group.dtype.names[1:]
+                yield group['timestamp'], {name: group[name] for name in names}
+
+    def start_session(self, client_id: str) -> Tuple[int, threading.Event]:
+        """登記一個客戶端的回放，返回 (回放ID, 停止事件)"""
+        replay_id = next(self._session_ids)
+        stop_event = threading.Event()
+        with self.lock:
+            self._sessions.setdefault(client_id, {})[replay_id] = stop_event
+        return replay_id, stop_event
+
+    def end_session(self, client_id: str, replay_id: int) -> None:
+        """回放結束後移除登記"""
+        with self.lock:
+            sessions = self._sessions.get(client_id)
+            if sessions is not None:
+                sessions.pop(replay_id, None)
+                if not sessions:
+                    del self._sessions[client_id]
+
+    def stop_sessions(self, client_id: str, replay_id: Optional[int] = None) -> int:
+        """
+        停止客戶端的回放
+
+        參數:
+            replay_id: 要停止的回放，None 表示停止該客戶端的所有回放
+
+        返回:
+            int: 停止的回放數量
+        """
+        with self.lock:
+            sessions = self._sessions.get(client_id, {})
+            events = list(sessions.values()) if replay_id is None else \
+                [sessions[replay_id]] if replay_id in sessions else []
+        for event in events:
+            event.set()
+        return len(events)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取索引快取與回放統計"""
+        with self.lock:
+            stats = dict(self.stats)
+            stats['cached_indexes'] = len(self._indexes)
+            stats['active_sessions'] = sum(len(s) for s in self._sessions.values())
+        stats['index_stride'] = self.index_stride
+        return stats
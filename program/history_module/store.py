@@ -0,0 +1,390 @@
+"""
+歷史數據存儲模組 - 固定容量的時間索引環形緩衝區
+每個載具的每個數據序列（姿態、RC、運動、高度）各自使用一組 NumPy 列式緩衝區，
+依時間戳淘汰舊數據（攤銷O(1)），並以單調時間索引支援O(log n)的時間窗口查詢
+"""
+import time
+import threading
+import logging
+from typing import Optional, Dict, Any, List, Tuple, Iterable
+import numpy as np
+
+# 導入配置
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+
+# 設定日誌
+logger = logging.getLogger(__name__)
+
+# 各數據序列的欄位定義（不含時間戳）
+HISTORY_SERIES = {
+    'attitude': ('roll', 'pitch', 'yaw'),
+    'rc': ('throttle', 'roll', 'pitch', 'yaw'),
+    'motion': ('groundSpeed', 'throttle'),
+    'altitude': ('altitude',),
+}
+
+def columns_to_points(timestamps: np.ndarray,
+                      columns: Dict[str, np.ndarray]) -> List[Dict[str, float]]:
+    """把列式數據轉換為前端使用的數據點列表 [{'timestamp': ..., 欄位: ...}]"""
+    keys = ('timestamp',) + tuple(columns.keys())
+    rows = zip(timestamps.tolist(), *(values.tolist() for values in columns.values()))
+    return [dict(zip(keys, row)) for row in rows]
+
+class TimeSeriesRing:
+    """
+    固定容量的列式時間序列緩衝區（NumPy）
+    時間戳與各欄位分別存放在預先分配的 float64 陣列中，數據點在陣列內保持連續，
+    因此時間窗口可直接以 searchsorted 定位並切片；寫到陣列末端時才把有效區段搬回開頭
+    """
+
+    def __init__(self, fields: Tuple[str, ...], capacity: int):
+        """
+        初始化緩衝區
+
+        參數:
+            fields: 數據欄位名稱（不含時間戳）
+            capacity: 最大數據點數
+        """
+        if capacity <= 0:
+            raise ValueError(f"環形緩衝區容量必須大於0: {capacity}")
+
+        self.fields = tuple(fields)
+        self.capacity = capacity
+
+        # 額外預留的空間，搬移有效區段的成本因此攤銷為O(1)
+        allocation = capacity + max(capacity // 4, 1)
+
+        # 預先分配的列式存儲
+        self._timestamps = np.empty(allocation, dtype=np.float64)
+        self._columns = np.empty((len(self.fields), allocation), dtype=np.float64)
+
+        # 有效數據區段 [start, end)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    @property
+    def nbytes(self) -> int:
+        """已分配的記憶體大小（字節）"""
+        return self._timestamps.nbytes + self._columns.nbytes
+
+    def _compact(self) -> None:
+        """寫入位置到達陣列末端時，把有效區段搬回開頭（NumPy 會處理重疊的複製）"""
+        size = self._end - self._start
+        self._timestamps[:size] = self._timestamps[self._start:self._end]
+        self._columns[:, :size] = self._columns[:, self._start:self._end]
+        self._start = 0
+        self._end = size
+
+    def append(self, timestamp: float, values: Tuple[float, ...]) -> None:
+        """
+        添加數據點
+
+        參數:
+            timestamp: 時間戳（秒）
+            values: 與 fields 順序一致的數值
+        """
+        if self._end > self._start:
+            # 保持時間索引單調（多個執行緒寫入時可能出現微小的時間倒退）
+            last = self._timestamps[self._end - 1]
+            if timestamp < last:
+                timestamp = last
+
+            if self._end - self._start == self.capacity:
+                # 緩衝區已滿，丟棄最舊的數據點
+                self._start += 1
+
+        if self._end == len(self._timestamps):
+            self._compact()
+
+        self._timestamps[self._end] = timestamp
+        self._columns[:, self._end] = values
+        self._end += 1
+
+    def extend(self, timestamps: np.ndarray, columns: np.ndarray) -> None:
+        """
+        批次添加數據點（向量化複製，用於批次解碼的數據包）
+
+        參數:
+            timestamps: 時間戳陣列（秒）
+            columns: 形狀為 (欄位數, 點數) 的數值陣列
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        columns = np.asarray(columns, dtype=np.float64).reshape(len(self.fields), -1)
+        count = len(timestamps)
+        if count == 0:
+            return
+        if columns.shape[1] != count:
+            raise ValueError(f"欄位數據點數 {columns.shape[1]} 與時間戳數 {count} 不符")
+
+        # 保持時間索引單調
+        if self._end > self._start:
+            timestamps = np.maximum(timestamps, self._timestamps[self._end - 1])
+        timestamps = np.maximum.accumulate(timestamps)
+
+        if count >= self.capacity:
+            # 批次本身已超過容量，只保留最新的數據點
+            self._timestamps[:self.capacity] = timestamps[-self.capacity:]
+            self._columns[:, :self.capacity] = columns[:, -self.capacity:]
+            self._start = 0
+            self._end = self.capacity
+            return
+
+        # 超過容量的部分從最舊的數據點丟棄
+        overflow = (self._end - self._start) + count - self.capacity
+        if overflow > 0:
+            self._start += overflow
+
+        if self._end + count > len(self._timestamps):
+            self._compact()
+
+        self._timestamps[self._end:self._end + count] = timestamps
+        self._columns[:, self._end:self._end + count] = columns
+        self._end += count
+
+    def evict_before(self, cutoff_time: float) -> int:
+        """
+        淘汰早於指定時間的數據點
+
+        返回:
+            int: 被淘汰的數據點數
+        """
+        evicted = int(np.searchsorted(self._timestamps[self._start:self._end], cutoff_time, side='left'))
+        self._start += evicted
+        if self._start == self._end:
+            self._start = self._end = 0
+        return evicted
+
+    def clear(self) -> None:
+        """清空緩衝區"""
+        self._start = 0
+        self._end = 0
+
+    @property
+    def first_timestamp(self) -> Optional[float]:
+        """最舊數據點的時間戳"""
+        if self._end == self._start:
+            return None
+        return float(self._timestamps[self._start])
+
+    @property
+    def last_timestamp(self) -> Optional[float]:
+        """最新數據點的時間戳"""
+        if self._end == self._start:
+            return None
+        return float(self._timestamps[self._end - 1])
+
+    def _window_bounds(self, start_time: Optional[float],
+                       end_time: Optional[float]) -> Tuple[int, int]:
+        """以 searchsorted 計算時間窗口對應的陣列區段"""
+        timestamps = self._timestamps[self._start:self._end]
+        lo = 0 if start_time is None else int(np.searchsorted(timestamps, start_time, side='left'))
+        hi = len(timestamps) if end_time is None else int(np.searchsorted(timestamps, end_time, side='right'))
+        return self._start + lo, self._start + max(lo, hi)
+
+    def window_arrays(self, start_time: Optional[float] = None,
+                      end_time: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        獲取時間窗口內的列數據（複製）
+
+        返回:
+            Tuple[np.ndarray, np.ndarray]: (時間戳陣列, 形狀為 (欄位數, 點數) 的數值陣列)
+        """
+        lo, hi = self._window_bounds(start_time, end_time)
+        return self._timestamps[lo:hi].copy(), self._columns[:, lo:hi].copy()
+
+    def window(self, start_time: Optional[float] = None,
+               end_time: Optional[float] = None) -> List[Dict[str, float]]:
+        """
+        獲取時間窗口內的數據點
+
+        參數:
+            start_time: 起始時間（含），None表示最舊
+            end_time: 結束時間（含），None表示最新
+
+        返回:
+            List[Dict]: 含 'timestamp' 與各欄位的數據點列表
+        """
+        lo, hi = self._window_bounds(start_time, end_time)
+        return columns_to_points(self._timestamps[lo:hi],
+                                 dict(zip(self.fields, self._columns[:, lo:hi])))
+
+    def tail(self, count: int) -> List[Dict[str, float]]:
+        """獲取最新的 count 個數據點"""
+        lo = max(self._start, self._end - max(count, 0))
+        return columns_to_points(self._timestamps[lo:self._end],
+                                 dict(zip(self.fields, self._columns[:, lo:self._end])))
+
+class HistoryStore:
+    """
+    載具歷史數據存儲
+    管理每個載具各數據序列的環形緩衝區，並依回放緩衝時間淘汰舊數據
+    """
+
+    def __init__(self,
+                 vehicle_ids: Iterable[str],
+                 retention_seconds: float,
+                 capacity: Optional[int] = None,
+                 series: Optional[Dict[str, Tuple[str, ...]]] = None,
+                 recorder=None):
+        """
+        初始化歷史數據存儲
+
+        參數:
+            vehicle_ids: 載具ID列表
+            retention_seconds: 數據保留時間（秒）
+            capacity: 每個序列的最大數據點數
+            series: 數據序列定義，預設為 HISTORY_SERIES
+            recorder: 飛行日誌記錄器（FlightRecorder），提供時每個數據點同時寫入磁碟
+        """
+        self.retention_seconds = retention_seconds
+        self.capacity = capacity or config.HISTORY_MAX_POINTS
+        self.series = dict(series or HISTORY_SERIES)
+        self.recorder = recorder
+        self.lock = threading.Lock()
+
+        self._buffers: Dict[str, Dict[str, TimeSeriesRing]] = {}
+        for vehicle_id in vehicle_ids:
+            self.add_vehicle(vehicle_id)
+
+        logger.info(f"歷史數據存儲初始化完成 (容量: {self.capacity} 點/序列, 保留: {retention_seconds}s)")
+
+    def __contains__(self, vehicle_id: str) -> bool:
+        return vehicle_id in self._buffers
+
+    @property
+    def vehicle_ids(self) -> List[str]:
+        return list(self._buffers.keys())
+
+    def add_vehicle(self, vehicle_id: str) -> None:
+        """為載具建立各數據序列的環形緩衝區"""
+        with self.lock:
+            if vehicle_id in self._buffers:
+                return
+            self._buffers[vehicle_id] = {
+                name: TimeSeriesRing(fields, self.capacity)
+                for name, fields in self.series.items()
+            }
+
+    def set_retention(self, retention_seconds: float) -> None:
+        """更新數據保留時間（回放緩衝）"""
+        with self.lock:
+            self.retention_seconds = retention_seconds
+
+    def _expire(self, ring: TimeSeriesRing, current_time: float) -> None:
+        """淘汰超過保留時間的數據點"""
+        ring.evict_before(current_time - self.retention_seconds)
+
+    def append(self, vehicle_id: str, series: str, timestamp: float, *values: float) -> None:
+        """
+        添加數據點
+
+        參數:
+            vehicle_id: 載具ID
+            series: 數據序列名稱（attitude、rc、motion、altitude）
+            timestamp: 時間戳（秒）
+            values: 依序列欄位順序排列的數值
+        """
+        with self.lock:
+            ring = self._buffers[vehicle_id][series]
+            if len(values) != len(ring.fields):
+                raise ValueError(f"{series} 需要 {len(ring.fields)} 個數值，收到 {len(values)} 個")
+            ring.append(timestamp, values)
+            self._expire(ring, timestamp)
+
+        if self.recorder is not None:
+            self.recorder.record(vehicle_id, series, timestamp, values)
+
+    def extend(self, vehicle_id: str, series: str, timestamps: np.ndarray, *columns: np.ndarray) -> None:
+        """
+        批次添加數據點
+
+        參數:
+            vehicle_id: 載具ID
+            series: 數據序列名稱
+            timestamps: 時間戳陣列（秒）
+            columns: 依序列欄位順序排列的數值陣列
+        """
+        with self.lock:
+            ring = self._buffers[vehicle_id][series]
+            if len(columns) != len(ring.fields):
+                raise ValueError(f"{series} 需要 {len(ring.fields)} 個欄位，收到 {len(columns)} 個")
+            if len(timestamps) == 0:
+                return
+            stacked = np.vstack(columns)
+            ring.extend(timestamps, stacked)
+            self._expire(ring, float(timestamps[-1]))
+
+        if self.recorder is not None:
+            self.recorder.record_batch(vehicle_id, series, timestamps, stacked)
+
+    def window(self, vehicle_id: str, series: str,
+               start_time: Optional[float] = None,
+               end_time: Optional[float] = None) -> List[Dict[str, float]]:
+        """獲取指定序列在時間窗口內的數據點"""
+        with self.lock:
+            ring = self._buffers[vehicle_id][series]
+            self._expire(ring, time.time())
+            return ring.window(start_time, end_time)
+
+    def window_arrays(self, vehicle_id: str, series: str,
+                      start_time: Optional[float] = None,
+                      end_time: Optional[float] = None) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        獲取指定序列在時間窗口內的列數據（用於降採樣與分析）
+
+        返回:
+            Tuple[np.ndarray, Dict[str, np.ndarray]]: (時間戳陣列, {欄位名稱: 數值陣列})
+        """
+        with self.lock:
+            ring = self._buffers[vehicle_id][series]
+            self._expire(ring, time.time())
+            timestamps, columns = ring.window_arrays(start_time, end_time)
+        return timestamps, dict(zip(ring.fields, columns))
+
+    def snapshot(self, vehicle_id: str,
+                 start_time: Optional[float] = None,
+                 end_time: Optional[float] = None) -> Dict[str, List[Dict[str, float]]]:
+        """獲取載具所有序列在時間窗口內的數據點"""
+        return {
+            name: self.window(vehicle_id, name, start_time, end_time)
+            for name in self.series
+        }
+
+    def time_range(self, vehicle_id: str) -> Optional[Tuple[float, float]]:
+        """
+        獲取載具歷史數據的時間範圍
+
+        返回:
+            Tuple[float, float]: (最早時間, 最晚時間)，無數據時返回None
+        """
+        with self.lock:
+            current_time = time.time()
+            starts, ends = [], []
+            for ring in self._buffers[vehicle_id].values():
+                self._expire(ring, current_time)
+                if len(ring):
+                    starts.append(ring.first_timestamp)
+                    ends.append(ring.last_timestamp)
+
+            if not starts:
+                return None
+            return min(starts), max(ends)
+
+    @property
+    def nbytes(self) -> int:
+        """所有緩衝區已分配的記憶體大小（字節）"""
+        return sum(ring.nbytes for rings in self._buffers.values() for ring in rings.values())
+
+    def clear(self, vehicle_id: Optional[str] = None) -> None:
+        """清空歷史數據"""
+        with self.lock:
+            vehicle_ids = [vehicle_id] if vehicle_id else list(self._buffers.keys())
+            for vid in vehicle_ids:
+                for ring in self._buffers[vid].values():
+                    ring.clear()
@@ -0,0 +1,33 @@
+"""
+LIDAR 模組 - UGV 光達數據中繼
+提供掃描的 NumPy 解析、角度分格 / 體素格降採樣與 Float32 二進位打包，
+以及只向樹莓派開一條上游連線、以固定頻率上限轉發給瀏覽器的 LIDAR 中繼，
+和以 UGV 位姿融合掃描、按圖塊快取編碼的佔據柵格地圖
+"""
+
+from .scan import (
+    LidarScan, parse_scan, scan_points, decimate_scan, decimate_angle_bins, decimate_voxels,
+    pack_frame, unpack_frame, LIDAR_FRAME_HEADER, LIDAR_FRAME_VERSION, DECIMATION_METHODS
+)
+from .relay import LidarRelay
+from .occupancy import OccupancyGrid, encode_tile, TILE_FORMATS
+
+__all__ = [
+    'LidarScan',
+    'parse_scan',
+    'scan_points',
+    'decimate_scan',
+    'decimate_angle_bins',
+    'decimate_voxels',
+    'pack_frame',
+    'unpack_frame',
+    'LIDAR_FRAME_HEADER',
+    'LIDAR_FRAME_VERSION',
+    'DECIMATION_METHODS',
+    'LidarRelay',
+    'OccupancyGrid',
+    'encode_tile',
+    'TILE_FORMATS'
+]
+
+__version__ = '1.0.0'
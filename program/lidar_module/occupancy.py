@@ -0,0 +1,364 @@
+"""
+佔據柵格模組 - 以 UGV 位姿把 LIDAR 掃描融合進 log-odds 柵格地圖
+每圈掃描以 NumPy 一次算出所有光束經過的空閒格與終點的佔據格（向量化的格線穿越計算），
+地圖切成固定大小的圖塊，每次融合只把實際變動的圖塊標為髒，
+圖塊以 PNG（需 Pillow）或 uint8 二進位編碼後快取，只有髒圖塊在下次請求時重新編碼
+"""
+import io
+import math
+import time
+import threading
+import logging
+from pathlib import Path
+from typing import Optional, Dict, Any, Tuple
+import numpy as np
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# 導入配置
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+
+from .scan import LidarScan, scan_points
+
+# 設定日誌
+logger = logging.getLogger(__name__)
+
+# 圖塊編碼格式 {格式: MIME 類型}
+TILE_FORMATS = {
+    'png': 'image/png',                 # 灰階 + 透明度：佔據為黑、空閒為白、未觀測為透明
+    'bin': 'application/octet-stream'   # 逐列 uint8：0 為未觀測，1-255 對應佔據機率 0-1
+}
+
+# 經緯度換算為本地米座標（等距圓柱近似，地圖範圍數百米內誤差可忽略）
+EARTH_RADIUS = 6378137.0
+
+def grid_crossings(start: float, delta: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    每條光束穿過的整數格線（單一座標軸）
+
+    參數:
+        start: 光束起點（格座標）
+        delta: 每條光束在此軸上的位移（格）
+
+    返回:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: (格線座標, 穿越點在光束上的參數 t ∈ (0, 1), 所屬光束索引)
+    """
+    end = start + delta
+    first = np.floor(np.minimum(start, end)) + 1
+    last = np.ceil(np.maximum(start, end)) - 1
+    counts = np.maximum(last - first + 1, 0).astype(np.int64)
+
+    ray = np.repeat(np.arange(len(delta)), counts)
+    lines = first[ray] + (np.arange(len(ray)) - np.repeat(np.cumsum(counts) - counts, counts))
+    return lines, (lines - start) / delta[ray], ray
+
+def traverse_cells(start_col: float, start_row: float,
+                   delta_col: np.ndarray, delta_row: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    光束經過的所有格（含起點與終點格，可能重複）
+    光束每穿過一條欄或列格線就進入一個新格，由穿越點即可算出該格，
+    結果與逐格 DDA 走訪相同，不會漏掉只被光束斜穿一角的格
+
+    返回:
+        Tuple[np.ndarray, np.ndarray]: 各格內一點的浮點格座標 (欄, 列)
+    """
+    lines, t, ray = grid_crossings(start_col, delta_col)
+    # 穿過欄格線 x = lines 後進入的格：往東為 lines 欄、往西為 lines - 1 欄
+    cols = [np.array([start_col]), lines + 0.5 * np.sign(delta_col[ray])]
+    rows = [np.array([start_row]), start_row + t * delta_row[ray]]
+
+    lines, t, ray = grid_crossings(start_row, delta_row)
+    cols.append(start_col + t * delta_col[ray])
+    rows.append(lines + 0.5 * np.sign(delta_row[ray]))
+    return np.concatenate(cols), np.concatenate(rows)
+
+def encode_tile(log_odds: np.ndarray, observed: np.ndarray, fmt: str = 'png') -> bytes:
+    """
+    把一個圖塊編碼為 PNG 或 uint8 二進位
+
+    參數:
+        log_odds: 圖塊的 log-odds 值（第 0 列為北側）
+        observed: 圖塊中已觀測過的格
+        fmt: 'png' 或 'bin'
+    """
+    if fmt not in TILE_FORMATS:
+        raise ValueError(f"未知的圖塊格式: {fmt} (可用: {list(TILE_FORMATS)})")
+
+    probability = 1.0 / (1.0 + np.exp(-log_odds))
+    if fmt == 'bin':
+        values = np.where(observed, 1.0 + np.round(probability * 254.0), 0.0)
+        return values.astype(np.uint8).tobytes()
+
+    if Image is None:
+        raise RuntimeError('PNG 圖塊需要安裝 Pillow')
+
+    pixels = np.empty(log_odds.shape + (2,), dtype=np.uint8)
+    pixels[..., 0] = np.round(255.0 * (1.0 - probability))
+    pixels[..., 1] = np.where(observed, 255, 0)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+class OccupancyGrid:
+    """
+    以原點為中心的正方形 log-odds 佔據柵格
+
+    座標系: x 向東、y 向北（米）；陣列第 0 列為北側邊界，第 0 欄為西側邊界，
+    因此圖塊 (tx, ty) 可直接當作影像貼到地圖上（ty 由北往南遞增）
+
+    用法:
+        grid = OccupancyGrid()
+        grid.integrate_geo(scan, lat, lon, heading_deg)   # LIDAR 接收線程
+        version, data = grid.tile(3, 5, 'png')             # 只有變動過的圖塊會重新編碼
+    """
+
+    def __init__(self,
+                 resolution: Optional[float] = None,
+                 size: Optional[float] = None,
+                 tile_size: Optional[int] = None,
+                 origin: Optional[Tuple[float, float]] = None,
+                 max_range: Optional[float] = None,
+                 yaw_offset_deg: Optional[float] = None,
+                 log_odds_hit: Optional[float] = None,
+                 log_odds_miss: Optional[float] = None,
+                 log_odds_limit: Optional[float] = None):
+        """
+        初始化佔據柵格
+
+        參數:
+            resolution: 每格邊長（米）
+            size: 地圖邊長（米）
+            tile_size: 圖塊邊長（格）
+            origin: 原點 (lat, lon)，None 表示以第一圈掃描時的位置為原點
+            max_range: 融合的最大距離（米）
+            yaw_offset_deg: LIDAR 安裝方向相對車頭的偏角（度，逆時針為正）
+            log_odds_hit / log_odds_miss: 佔據 / 空閒的 log-odds 增量
+            log_odds_limit: log-odds 上下限
+        """
+        self.resolution = resolution or config.LIDAR_GRID_RESOLUTION
+        self.tile_size = tile_size or config.LIDAR_GRID_TILE_SIZE
+        self.max_range = max_range or config.LIDAR_GRID_MAX_RANGE
+        self.yaw_offset = math.radians(config.LIDAR_GRID_YAW_OFFSET_DEG if yaw_offset_deg is None
+                                       else yaw_offset_deg)
+        self.log_odds_hit = log_odds_hit or config.LIDAR_GRID_LOG_ODDS_HIT
+        self.log_odds_miss = log_odds_miss or config.LIDAR_GRID_LOG_ODDS_MISS
+        self.log_odds_limit = log_odds_limit or config.LIDAR_GRID_LOG_ODDS_LIMIT
+
+        if origin is None and config.LIDAR_GRID_ORIGIN:
+            lat, lon = config.LIDAR_GRID_ORIGIN.split(',')
+            origin = (float(lat), float(lon))
+        self.default_origin = origin
+        self.origin = origin
+
+        # 邊長補齊為圖塊的整數倍
+        cells = math.ceil((size or config.LIDAR_GRID_SIZE) / self.resolution)
+        self.tiles_x = self.tiles_y = max(1, math.ceil(cells / self.tile_size))
+        self.width = self.height = self.tiles_x * self.tile_size
+        self.half_extent = self.width * self.resolution / 2.0
+
+        self.lock = threading.Lock()
+        self.log_odds = np.zeros((self.height, self.width), dtype=np.float32)
+        self.observed = np.zeros((self.height, self.width), dtype=bool)
+
+        # 地圖版本在每次有格變動時遞增，圖塊版本為該圖塊最後變動時的地圖版本
+        self.version = 0
+        self.tile_versions = np.zeros((self.tiles_y, self.tiles_x), dtype=np.int64)
+        # 已編碼的圖塊 {(tx, ty, 格式): (圖塊版本, 編碼數據)}
+        self._tiles: Dict[Tuple[int, int, str], Tuple[int, bytes]] = {}
+
+        # 統計
+        self.stats = {
+            'scans': 0,
+            'cells_updated': 0,
+            'out_of_bounds': 0,
+            'tiles_dirtied': 0,
+            'encodes': 0,
+            'cache_hits': 0
+        }
+        self.integrate_time = 0.0
+
+        logger.info(f"佔據柵格初始化完成 ({self.width}x{self.height} 格, {self.resolution}m/格, "
+                    f"{self.tiles_x}x{self.tiles_y} 圖塊)")
+
+    # ------------------------------------------------------------
+    # 融合
+    # ------------------------------------------------------------
+
+    def geo_to_local(self, lat: float, lon: float) -> Tuple[float, float]:
+        """經緯度轉為以原點為中心的本地座標 (x 向東, y 向北)，尚未設定原點時以此位置為原點"""
+        if self.origin is None:
+            self.origin = (lat, lon)
+            logger.info(f"佔據柵格原點: {lat:.6f}, {lon:.6f}")
+
+        origin_lat, origin_lon = self.origin
+        x = math.radians(lon - origin_lon) * EARTH_RADIUS * math.cos(math.radians(origin_lat))
+        y = math.radians(lat - origin_lat) * EARTH_RADIUS
+        return x, y
+
+    def integrate_geo(self, scan: LidarScan, lat: float, lon: float, heading_deg: float) -> int:
+        """
+        以 GPS 位置與航向融合一圈掃描
+
+        參數:
+            heading_deg: 航向（度，正北為 0、順時針為正，同 attitude.yawDeg）
+        """
+        x, y = self.geo_to_local(lat, lon)
+        # 航向轉為本地座標系的方向角（東為 0、逆時針為正）
+        yaw = math.radians(90.0 - heading_deg)
+        return self.integrate(scan, x, y, yaw)
+
+    def _cell_indices(self, cols: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """浮點格座標轉為攤平的格索引，捨棄地圖範圍外的格"""
+        cols = np.floor(cols).astype(np.int64)
+        rows = np.floor(rows).astype(np.int64)
+        inside = (cols >= 0) & (cols < self.width) & (rows >= 0) & (rows < self.height)
+        self.stats['out_of_bounds'] += int(len(inside) - np.count_nonzero(inside))
+        return rows[inside] * self.width + cols[inside]
+
+    def integrate(self, scan: LidarScan, x: float, y: float, yaw: float) -> int:
+        """
+        以本地位姿融合一圈掃描
+
+        參數:
+            x, y: 感測器位置（米，x 向東、y 向北）
+            yaw: 車頭方向角（弧度，東為 0、逆時針為正）
+
+        返回:
+            int: 變動的格數
+        """
+        start = time.perf_counter()
+        angles, ranges, _ = scan_points(scan)
+        if len(ranges) == 0:
+            return 0
+
+        # 超出融合距離的光束截短，只清除空閒格不標記佔據
+        hit = ranges <= self.max_range
+        ranges = np.minimum(ranges, self.max_range)
+        world = angles + (yaw + self.yaw_offset)
+
+        # 格座標（欄向東、列向南）
+        start_col = (x + self.half_extent) / self.resolution
+        start_row = (self.half_extent - y) / self.resolution
+        delta_col = ranges * np.cos(world) / self.resolution
+        delta_row = -ranges * np.sin(world) / self.resolution
+
+        free = self._cell_indices(*traverse_cells(start_col, start_row, delta_col, delta_row))
+        occupied = np.unique(self._cell_indices((start_col + delta_col)[hit], (start_row + delta_row)[hit]))
+        # 同一圈中每格只更新一次，終點優先於經過
+        free = np.setdiff1d(free, occupied)
+        touched = np.concatenate((free, occupied))
+
+        with self.lock:
+            values = self.log_odds.reshape(-1)
+            values[free] = np.maximum(values[free] + self.log_odds_miss, -self.log_odds_limit)
+            values[occupied] = np.minimum(values[occupied] + self.log_odds_hit, self.log_odds_limit)
+            self.observed.reshape(-1)[touched] = True
+
+            if len(touched):
+                # 標記髒圖塊
+                rows, cols = np.divmod(touched, self.width)
+                tiles = np.unique((rows // self.tile_size) * self.tiles_x + cols // self.tile_size)
+                self.version += 1
+                self.tile_versions.reshape(-1)[tiles] = self.version
+                self.stats['tiles_dirtied'] += len(tiles)
+
+            self.stats['scans'] += 1
+            self.stats['cells_updated'] += len(touched)
+            self.integrate_time += time.perf_counter() - start
+        return len(touched)
+
+    def reset(self) -> None:
+        """清空地圖並恢復預設原點（所有圖塊的版本都會更新）"""
+        with self.lock:
+            self.log_odds.fill(0.0)
+            self.observed.fill(False)
+            self.origin = self.default_origin
+            self.version += 1
+            self.tile_versions.fill(self.version)
+            self._tiles.clear()
+        logger.info("佔據柵格已清空")
+
+    # ------------------------------------------------------------
+    # 圖塊
+    # ------------------------------------------------------------
+
+    def default_format(self) -> str:
+        """預設圖塊格式（未安裝 Pillow 時為二進位）"""
+        return 'png' if Image is not None else 'bin'
+
+    def tile(self, tx: int, ty: int, fmt: Optional[str] = None) -> Tuple[int, bytes]:
+        """
+        獲取編碼後的圖塊，自上次編碼後沒有變動則直接返回快取
+
+        返回:
+            Tuple[int, bytes]: (圖塊版本, 編碼數據)
+        """
+        fmt = fmt or self.default_format()
+        if fmt not in TILE_FORMATS:
+            raise ValueError(f"未知的圖塊格式: {fmt} (可用: {list(TILE_FORMATS)})")
+        if not (0 <= tx < self.tiles_x and 0 <= ty < self.tiles_y):
+            raise IndexError(f"圖塊超出範圍: ({tx}, {ty})")
+
+        key = (tx, ty, fmt)
+        size = self.tile_size
+        with self.lock:
+            version = int(self.tile_versions[ty, tx])
+            cached = self._tiles.get(key)
+            if cached is not None and cached[0] == version:
+                self.stats['cache_hits'] += 1
+                return cached
+
+            rows = slice(ty * size, (ty + 1) * size)
+            cols = slice(tx * size, (tx + 1) * size)
+            log_odds = self.log_odds[rows, cols].copy()
+            observed = self.observed[rows, cols].copy()
+
+        # 在鎖外編碼，不阻塞掃描融合
+        data = encode_tile(log_odds, observed, fmt)
+        with self.lock:
+            self._tiles[key] = (version, data)
+            self.stats['encodes'] += 1
+        return version, data
+
+    def get_info(self, since: int = 0) -> Dict[str, Any]:
+        """
+        地圖資訊與版本大於 since 的圖塊清單（客戶端輪詢後只需下載這些圖塊）
+
+        返回:
+            Dict: tiles 為 [[tx, ty, 版本], ...]
+        """
+        with self.lock:
+            ty, tx = np.nonzero(self.tile_versions > since)
+            tiles = np.column_stack((tx, ty, self.tile_versions[ty, tx])).tolist()
+            version = self.version
+
+        return {
+            'version': version,
+            'resolution': self.resolution,
+            'tileSize': self.tile_size,
+            'tilesX': self.tiles_x,
+            'tilesY': self.tiles_y,
+            'width': self.width,
+            'height': self.height,
+            # 地圖範圍（本地米座標）：西、南、東、北
+            'bounds': [-self.half_extent, -self.half_extent, self.half_extent, self.half_extent],
+            'origin': {'lat': self.origin[0], 'lon': self.origin[1]} if self.origin else None,
+            'formats': list(TILE_FORMATS) if Image is not None else ['bin'],
+            'tiles': tiles
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取融合與圖塊快取統計"""
+        stats = dict(self.stats)
+        scans = stats['scans']
+        stats.update({
+            'version': self.version,
+            'cachedTiles': len(self._tiles),
+            'avgIntegrateMs': (self.integrate_time / scans * 1000.0) if scans else 0.0
+        })
+        return stats
@@ -0,0 +1,261 @@
+"""
+LIDAR 中繼模組 - 單一上游 WebSocket 連線，降採樣後以 Socket.IO 二進位幀轉發
+中控只向樹莓派（UGV）開一條 LIDAR WebSocket 連線，在接收線程中解析並降採樣每圈掃描，
+只保留最新一幀；推送循環以固定頻率上限把最新一幀推送給訂閱的客戶端（lidar 房間）
+"""
+import time
+import struct
+import threading
+import logging
+from typing import Optional, Dict, Any, Tuple, List, Callable
+
+try:
+    from simple_websocket import Client as WebSocketClient
+    from simple_websocket.errors import SimpleWebsocketError
+except ImportError:
+    WebSocketClient = None
+    SimpleWebsocketError = RuntimeError
+
+# 導入配置
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+
+import numpy as np
+
+from .scan import LidarScan, parse_scan, decimate_scan, pack_frame
+
+# 設定日誌
+logger = logging.getLogger(__name__)
+
+class LidarRelay:
+    """
+    LIDAR 中繼
+
+    用法:
+        relay = LidarRelay(socketio)
+        relay.start()                                  # 啟動上游接收線程
+        socketio.start_background_task(relay.run)     # 啟動推送循環
+    """
+
+    # 訂閱 LIDAR 幀的客戶端房間
+    ROOM = 'lidar'
+
+    def __init__(self, socketio, url: Optional[str] = None,
+                 rate_hz: Optional[float] = None,
+                 decimation: Optional[str] = None,
+                 angle_bin_deg: Optional[float] = None,
+                 voxel_size: Optional[float] = None,
+                 reconnect_delay: Optional[float] = None,
+                 receive_timeout: Optional[float] = None):
+        """
+        初始化 LIDAR 中繼
+
+        參數:
+            socketio: Flask-SocketIO 實例（用於 emit 與協作式 sleep）
+            url: 樹莓派 LIDAR WebSocket 位址
+            rate_hz: 推送頻率上限（Hz）
+            decimation: 降採樣方式 'angle' / 'voxel' / 'none'
+            angle_bin_deg: 角度區間（度）
+            voxel_size: 體素格邊長（米）
+            reconnect_delay: 上游斷線後的重試間隔（秒）
+            receive_timeout: 多久沒收到掃描視為斷線（秒）
+        """
+        self.socketio = socketio
+        self.url = url or config.LIDAR_WS_URL
+        self.rate_hz = float(rate_hz or config.LIDAR_BROADCAST_RATE)
+        self.decimation = decimation or config.LIDAR_DECIMATION
+        self.angle_bin = np.radians(angle_bin_deg or config.LIDAR_ANGLE_BIN_DEG)
+        self.voxel_size = voxel_size or config.LIDAR_VOXEL_SIZE
+        self.reconnect_delay = reconnect_delay or config.LIDAR_RECONNECT_DELAY
+        self.receive_timeout = receive_timeout or config.LIDAR_RECEIVE_TIMEOUT
+
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.running = False
+        self.broadcasting = False
+        self.upstream_connected = False
+        self.subscribers = set()
+        # 每圈掃描的監聽器（例如佔據柵格），在接收線程中呼叫
+        self.listeners: List[Callable[[LidarScan], None]] = []
+
+        # 最新的掃描與 (序號, 打包好的幀)（接收線程整體替換，推送循環無鎖讀取）
+        self._scan: Optional[LidarScan] = None
+        self._frame: Optional[Tuple[int, bytes]] = None
+        self._sequence = 0
+
+        # 統計
+        self.stats = {
+            'connects': 0,
+            'failures': 0,
+            'scans': 0,
+            'parse_errors': 0,
+            'raw_points': 0,
+            'sent_points': 0,
+            'raw_bytes': 0,
+            'frame_bytes': 0,
+            'emits': 0
+        }
+        self.process_time = 0.0
+
+    # ------------------------------------------------------------
+    # 上游接收
+    # ------------------------------------------------------------
+
+    def start(self) -> bool:
+        """啟動上游接收線程"""
+        if WebSocketClient is None:
+            logger.warning("未安裝 simple-websocket，LIDAR 中繼停用")
+            return False
+        if self.thread is not None and self.thread.is_alive():
+            return True
+
+        self.running = True
+        self.thread = threading.Thread(target=self._receive_loop, daemon=True, name='lidar-relay')
+        self.thread.start()
+        logger.info(f"LIDAR 中繼啟動 (上游: {self.url}, 降採樣: {self.decimation}, 推送上限: {self.rate_hz}Hz)")
+        return True
+
+    def _receive_loop(self) -> None:
+        """上游接收線程：維持一條到樹莓派的 WebSocket 連線"""
+        while self.running:
+            ws = None
+            try:
+                ws = WebSocketClient.connect(self.url)
+                self.stats['connects'] += 1
+                self.upstream_connected = True
+                logger.info(f"LIDAR 上游已連接: {self.url}")
+
+                while self.running:
+                    message = ws.receive(timeout=self.receive_timeout)
+                    if message is None:
+                        logger.warning(f"LIDAR 上游超過 {self.receive_timeout} 秒沒有數據，重新連線")
+                        break
+                    self._handle_message(message)
+            except (SimpleWebsocketError, OSError) as e:
+                self.stats['failures'] += 1
+                logger.debug(f"LIDAR 上游連線錯誤: {e}")
+            finally:
+                self.upstream_connected = False
+                if ws is not None:
+                    try:
+                        ws.close()
+                    except (SimpleWebsocketError, OSError):
+                        pass
+
+            if self.running:
+                time.sleep(self.reconnect_delay)
+
+    def _handle_message(self, message) -> None:
+        """解析、降採樣並打包一圈掃描"""
+        start = time.perf_counter()
+        try:
+            scan = parse_scan(message)
+            if scan is None:
+                return
+            self.publish_scan(scan, raw_bytes=len(message))
+        except (ValueError, TypeError, OverflowError, struct.error) as e:
+            # 格式錯誤的掃描只丟棄該圈，不能讓接收線程結束
+            self.stats['parse_errors'] += 1
+            logger.debug(f"LIDAR 消息解析錯誤: {e}")
+            return
+        self.process_time += time.perf_counter() - start
+
+    def publish_scan(self, scan: LidarScan, raw_bytes: int = 0) -> None:
+        """發布一圈掃描（上游線程呼叫，也可用於回放或測試）"""
+        points, raw_count, min_range = decimate_scan(scan, self.decimation, self.angle_bin, self.voxel_size)
+
+        self._sequence += 1
+        frame = pack_frame(self._sequence, scan, points, raw_count, min_range)
+        self._scan = scan
+        self._frame = (self._sequence, frame)
+
+        self.stats['scans'] += 1
+        self.stats['raw_points'] += raw_count
+        self.stats['sent_points'] += len(points)
+        self.stats['raw_bytes'] += raw_bytes
+        self.stats['frame_bytes'] += len(frame)
+
+        for listener in self.listeners:
+            try:
+                listener(scan)
+            except Exception as e:
+                logger.error(f"LIDAR 掃描監聽器錯誤: {e}")
+
+    def add_listener(self, listener: Callable[[LidarScan], None]) -> None:
+        """登記每圈掃描的監聽器（在接收線程中呼叫，不應長時間阻塞）"""
+        self.listeners.append(listener)
+
+    def latest_scan(self) -> Optional[LidarScan]:
+        """最新一圈的原始掃描"""
+        return self._scan
+
+    def latest_frame(self) -> Optional[bytes]:
+        """最新一圈的二進位幀"""
+        latest = self._frame
+        return latest[1] if latest is not None else None
+
+    # ------------------------------------------------------------
+    # 客戶端推送
+    # ------------------------------------------------------------
+
+    def subscribe(self, sid: str) -> str:
+        """登記訂閱的客戶端，返回要加入的房間"""
+        with self.lock:
+            self.subscribers.add(sid)
+        return self.ROOM
+
+    def unsubscribe(self, sid: str) -> bool:
+        """取消訂閱（客戶端斷線時也會呼叫）"""
+        with self.lock:
+            if sid not in self.subscribers:
+                return False
+            self.subscribers.discard(sid)
+        return True
+
+    def run(self) -> None:
+        """推送主循環（以 socketio.start_background_task 啟動）：每個週期最多推送一幀"""
+        self.broadcasting = True
+        period = 1.0 / self.rate_hz
+        last_sequence = 0
+        next_tick = time.time()
+
+        while self.broadcasting:
+            latest = self._frame
+            if latest is not None and latest[0] != last_sequence and self.subscribers:
+                # 推送週期之間到達的掃描只送出最新一圈
+                last_sequence = latest[0]
+                try:
+                    self.socketio.emit('lidar_scan', latest[1], to=self.ROOM)
+                    self.stats['emits'] += 1
+                except Exception as e:
+                    logger.error(f"LIDAR 推送錯誤: {e}")
+
+            next_tick += period
+            delay = next_tick - time.time()
+            if delay < 0:
+                next_tick = time.time()
+                delay = 0
+            self.socketio.sleep(delay)
+
+    def stop(self) -> None:
+        """停止上游接收與推送循環"""
+        self.running = False
+        self.broadcasting = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取中繼統計"""
+        stats = dict(self.stats)
+        scans = stats['scans']
+        stats.update({
+            'url': self.url,
+            'upstreamConnected': self.upstream_connected,
+            'subscribers': len(self.subscribers),
+            'decimation': self.decimation,
+            'rateHz': self.rate_hz,
+            'avgProcessMs': (self.process_time / scans * 1000.0) if scans else 0.0,
+            'pointRatio': (stats['sent_points'] / stats['raw_points']) if stats['raw_points'] else None,
+            'byteRatio': (stats['frame_bytes'] / stats['raw_bytes']) if stats['raw_bytes'] else None
+        })
+        return stats
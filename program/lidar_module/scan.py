@@ -0,0 +1,178 @@
+"""
+LIDAR 掃描處理模組 - 解析、降採樣與二進位打包
+樹莓派以 JSON 傳送每一圈的極座標距離（ranges、angle_min、angle_increment、range_max），
+中控以 NumPy 轉為直角座標並依角度分格或體素格降採樣，再打包為 Float32 二進位幀，
+瀏覽器可直接以 Float32Array 讀取，不需要 JSON.parse 與三角函數運算
+"""
+import json
+import time
+import struct
+import logging
+from typing import Optional, Dict, Any, Tuple, NamedTuple, Union
+import numpy as np
+
+# 設定日誌
+logger = logging.getLogger(__name__)
+
+# 降採樣方式
+DECIMATION_NONE = 'none'
+DECIMATION_ANGLE = 'angle'  # 每個角度區間只保留最近的點（保留障礙物輪廓）
+DECIMATION_VOXEL = 'voxel'  # 每個平面體素格只保留一個點
+DECIMATION_METHODS = (DECIMATION_NONE, DECIMATION_ANGLE, DECIMATION_VOXEL)
+
+# 二進位幀格式版本
+LIDAR_FRAME_VERSION = 1
+
+# 幀頭：版本、保留(3)、序號、點數、原始有效點數、時間戳、最大量程、最近距離
+# 幀頭長度為 4 的倍數，之後的點數據可直接以 Float32Array(buffer, 幀頭長度) 讀取
+LIDAR_FRAME_HEADER = struct.Struct('<B3xIIIdff')
+
+class LidarScan(NamedTuple):
+    """單圈掃描（ranges 為 float32，無效距離為 NaN 或超出量程）"""
+    timestamp: float
+    angle_min: float
+    angle_increment: float
+    range_min: float
+    range_max: float
+    ranges: np.ndarray
+
+    def angles(self) -> np.ndarray:
+        """每個距離對應的角度（弧度）"""
+        return self.angle_min + np.arange(len(self.ranges), dtype=np.float64) * self.angle_increment
+
+    def valid_mask(self) -> np.ndarray:
+        """有效距離的遮罩"""
+        ranges = self.ranges
+        with np.errstate(invalid='ignore', over='ignore'):
+            return np.isfinite(ranges) & (ranges > self.range_min) & (ranges <= self.range_max)
+
+def parse_scan(message: Union[str, bytes, Dict[str, Any]]) -> Optional[LidarScan]:
+    """
+    解析樹莓派的 LIDAR 消息
+
+    返回:
+        LidarScan: 掃描數據，狀態或錯誤消息返回None
+
+    異常:
+        ValueError / TypeError: 消息格式錯誤
+    """
+    data = json.loads(message) if isinstance(message, (str, bytes)) else message
+    if not isinstance(data, dict) or data.get('type') in ('status', 'error'):
+        return None
+
+    ranges = data.get('ranges', data.get('data'))
+    if not ranges:
+        return None
+
+    try:
+        values = np.asarray(ranges, dtype=np.float32)
+    except (TypeError, ValueError):
+        # 無效距離以 null 表示
+        values = np.array([np.nan if value is None else value for value in ranges], dtype=np.float32)
+    if values.ndim != 1:
+        raise ValueError(f"ranges 必須是一維數列: {values.shape}")
+
+    return LidarScan(
+        timestamp=float(data.get('timestamp') or time.time()),
+        angle_min=float(data.get('angle_min', data.get('angleMin', 0.0)) or 0.0),
+        angle_increment=float(data.get('angle_increment', data.get('angleIncrement', 0.0)) or 0.0),
+        range_min=float(data.get('range_min', data.get('rangeMin', 0.0)) or 0.0),
+        range_max=float(data.get('range_max', data.get('rangeMax', 16.0)) or 16.0),
+        ranges=values
+    )
+
+def scan_points(scan: LidarScan) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    有效點的極座標與直角座標（感測器座標系，x = r·cosθ, y = r·sinθ）
+
+    返回:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: (角度, 距離, 形狀為 (N, 2) 的 float32 座標)
+    """
+    mask = scan.valid_mask()
+    angles = scan.angles()[mask]
+    ranges = scan.ranges[mask].astype(np.float64)
+    points = np.empty((len(ranges), 2), dtype=np.float32)
+    points[:, 0] = ranges * np.cos(angles)
+    points[:, 1] = ranges * np.sin(angles)
+    return angles, ranges, points
+
+def decimate_angle_bins(angles: np.ndarray, ranges: np.ndarray, points: np.ndarray,
+                        bin_size: float) -> np.ndarray:
+    """每個角度區間（弧度）只保留最近的點"""
+    if len(points) == 0:
+        return points
+
+    bins = np.floor((angles - angles.min()) / bin_size).astype(np.int64)
+    # 依 (區間, 距離) 排序後取每個區間的第一個點
+    order = np.lexsort((ranges, bins))
+    sorted_bins = bins[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = sorted_bins[1:] != sorted_bins[:-1]
+    return points[order[first]]
+
+def decimate_voxels(points: np.ndarray, voxel_size: float) -> np.ndarray:
+    """每個平面體素格只保留一個點"""
+    if len(points) == 0:
+        return points
+
+    cells = np.floor(points / voxel_size).astype(np.int64)
+    _, index = np.unique(cells, axis=0, return_index=True)
+    return points[np.sort(index)]
+
+def decimate_scan(scan: LidarScan, method: str = DECIMATION_ANGLE,
+                  angle_bin: float = np.radians(1.0), voxel_size: float = 0.05
+                  ) -> Tuple[np.ndarray, int, float]:
+    """
+    把掃描轉為降採樣後的直角座標點
+
+    參數:
+        method: 'angle'、'voxel' 或 'none'
+        angle_bin: 角度區間（弧度）
+        voxel_size: 體素格邊長（米）
+
+    返回:
+        Tuple[np.ndarray, int, float]: (形狀為 (N, 2) 的 float32 座標, 原始有效點數, 最近距離)
+    """
+    if method not in DECIMATION_METHODS:
+        raise ValueError(f"未知的降採樣方式: {method} (可用: {DECIMATION_METHODS})")
+
+    angles, ranges, points = scan_points(scan)
+    min_range = float(ranges.min()) if len(ranges) else 0.0
+
+    if method == DECIMATION_ANGLE:
+        points = decimate_angle_bins(angles, ranges, points, angle_bin)
+    elif method == DECIMATION_VOXEL:
+        points = decimate_voxels(points, voxel_size)
+
+    return points, len(ranges), min_range
+
+def pack_frame(sequence: int, scan: LidarScan, points: np.ndarray,
+               raw_count: int, min_range: float) -> bytes:
+    """打包為二進位幀：幀頭 + 交錯排列的 float32 (x, y)"""
+    header = LIDAR_FRAME_HEADER.pack(LIDAR_FRAME_VERSION, sequence, len(points), raw_count,
+                                     scan.timestamp, scan.range_max, min_range)
+    return header + np.ascontiguousarray(points, dtype='<f4').tobytes()
+
+def unpack_frame(frame: bytes) -> Tuple[Dict[str, Any], np.ndarray]:
+    """
+    解析二進位幀（用於測試與離線工具）
+
+    返回:
+        Tuple[Dict, np.ndarray]: (幀頭欄位, 形狀為 (N, 2) 的座標)
+    """
+    version, sequence, count, raw_count, timestamp, range_max, min_range = \
+        LIDAR_FRAME_HEADER.unpack_from(frame)
+    if version != LIDAR_FRAME_VERSION:
+        raise ValueError(f"不支援的 LIDAR 幀版本: {version}")
+
+    points = np.frombuffer(frame, dtype='<f4', count=count * 2,
+                           offset=LIDAR_FRAME_HEADER.size).reshape(count, 2)
+    header = {
+        'sequence': sequence,
+        'count': count,
+        'rawCount': raw_count,
+        'timestamp': timestamp,
+        'rangeMax': range_max,
+        'minRange': min_range
+    }
+    return header, points
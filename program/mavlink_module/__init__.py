@@ -4,11 +4,15 @@ MAVLink模組 - Pixhawk2.4.8 Rover通訊模組
 """
 
 from .connection import MAVLinkConnection
+from .dispatcher import MessageDispatcher, RateLimitedCallback, DISPATCH_POLICIES
 from .telemetry import MAVLinkTelemetry  
 from .rover_controller import RoverController
 
 __all__ = [
     'MAVLinkConnection',
+    'MessageDispatcher',
+    'RateLimitedCallback',
+    'DISPATCH_POLICIES',
     'MAVLinkTelemetry',
     'RoverController'
 ]
@@ -3,6 +3,7 @@ MAVLink連接管理模組 - 處理與Pixhawk Rover的連接
 專門針對ArduPilot Rover系統韌體和儀表板應用優化
 """
 import time
+import select
 import threading
 import logging
 from typing import Optional, Dict, Any, Callable, List, Union
@@ -15,6 +16,8 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 import config
 
+from .dispatcher import MessageDispatcher, RateLimitedCallback
+
 # 設定日誌
 logger = logging.getLogger(__name__)
 
@@ -62,11 +65,28 @@ class MAVLinkConnection:
         
         # 回調函數
         self.message_callbacks = {}
+        self.batch_callbacks = []
         self.connection_callbacks = []
+        self.rate_limited_callbacks: List[RateLimitedCallback] = []
         
         # 接收執行緒
         self.receive_thread = None
         self.running = False
+        self.read_timeout = config.MAVLINK_READ_TIMEOUT
+        self.max_batch = config.MAVLINK_MAX_BATCH
+        self.poll_interval = config.MAVLINK_POLL_INTERVAL
+        
+        # 消息分派器（回調在執行緒池中執行）
+        self.dispatcher = MessageDispatcher(self._run_callbacks) if config.MAVLINK_DISPATCH_ENABLED else None
+        
+        # 接收統計
+        self.receive_stats = {
+            'wakeups': 0,
+            'idle_wakeups': 0,
+            'batches': 0,
+            'messages': 0,
+            'max_batch': 0
+        }
         
         # 狀態標記
         self.stream_rates_requested = False
@@ -77,7 +97,8 @@ class MAVLinkConnection:
     @property
     def is_connected(self) -> bool:
         """獲取連接狀態"""
-        logger.debug(f"當前連接狀態: {self._is_connected}, 心跳時間: {time.time() - self.last_heartbeat:.1f}s")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"當前連接狀態: {self._is_connected}, 心跳時間: {time.time() - self.last_heartbeat:.1f}s")
         # 如果超過5秒沒有心跳，視為斷開連接
         if self._is_connected and (time.time() - self.last_heartbeat) > 5:
             logger.warning(f"心跳超時 ({time.time() - self.last_heartbeat:.1f}s)，連接可能已斷開")
@@ -496,6 +517,12 @@ class MAVLinkConnection:
         # 停止接收執行緒
         self._stop_receive_thread()
         
+        # 停止消息分派
+        if self.dispatcher:
+            self.dispatcher.stop(wait=False)
+        for limited in self.rate_limited_callbacks:
+            limited.cancel()
+        
         # 關閉連接
         if self.connection:
             try:
@@ -509,14 +536,35 @@ class MAVLinkConnection:
         
         logger.info("連接已斷開")
     
-    def register_message_callback(self, message_type: str, callback: Callable) -> None:
+    def register_message_callback(self, message_type: str, callback: Callable,
+                                  max_rate_hz: Optional[float] = None) -> None:
         """
         註冊消息回調函數
+        
+        參數:
+            message_type: MAVLink消息類型
+            callback: 回調函數
+            max_rate_hz: 最高回調頻率，飛控送得更快時只處理每個間隔內最新的一則（None表示不限制）
         """
+        if max_rate_hz:
+            # 補送回到分派器中該類型的佇列，與同類型消息串行執行
+            schedule = (lambda delay, task, msg_type=message_type:
+                        self.dispatcher.call_later(msg_type, delay, task)) if self.dispatcher else None
+            callback = RateLimitedCallback(callback, max_rate_hz, name=message_type, schedule=schedule)
+            self.rate_limited_callbacks.append(callback)
+        
         if message_type not in self.message_callbacks:
             self.message_callbacks[message_type] = []
         self.message_callbacks[message_type].append(callback)
     
+    def register_batch_callback(self, callback: Callable[[List[Any]], None]) -> None:
+        """
+        註冊批次回調函數
+        
+        每次接收執行緒喚醒後，以該次解析出的所有消息（依接收順序的列表）呼叫一次
+        """
+        self.batch_callbacks.append(callback)
+    
     def register_connection_callback(self, callback: Callable[[bool], None]) -> None:
         """
         註冊連接狀態回調函數
@@ -547,23 +595,95 @@ class MAVLinkConnection:
     def _receive_loop(self) -> None:
         """
         消息接收循環
+        
+        以 select 阻塞等待串口/socket 可讀（無數據時不佔用CPU），
+        喚醒後一次解析所有已到達的消息並整批處理
         """
-        while self.running and self.is_connected:
+        # 心跳超時由心跳計時器處理，這裡只讀取狀態旗標
+        while self.running and self._is_connected:
             try:
-                if not self.connection:
+                connection = self.connection
+                if not connection:
                     break
                 
-                # 接收消息
-                msg = self.connection.recv_match(blocking=False, timeout=0.1)
+                if not self._wait_readable(connection, self.read_timeout):
+                    continue
                 
-                if msg:
-                    self._process_message(msg)
+                batch = self._read_batch(connection)
+                if batch:
+                    self._process_batch(batch)
+                elif getattr(connection, 'fd', None) is None:
+                    # 無法 select 的連接：沒有數據時短暫等待，避免空轉
+                    time.sleep(self.poll_interval)
                     
             except Exception as e:
                 if self.running:
                     logger.error(f"消息接收錯誤: {e}")
                     time.sleep(0.1)
     
+    def _wait_readable(self, connection, timeout: float) -> bool:
+        """
+        等待連接可讀
+        
+        返回:
+            bool: 是否可能有數據可讀（無法 select 的連接總是返回True）
+        """
+        self.receive_stats['wakeups'] += 1
+        fd = getattr(connection, 'fd', None)
+        if fd is None:
+            return True
+        
+        try:
+            readable, _, _ = select.select([fd], [], [], timeout)
+        except (OSError, ValueError) as e:
+            # 連接已關閉（fd 失效）
+            if self.running:
+                logger.warning(f"等待MAVLink數據失敗: {e}")
+                time.sleep(0.1)
+            return False
+        
+        if not readable:
+            self.receive_stats['idle_wakeups'] += 1
+            return False
+        return True
+    
+    def _read_batch(self, connection) -> List[Any]:
+        """解析接收緩衝區中所有完整的消息（不阻塞，最多 max_batch 則）"""
+        batch = []
+        while len(batch) < self.max_batch:
+            msg = connection.recv_msg()
+            if msg is None:
+                break
+            if msg.get_type() == 'BAD_DATA':
+                continue
+            batch.append(msg)
+        return batch
+    
+    def _process_batch(self, batch: List[Any]) -> None:
+        """處理一次喚醒所解析出的消息"""
+        stats = self.receive_stats
+        stats['batches'] += 1
+        stats['messages'] += len(batch)
+        if len(batch) > stats['max_batch']:
+            stats['max_batch'] = len(batch)
+        
+        for msg in batch:
+            self._process_message(msg)
+        
+        for callback in self.batch_callbacks:
+            try:
+                callback(batch)
+            except Exception as e:
+                logger.error(f"批次消息回調處理錯誤: {e}")
+    
+    def get_receive_stats(self) -> Dict[str, Any]:
+        """
+        獲取接收統計
+        """
+        stats = dict(self.receive_stats)
+        stats['avg_batch'] = stats['messages'] / stats['batches'] if stats['batches'] else 0.0
+        return stats
+    
     def _process_message(self, msg) -> None:
         """處理接收到的MAVLink消息"""
         try:
@@ -584,18 +704,36 @@ class MAVLinkConnection:
                     self._configure_rover_data_streams()
                     self.rover_configured = True
             
-            # 調用對應消息類型的回調函數
+            # 調用對應消息類型的回調函數（啟用分派器時交由執行緒池處理）
             msg_type = msg.get_type()
             if msg_type in self.message_callbacks:
-                for callback in self.message_callbacks[msg_type]:
-                    try:
-                        callback(msg)
-                    except Exception as e:
-                        logger.error(f"{msg_type} 消息回調處理錯誤: {e}")
+                if self.dispatcher:
+                    self.dispatcher.dispatch(msg_type, msg)
+                else:
+                    self._run_callbacks(msg_type, msg)
         
         except Exception as e:
             logger.error(f"消息處理錯誤: {e}")
     
+    def _run_callbacks(self, msg_type: str, msg) -> None:
+        """執行消息類型的所有回調函數"""
+        for callback in self.message_callbacks.get(msg_type, ()):
+            try:
+                callback(msg)
+            except Exception as e:
+                logger.error(f"{msg_type} 消息回調處理錯誤: {e}")
+    
+    def get_dispatch_stats(self) -> Optional[Dict[str, Any]]:
+        """
+        獲取消息分派統計（各消息類型的佇列深度、丟棄數與處理時間），未啟用時返回None
+        """
+        if not self.dispatcher:
+            return None
+        
+        stats = self.dispatcher.get_stats()
+        stats['rateLimited'] = {limited.name: limited.get_stats() for limited in self.rate_limited_callbacks}
+        return stats
+    
     def _start_heartbeat_timer(self) -> None:
         """
         啟動心跳檢測計時器
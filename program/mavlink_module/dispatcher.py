@@ -0,0 +1,395 @@
+"""
+MAVLink消息分派模組 - 將回調處理從接收執行緒移到執行緒池
+每種消息類型有獨立的有界佇列與丟棄策略，接收執行緒只負責解析與入列，
+慢速的回調（持有鎖的遙測處理、Socket.IO 推送）不會拖慢下一幀的解析
+"""
+import time
+import heapq
+import itertools
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Callable
+
+# 導入配置
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+
+# 設定日誌
+logger = logging.getLogger(__name__)
+
+# 丟棄策略
+POLICY_LATEST = 'latest'            # 只保留最新一則（狀態類消息，舊值沒有意義）
+POLICY_DROP_OLDEST = 'drop_oldest'  # 佇列滿時丟棄最舊的消息
+POLICY_NEVER_DROP = 'never_drop'    # 不丟棄（命令回應、狀態文本），超過上限只記錄警告
+
+DISPATCH_POLICIES = (POLICY_LATEST, POLICY_DROP_OLDEST, POLICY_NEVER_DROP)
+
+class MessageQueue:
+    """單一消息類型的佇列與統計"""
+
+    def __init__(self, msg_type: str, policy: str, maxsize: int):
+        if policy not in DISPATCH_POLICIES:
+            raise ValueError(f"未知的丟棄策略: {policy}")
+
+        self.msg_type = msg_type
+        self.policy = policy
+        self.maxsize = 1 if policy == POLICY_LATEST else maxsize
+        self.items = deque()
+        # 延遲補送等內部工作（不受丟棄策略影響，優先於消息執行）
+        self.tasks = deque()
+
+        # 是否已有工作執行緒負責此類型（保證同類型消息依序、串行處理）
+        self.scheduled = False
+        self.overflow_warned = False
+
+        # 統計
+        self.enqueued = 0
+        self.dropped = 0
+        self.processed = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def put(self, msg) -> None:
+        """入列（呼叫端須持有分派器的鎖）"""
+        self.enqueued += 1
+
+        if len(self.items) >= self.maxsize:
+            if self.policy == POLICY_NEVER_DROP:
+                if not self.overflow_warned:
+                    logger.warning(f"{self.msg_type} 佇列超過 {self.maxsize} 則，回調處理跟不上接收速度")
+                    self.overflow_warned = True
+            else:
+                self.items.popleft()
+                self.dropped += 1
+
+        self.items.append(msg)
+        if len(self.items) > self.max_depth:
+            self.max_depth = len(self.items)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'policy': self.policy,
+            'depth': len(self.items),
+            'maxDepth': self.max_depth,
+            'capacity': self.maxsize,
+            'enqueued': self.enqueued,
+            'dropped': self.dropped,
+            'processed': self.processed,
+            'errors': self.errors,
+            'avgHandlerMs': (self.total_time / self.processed * 1000.0) if self.processed else 0.0,
+            'maxHandlerMs': self.max_time * 1000.0
+        }
+
+class DelayedScheduler:
+    """
+    單一執行緒的延遲排程器
+    所有延遲工作共用一個執行緒與最小堆，避免每次延遲都建立一個 threading.Timer 執行緒
+    """
+
+    def __init__(self, name: str = 'mavlink-scheduler'):
+        self.name = name
+        self.condition = threading.Condition()
+        self.heap = []
+        self.counter = itertools.count()
+        self.thread: Optional[threading.Thread] = None
+        self.running = False
+
+    def call_later(self, delay: float, fn: Callable[[], None]) -> None:
+        """delay 秒後在排程執行緒中呼叫 fn（fn 應立即返回）"""
+        with self.condition:
+            if not self.running:
+                self.running = True
+                self.thread = threading.Thread(target=self._run, daemon=True, name=self.name)
+                self.thread.start()
+            heapq.heappush(self.heap, (time.monotonic() + delay, next(self.counter), fn))
+            self.condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self.condition:
+                while self.running:
+                    if self.heap:
+                        wait = self.heap[0][0] - time.monotonic()
+                        if wait <= 0:
+                            break
+                        self.condition.wait(wait)
+                    else:
+                        self.condition.wait()
+                if not self.running:
+                    return
+                _, _, fn = heapq.heappop(self.heap)
+
+            try:
+                fn()
+            except Exception as e:
+                logger.error(f"延遲工作執行錯誤: {e}")
+
+    def stop(self) -> None:
+        """停止排程執行緒並丟棄尚未到期的工作"""
+        with self.condition:
+            self.running = False
+            self.heap.clear()
+            self.condition.notify()
+
+# 未接上分派器的限頻回調共用的排程器
+_default_scheduler = DelayedScheduler()
+
+class RateLimitedCallback:
+    """
+    限制回調頻率的包裝器（消息合併）
+
+    每個 1/max_rate_hz 間隔最多呼叫一次回調；間隔內到達的消息只保留最新一則，
+    並在間隔結束時補送（trailing），確保最後的狀態不會遺失。
+    補送透過 schedule(延遲, 函數) 排程：接上分派器時（MessageDispatcher.call_later）
+    補送會回到該消息類型的佇列，與同類型消息串行執行；未指定時使用共用的排程執行緒
+    """
+
+    def __init__(self, callback: Callable, max_rate_hz: float, name: str = '',
+                 schedule: Optional[Callable[[float, Callable[[], None]], None]] = None):
+        if max_rate_hz <= 0:
+            raise ValueError(f"max_rate_hz 必須大於 0: {max_rate_hz}")
+
+        self.callback = callback
+        self.interval = 1.0 / max_rate_hz
+        self.name = name or getattr(callback, '__name__', 'callback')
+        self.schedule = schedule or _default_scheduler.call_later
+
+        self.lock = threading.Lock()
+        self.last_delivery = 0.0
+        self.pending = None
+        self.flush_scheduled = False
+        # cancel() 後遞增，使已排程的補送失效
+        self.generation = 0
+
+        # 統計
+        self.received = 0
+        self.delivered = 0
+        self.conflated = 0
+
+    def __call__(self, msg) -> None:
+        with self.lock:
+            self.received += 1
+            now = time.monotonic()
+            wait = self.last_delivery + self.interval - now
+
+            if wait > 0:
+                # 間隔內：以最新消息取代待送的消息，並確保已排程補送
+                if self.pending is not None:
+                    self.conflated += 1
+                self.pending = msg
+                if not self.flush_scheduled:
+                    self.flush_scheduled = True
+                    generation = self.generation
+                    self.schedule(wait, lambda: self._flush(generation))
+                return
+
+            if self.pending is not None:
+                # 補送尚未執行，新消息已取代待送消息
+                self.conflated += 1
+                self.pending = None
+            self.last_delivery = now
+            self.delivered += 1
+
+        self._deliver(msg)
+
+    def _flush(self, generation: int) -> None:
+        """間隔結束：補送最新的待送消息"""
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.flush_scheduled = False
+            msg = self.pending
+            self.pending = None
+            if msg is None:
+                return
+            self.last_delivery = time.monotonic()
+            self.delivered += 1
+
+        self._deliver(msg)
+
+    def _deliver(self, msg) -> None:
+        try:
+            self.callback(msg)
+        except Exception as e:
+            logger.error(f"{self.name} 回調處理錯誤: {e}")
+
+    def cancel(self) -> None:
+        """取消已排程的補送並丟棄待送消息"""
+        with self.lock:
+            self.generation += 1
+            self.flush_scheduled = False
+            self.pending = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'maxRateHz': 1.0 / self.interval,
+                'received': self.received,
+                'delivered': self.delivered,
+                'conflated': self.conflated
+            }
+
+class MessageDispatcher:
+    """
+    MAVLink消息分派器
+
+    用法:
+        dispatcher = MessageDispatcher(handler)  # handler(msg_type, msg)
+        dispatcher.dispatch('ATTITUDE', msg)     # 在接收執行緒中呼叫，立即返回
+    """
+
+    def __init__(self,
+                 handler: Callable[[str, Any], None],
+                 max_workers: Optional[int] = None,
+                 queue_size: Optional[int] = None,
+                 policies: Optional[Dict[str, str]] = None,
+                 default_policy: Optional[str] = None):
+        """
+        初始化消息分派器
+
+        參數:
+            handler: 處理單則消息的函數 (消息類型, 消息)
+            max_workers: 工作執行緒數量
+            queue_size: 每種消息類型的佇列上限
+            policies: {消息類型: 丟棄策略}
+            default_policy: 未指定類型使用的丟棄策略
+        """
+        self.handler = handler
+        self.max_workers = max_workers or config.MAVLINK_DISPATCH_WORKERS
+        self.queue_size = queue_size or config.MAVLINK_DISPATCH_QUEUE_SIZE
+        self.policies = dict(config.MAVLINK_DISPATCH_POLICIES if policies is None else policies)
+        self.default_policy = default_policy or config.MAVLINK_DISPATCH_DEFAULT_POLICY
+
+        self.lock = threading.Lock()
+        self.queues: Dict[str, MessageQueue] = {}
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.scheduler = DelayedScheduler()
+
+    def _get_queue(self, msg_type: str) -> MessageQueue:
+        queue = self.queues.get(msg_type)
+        if queue is None:
+            policy = self.policies.get(msg_type, self.default_policy)
+            queue = MessageQueue(msg_type, policy, self.queue_size)
+            self.queues[msg_type] = queue
+        return queue
+
+    def dispatch(self, msg_type: str, msg) -> None:
+        """將消息放入對應類型的佇列，必要時排程一個工作執行緒處理"""
+        with self.lock:
+            queue = self._get_queue(msg_type)
+            queue.put(msg)
+            executor = self._claim_worker(queue)
+        self._submit(executor, queue)
+
+    def call_later(self, msg_type: str, delay: float, task: Callable[[], None]) -> None:
+        """
+        delay 秒後把 task 放入消息類型的佇列（用於限頻回調的補送）
+        task 與同類型的消息在同一個工作執行緒中串行執行，不受丟棄策略影響
+        """
+        self.scheduler.call_later(delay, lambda: self._enqueue_task(msg_type, task))
+
+    def _enqueue_task(self, msg_type: str, task: Callable[[], None]) -> None:
+        with self.lock:
+            if self.executor is None:
+                # 分派器已停止
+                return
+            queue = self._get_queue(msg_type)
+            queue.tasks.append(task)
+            executor = self._claim_worker(queue)
+        self._submit(executor, queue)
+
+    def _claim_worker(self, queue: MessageQueue) -> Optional[ThreadPoolExecutor]:
+        """佇列尚無工作執行緒時標記並返回執行緒池（呼叫端須持有鎖）"""
+        if queue.scheduled:
+            return None
+        queue.scheduled = True
+
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                               thread_name_prefix='mavlink-dispatch')
+        return self.executor
+
+    def _submit(self, executor: Optional[ThreadPoolExecutor], queue: MessageQueue) -> None:
+        if executor is None:
+            return
+        try:
+            executor.submit(self._drain, queue)
+        except RuntimeError:
+            # 分派器已停止
+            with self.lock:
+                queue.scheduled = False
+
+    def _drain(self, queue: MessageQueue) -> None:
+        """依序處理單一類型佇列中的消息，直到佇列為空"""
+        while True:
+            with self.lock:
+                task = queue.tasks.popleft() if queue.tasks else None
+                if task is None:
+                    if not queue.items:
+                        queue.scheduled = False
+                        return
+                    msg = queue.items.popleft()
+
+            if task is not None:
+                try:
+                    task()
+                except Exception as e:
+                    logger.error(f"{queue.msg_type} 延遲工作處理錯誤: {e}")
+                continue
+
+            start = time.perf_counter()
+            try:
+                self.handler(queue.msg_type, msg)
+            except Exception as e:
+                queue.errors += 1
+                logger.error(f"{queue.msg_type} 消息分派處理錯誤: {e}")
+            elapsed = time.perf_counter() - start
+
+            queue.processed += 1
+            queue.total_time += elapsed
+            if elapsed > queue.max_time:
+                queue.max_time = elapsed
+
+    def set_policy(self, msg_type: str, policy: str) -> None:
+        """設定消息類型的丟棄策略（已有佇列時立即生效，未處理的消息保留）"""
+        if policy not in DISPATCH_POLICIES:
+            raise ValueError(f"未知的丟棄策略: {policy}")
+
+        with self.lock:
+            self.policies[msg_type] = policy
+            queue = self.queues.get(msg_type)
+            if queue is not None:
+                queue.policy = policy
+                queue.maxsize = 1 if policy == POLICY_LATEST else self.queue_size
+
+    def stop(self, wait: bool = True) -> None:
+        """停止工作執行緒並清空佇列"""
+        with self.lock:
+            executor = self.executor
+            self.executor = None
+            for queue in self.queues.values():
+                queue.items.clear()
+                queue.tasks.clear()
+
+        self.scheduler.stop()
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取各消息類型的佇列深度與處理統計"""
+        with self.lock:
+            queues = {msg_type: queue.get_stats() for msg_type, queue in self.queues.items()}
+
+        return {
+            'workers': self.max_workers,
+            'running': self.executor is not None,
+            'totalDepth': sum(q['depth'] for q in queues.values()),
+            'totalDropped': sum(q['dropped'] for q in queues.values()),
+            'queues': queues
+        }
@@ -6,8 +6,7 @@ import time
 import threading
 import logging
 import math
-from typing import Optional, Dict, Any, List, Callable
-from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Callable, Tuple, NamedTuple
 from collections import deque
 import json
 
@@ -17,13 +16,13 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 import config
 
+from history_module import TimeSeriesRing
 from .connection import MAVLinkConnection
 
 # 設定日誌
 logger = logging.getLogger(__name__)
 
-@dataclass
-class AttitudeData:
+class AttitudeData(NamedTuple):
     """姿態數據"""
     roll: float = 0.0          # 橫滾角（弧度）
     pitch: float = 0.0         # 俯仰角（弧度）
@@ -31,37 +30,33 @@ class AttitudeData:
     roll_degrees: float = 0.0  # 橫滾角（度）
     pitch_degrees: float = 0.0 # 俯仰角（度）
     yaw_degrees: float = 0.0   # 偏航角（度）
-    timestamp: float = field(default_factory=time.time)
+    timestamp: float = 0.0
 
-@dataclass
-class VelocityData:
+class VelocityData(NamedTuple):
     """速度數據"""
     ground_speed: float = 0.0    # 地面速度（m/s）
     air_speed: float = 0.0       # 空速（m/s）
     climb_rate: float = 0.0      # 爬升率（m/s）
     heading: float = 0.0         # 航向（度）
-    timestamp: float = field(default_factory=time.time)
+    timestamp: float = 0.0
 
-@dataclass
-class PositionData:
+class PositionData(NamedTuple):
     """位置數據"""
     latitude: float = 0.0        # 緯度（度）
     longitude: float = 0.0       # 經度（度）
     altitude: float = 0.0        # 高度（米）
     relative_altitude: float = 0.0 # 相對高度（米）
-    timestamp: float = field(default_factory=time.time)
+    timestamp: float = 0.0
 
-@dataclass
-class BatteryData:
+class BatteryData(NamedTuple):
     """電池數據"""
     voltage: float = 0.0         # 電壓（伏）
     current: float = 0.0         # 電流（安）
     remaining: float = 0.0       # 剩餘容量（%）
     consumed: float = 0.0        # 已消耗容量（mAh）
-    timestamp: float = field(default_factory=time.time)
+    timestamp: float = 0.0
 
-@dataclass
-class SystemStatus:
+class SystemStatus(NamedTuple):
     """系統狀態"""
     armed: bool = False          # 武裝狀態
     flight_mode: str = "UNKNOWN" # 飛行模式
@@ -69,23 +64,20 @@ class SystemStatus:
     gps_status: int = 0          # GPS狀態
     satellites_visible: int = 0   # 可見衛星數
     system_load: float = 0.0     # 系統負載（%）
-    timestamp: float = field(default_factory=time.time)
+    timestamp: float = 0.0
 
-@dataclass
-class RCChannelsData:
+class RCChannelsData(NamedTuple):
     """RC通道數據"""
-    channels: List[int] = field(default_factory=lambda: [1500] * 18)  # 18個通道
+    channels: Tuple[int, ...] = (1500,) * 18  # 18個通道
     rssi: int = 0                # 信號強度
-    timestamp: float = field(default_factory=time.time)
+    timestamp: float = 0.0
 
-@dataclass
-class ServoOutputData:
+class ServoOutputData(NamedTuple):
     """舵機輸出數據"""
-    outputs: List[int] = field(default_factory=lambda: [1500] * 16)   # 16個輸出
-    timestamp: float = field(default_factory=time.time)
+    outputs: Tuple[int, ...] = (1500,) * 16   # 16個輸出
+    timestamp: float = 0.0
 
-@dataclass
-class EKFStatusData:
+class EKFStatusData(NamedTuple):
     """EKF狀態數據"""
     flags: int = 0               # EKF狀態標誌
     velocity_variance: float = 0.0
@@ -93,33 +85,55 @@ class EKFStatusData:
     pos_vert_variance: float = 0.0
     compass_variance: float = 0.0
     terrain_alt_variance: float = 0.0
-    timestamp: float = field(default_factory=time.time)
+    timestamp: float = 0.0
+
+class TelemetrySnapshot(NamedTuple):
+    """
+    遙測快照（不可變）
+    每次數據更新產生新的快照並替換引用，未變更的區塊沿用同一個物件；
+    快照與各區塊皆為 NamedTuple（無 __dict__，記憶體緊湊，建立成本低）
+    """
+    version: int = 0
+    timestamp: float = 0.0
+    connected: bool = False
+    attitude: AttitudeData = AttitudeData()
+    velocity: VelocityData = VelocityData()
+    position: PositionData = PositionData()
+    battery: BatteryData = BatteryData()
+    system_status: SystemStatus = SystemStatus()
+    rc_channels: RCChannelsData = RCChannelsData()
+    servo_output: ServoOutputData = ServoOutputData()
+    ekf_status: EKFStatusData = EKFStatusData()
 
 class RoverTelemetryProcessor:
     """
     Rover遙測數據處理器
     專門處理ArduPilot Rover系統的遙測數據
+    
+    寫入端（消息處理器）以 self.lock 互斥，更新後發布新的不可變快照；
+    讀取端以 get_snapshot() 直接取得目前的快照引用，不需要加鎖，也不會阻塞數據接收
     """
     
     def __init__(self, connection: MAVLinkConnection):
         self.connection = connection
         self.lock = threading.RLock()
         
-        # 數據存儲
-        self.attitude = AttitudeData()
-        self.velocity = VelocityData()
-        self.position = PositionData()
-        self.battery = BatteryData()
-        self.system_status = SystemStatus()
-        self.rc_channels = RCChannelsData()
-        self.servo_output = ServoOutputData()
-        self.ekf_status = EKFStatusData()
-        
-        # 歷史數據存儲（用於圖表）
+        # 數據存儲（目前的快照，各區塊亦以同名屬性提供）
+        self._snapshot = TelemetrySnapshot(timestamp=time.time())
+        self.attitude = self._snapshot.attitude
+        self.velocity = self._snapshot.velocity
+        self.position = self._snapshot.position
+        self.battery = self._snapshot.battery
+        self.system_status = self._snapshot.system_status
+        self.rc_channels = self._snapshot.rc_channels
+        self.servo_output = self._snapshot.servo_output
+        self.ekf_status = self._snapshot.ekf_status
+        
+        # 歷史數據存儲（用於圖表）- 預先分配的列式環形緩衝區，寫入時不建立數據點物件
         self.max_history_points = config.PERFORMANCE_CHARTS['max_data_points']
-        self.attitude_history = deque(maxlen=self.max_history_points)
-        self.velocity_history = deque(maxlen=self.max_history_points)
-        self.battery_history = deque(maxlen=self.max_history_points)
+        self.attitude_history = TimeSeriesRing(('roll', 'pitch', 'yaw'), self.max_history_points)
+        self.velocity_history = TimeSeriesRing(('ground_speed', 'heading'), self.max_history_points)
+        self.battery_history = TimeSeriesRing(('voltage', 'current', 'remaining'), self.max_history_points)
         
         # 狀態文本
         self.status_messages = deque(maxlen=100)
@@ -127,6 +141,10 @@ class RoverTelemetryProcessor:
         # 數據更新回調
         self.data_callbacks = {}
         
+        # 儀表板數據快取 (快照版本, 字典, JSON bytes)，快照版本改變時才重新建立
+        self._dashboard_cache: Optional[Tuple[int, Dict[str, Any], bytes]] = None
+        self.dashboard_stats = {'hits': 0, 'rebuilds': 0}
+        
         # 連接狀態
         self.is_connected = False
         self.last_data_time = 0
@@ -156,14 +174,41 @@ class RoverTelemetryProcessor:
             'NAV_CONTROLLER_OUTPUT': self._handle_nav_controller,
         }
         
+        # 高頻消息限制處理頻率（飛控實際送出的頻率可能高於請求值，或新舊數據流請求重疊）
+        max_rates = config.MAVLINK_CALLBACK_MAX_RATES
         for msg_type, handler in handlers.items():
-            self.connection.register_message_callback(msg_type, handler)
+            self.connection.register_message_callback(msg_type, handler,
+                                                      max_rate_hz=max_rates.get(msg_type))
+    
+    def _publish(self, **sections) -> TelemetrySnapshot:
+        """
+        發布新的快照（呼叫端須持有 self.lock）
+        
+        參數:
+            sections: 更新的區塊，例如 attitude=AttitudeData(...)
+        """
+        for name, value in sections.items():
+            setattr(self, name, value)
+        
+        snapshot = self._snapshot._replace(version=self._snapshot.version + 1,
+                                           timestamp=time.time(),
+                                           **sections)
+        # 引用替換是原子操作，讀取端看到的一定是完整的舊快照或新快照
+        self._snapshot = snapshot
+        return snapshot
+    
+    def get_snapshot(self) -> TelemetrySnapshot:
+        """獲取目前的遙測快照（不加鎖）"""
+        return self._snapshot
+    
+    @property
+    def snapshot_version(self) -> int:
+        """目前快照的版本號（每次數據更新遞增）"""
+        return self._snapshot.version
     
     def _handle_heartbeat(self, msg):
         """處理心跳包"""
         with self.lock:
-            self.system_status.armed = bool(msg.base_mode & 128)  # MAV_MODE_FLAG_SAFETY_ARMED
-            
             # 解析飛行模式（ArduRover專用）
             mode_mapping = {
                 0: "MANUAL",
@@ -183,144 +228,158 @@ class RoverTelemetryProcessor:
                 16: "INITIALISING"
             }
             
-            self.system_status.flight_mode = mode_mapping.get(msg.custom_mode, f"UNKNOWN({msg.custom_mode})")
-            self.system_status.timestamp = time.time()
-            
-            self._notify_data_update('system_status')
+            self._publish(system_status=self.system_status._replace(
+                armed=bool(msg.base_mode & 128),  # MAV_MODE_FLAG_SAFETY_ARMED
+                flight_mode=mode_mapping.get(msg.custom_mode, f"UNKNOWN({msg.custom_mode})"),
+                timestamp=time.time()
+            ))
+        
+        self._notify_data_update('system_status')
     
     def _handle_attitude(self, msg):
         """處理姿態數據"""
+        attitude = AttitudeData(
+            roll=msg.roll,
+            pitch=msg.pitch,
+            yaw=msg.yaw,
+            roll_degrees=math.degrees(msg.roll),
+            pitch_degrees=math.degrees(msg.pitch),
+            yaw_degrees=math.degrees(msg.yaw),
+            timestamp=time.time()
+        )
+        
         with self.lock:
-            self.attitude.roll = msg.roll
-            self.attitude.pitch = msg.pitch
-            self.attitude.yaw = msg.yaw
-            self.attitude.roll_degrees = math.degrees(msg.roll)
-            self.attitude.pitch_degrees = math.degrees(msg.pitch)
-            self.attitude.yaw_degrees = math.degrees(msg.yaw)
-            self.attitude.timestamp = time.time()
+            self._publish(attitude=attitude)
             
             # 添加到歷史數據
-            attitude_point = {
-                'timestamp': self.attitude.timestamp,
-                'roll': self.attitude.roll_degrees,
-                'pitch': self.attitude.pitch_degrees,
-                'yaw': self.attitude.yaw_degrees
-            }
-            self.attitude_history.append(attitude_point)
-            
-            self._notify_data_update('attitude')
+            self.attitude_history.append(attitude.timestamp, (attitude.roll_degrees,
+                                                               attitude.pitch_degrees,
+                                                               attitude.yaw_degrees))
+        
+        self._notify_data_update('attitude')
     
     def _handle_vfr_hud(self, msg):
         """處理VFR HUD數據"""
+        velocity = VelocityData(
+            ground_speed=msg.groundspeed,
+            air_speed=msg.airspeed,
+            climb_rate=msg.climb,
+            heading=msg.heading,
+            timestamp=time.time()
+        )
+        
         with self.lock:
-            self.velocity.ground_speed = msg.groundspeed
-            self.velocity.air_speed = msg.airspeed
-            self.velocity.climb_rate = msg.climb
-            self.velocity.heading = msg.heading
-            self.velocity.timestamp = time.time()
+            self._publish(velocity=velocity)
             
             # 添加到歷史數據
-            velocity_point = {
-                'timestamp': self.velocity.timestamp,
-                'ground_speed': self.velocity.ground_speed,
-                'heading': self.velocity.heading
-            }
-            self.velocity_history.append(velocity_point)
-            
-            self._notify_data_update('velocity')
+            self.velocity_history.append(velocity.timestamp, (velocity.ground_speed, velocity.heading))
+        
+        self._notify_data_update('velocity')
     
     def _handle_global_position(self, msg):
         """處理全球位置數據"""
+        position = PositionData(
+            latitude=msg.lat / 1e7,
+            longitude=msg.lon / 1e7,
+            altitude=msg.alt / 1000.0,
+            relative_altitude=msg.relative_alt / 1000.0,
+            timestamp=time.time()
+        )
+        
         with self.lock:
-            self.position.latitude = msg.lat / 1e7
-            self.position.longitude = msg.lon / 1e7
-            self.position.altitude = msg.alt / 1000.0
-            self.position.relative_altitude = msg.relative_alt / 1000.0
-            self.position.timestamp = time.time()
-            
-            self._notify_data_update('position')
+            self._publish(position=position)
+        
+        self._notify_data_update('position')
     
     def _handle_sys_status(self, msg):
         """處理系統狀態"""
         with self.lock:
-            self.battery.voltage = msg.voltage_battery / 1000.0  # mV to V
-            self.battery.current = msg.current_battery / 100.0   # cA to A
-            self.battery.remaining = msg.battery_remaining       # %
-            self.system_status.system_load = msg.load / 10.0     # %
-            self.system_status.timestamp = time.time()
-            
-            self._notify_data_update('system_status')
+            self._publish(
+                battery=self.battery._replace(
+                    voltage=msg.voltage_battery / 1000.0,  # mV to V
+                    current=msg.current_battery / 100.0,   # cA to A
+                    remaining=msg.battery_remaining        # %
+                ),
+                system_status=self.system_status._replace(
+                    system_load=msg.load / 10.0,           # %
+                    timestamp=time.time()
+                )
+            )
+        
+        self._notify_data_update('system_status')
     
     def _handle_battery_status(self, msg):
         """處理電池狀態"""
+        changes = {'timestamp': time.time()}
+        
+        if len(msg.voltages) > 0 and msg.voltages[0] != 65535:
+            # 使用更精確的電池數據
+            changes['voltage'] = msg.voltages[0] / 1000.0
+        
+        if msg.current_battery != -1:
+            changes['current'] = msg.current_battery / 100.0
+        
+        if msg.battery_remaining != -1:
+            changes['remaining'] = msg.battery_remaining
+        
+        if msg.current_consumed != -1:
+            changes['consumed'] = msg.current_consumed
+        
         with self.lock:
-            if len(msg.voltages) > 0 and msg.voltages[0] != 65535:
-                # 使用更精確的電池數據
-                self.battery.voltage = msg.voltages[0] / 1000.0
-            
-            if msg.current_battery != -1:
-                self.battery.current = msg.current_battery / 100.0
-            
-            if msg.battery_remaining != -1:
-                self.battery.remaining = msg.battery_remaining
-            
-            if msg.current_consumed != -1:
-                self.battery.consumed = msg.current_consumed
-            
-            self.battery.timestamp = time.time()
+            battery = self.battery._replace(**changes)
+            self._publish(battery=battery)
             
             # 添加到歷史數據
-            battery_point = {
-                'timestamp': self.battery.timestamp,
-                'voltage': self.battery.voltage,
-                'current': self.battery.current,
-                'remaining': self.battery.remaining
-            }
-            self.battery_history.append(battery_point)
-            
-            self._notify_data_update('battery')
+            self.battery_history.append(battery.timestamp, (battery.voltage, battery.current, battery.remaining))
+        
+        self._notify_data_update('battery')
     
     def _handle_rc_channels(self, msg):
         """處理RC通道數據"""
-        with self.lock:
-            # 更新通道數據
-            channels = [
+        rc_channels = RCChannelsData(
+            channels=(
                 msg.chan1_raw, msg.chan2_raw, msg.chan3_raw, msg.chan4_raw,
                 msg.chan5_raw, msg.chan6_raw, msg.chan7_raw, msg.chan8_raw,
                 msg.chan9_raw, msg.chan10_raw, msg.chan11_raw, msg.chan12_raw,
                 msg.chan13_raw, msg.chan14_raw, msg.chan15_raw, msg.chan16_raw,
                 msg.chan17_raw, msg.chan18_raw
-            ]
-            
-            self.rc_channels.channels = channels
-            self.rc_channels.rssi = msg.rssi
-            self.rc_channels.timestamp = time.time()
-            
-            self._notify_data_update('rc_channels')
+            ),
+            rssi=msg.rssi,
+            timestamp=time.time()
+        )
+        
+        with self.lock:
+            self._publish(rc_channels=rc_channels)
+        
+        self._notify_data_update('rc_channels')
     
     def _handle_servo_output(self, msg):
         """處理舵機輸出數據"""
-        with self.lock:
-            outputs = [
+        servo_output = ServoOutputData(
+            outputs=(
                 msg.servo1_raw, msg.servo2_raw, msg.servo3_raw, msg.servo4_raw,
                 msg.servo5_raw, msg.servo6_raw, msg.servo7_raw, msg.servo8_raw,
                 msg.servo9_raw, msg.servo10_raw, msg.servo11_raw, msg.servo12_raw,
                 msg.servo13_raw, msg.servo14_raw, msg.servo15_raw, msg.servo16_raw
-            ]
-            
-            self.servo_output.outputs = outputs
-            self.servo_output.timestamp = time.time()
-            
-            self._notify_data_update('servo_output')
+            ),
+            timestamp=time.time()
+        )
+        
+        with self.lock:
+            self._publish(servo_output=servo_output)
+        
+        self._notify_data_update('servo_output')
     
     def _handle_gps_raw(self, msg):
         """處理GPS原始數據"""
         with self.lock:
-            self.system_status.gps_status = msg.fix_type
-            self.system_status.satellites_visible = msg.satellites_visible
-            self.system_status.timestamp = time.time()
-            
-            self._notify_data_update('gps')
+            self._publish(system_status=self.system_status._replace(
+                gps_status=msg.fix_type,
+                satellites_visible=msg.satellites_visible,
+                timestamp=time.time()
+            ))
+        
+        self._notify_data_update('gps')
     
     def _handle_status_text(self, msg):
         """處理狀態文本"""
@@ -340,21 +399,25 @@ class RoverTelemetryProcessor:
                 'text': text
             }
             self.status_messages.append(status_msg)
-            
-            self._notify_data_update('status_text')
+        
+        self._notify_data_update('status_text')
     
     def _handle_ekf_status(self, msg):
         """處理EKF狀態"""
+        ekf_status = EKFStatusData(
+            flags=msg.flags,
+            velocity_variance=msg.velocity_variance,
+            pos_horiz_variance=msg.pos_horiz_variance,
+            pos_vert_variance=msg.pos_vert_variance,
+            compass_variance=msg.compass_variance,
+            terrain_alt_variance=msg.terrain_alt_variance,
+            timestamp=time.time()
+        )
+        
         with self.lock:
-            self.ekf_status.flags = msg.flags
-            self.ekf_status.velocity_variance = msg.velocity_variance
-            self.ekf_status.pos_horiz_variance = msg.pos_horiz_variance
-            self.ekf_status.pos_vert_variance = msg.pos_vert_variance
-            self.ekf_status.compass_variance = msg.compass_variance
-            self.ekf_status.terrain_alt_variance = msg.terrain_alt_variance
-            self.ekf_status.timestamp = time.time()
-            
-            self._notify_data_update('ekf_status')
+            self._publish(ekf_status=ekf_status)
+        
+        self._notify_data_update('ekf_status')
     
     def _handle_nav_controller(self, msg):
         """處理導航控制器輸出（Rover專用）"""
@@ -365,7 +428,9 @@ class RoverTelemetryProcessor:
     
     def _on_connection_status_changed(self, connected: bool):
         """連接狀態變化回調"""
-        self.is_connected = connected
+        with self.lock:
+            self.is_connected = connected
+            self._publish(connected=connected)
         if connected:
             logger.info("遙測數據處理器已連接")
         else:
@@ -391,118 +456,147 @@ class RoverTelemetryProcessor:
                     logger.error(f"數據回調錯誤 ({data_type}): {e}")
     
     def get_dashboard_data(self) -> Dict[str, Any]:
-        """獲取儀表板所需的所有數據"""
-        with self.lock:
-            # 檢查連接狀態，如果未連接則返回基本資訊
-            if not self.is_connected:
-                return {
-                    'timestamp': time.time(),
-                    'connection_status': False,
-                    'offline_mode': True,
-                    'message': '未連接到飛控，顯示離線數據',
-                    'attitude': {
-                        'roll': 0,
-                        'pitch': 0,
-                        'yaw': 0,
-                        'timestamp': time.time()
-                    },
-                    'velocity': {
-                        'ground_speed': 0,
-                        'heading': 0,
-                        'climb_rate': 0,
-                        'timestamp': time.time()
-                    },
-                    'position': {
-                        'latitude': 0,
-                        'longitude': 0,
-                        'altitude': 0,
-                        'timestamp': time.time()
-                    },
-                    'battery': {
-                        'voltage': 0,
-                        'current': 0,
-                        'remaining': 0,
-                        'consumed': 0,
-                        'timestamp': time.time()
-                    },
-                    'system': {
-                        'armed': False,
-                        'flight_mode': 'OFFLINE',
-                        'gps_status': 0,
-                        'satellites': 0,
-                        'load': 0,
-                        'timestamp': time.time()
-                    },
-                    'rc_channels': {
-                        'channels': [1500, 1500, 1500, 1500, 1500, 1500, 1500, 1500],
-                        'rssi': 0,
-                        'timestamp': time.time()
-                    },
-                    'servo_output': {
-                        'outputs': [1500, 1500, 1500, 1500, 1500, 1500, 1500, 1500],
-                        'timestamp': time.time()
-                    }
-                }
-            
-            # 正常連接情況下返回實際數據
+        """
+        獲取儀表板所需的所有數據（不加鎖）
+        
+        同一個快照版本只建立一次，返回的字典為共用快取，請勿修改
+        """
+        return self._get_dashboard_cache()[1]
+    
+    def get_dashboard_json(self) -> bytes:
+        """獲取預先編碼的儀表板數據 JSON（UTF-8）"""
+        return self._get_dashboard_cache()[2]
+    
+    def _get_dashboard_cache(self) -> Tuple[int, Dict[str, Any], bytes]:
+        """取得目前快照版本的儀表板快取，版本改變時重新建立"""
+        snapshot = self._snapshot
+        cache = self._dashboard_cache
+        if cache is not None and cache[0] == snapshot.version:
+            self.dashboard_stats['hits'] += 1
+            return cache
+        
+        data = self._build_dashboard_data(snapshot)
+        payload = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        cache = (snapshot.version, data, payload)
+        # 多個讀取端同時重建時結果相同，最後寫入者勝出即可
+        self._dashboard_cache = cache
+        self.dashboard_stats['rebuilds'] += 1
+        return cache
+    
+    @staticmethod
+    def _build_dashboard_data(snapshot: TelemetrySnapshot) -> Dict[str, Any]:
+        """由快照建立儀表板數據"""
+        # 檢查連接狀態，如果未連接則返回基本資訊
+        if not snapshot.connected:
             return {
-                'timestamp': time.time(),
-                'connection_status': self.is_connected,
+                'timestamp': snapshot.timestamp,
+                'connection_status': False,
+                'offline_mode': True,
+                'message': '未連接到飛控，顯示離線數據',
                 'attitude': {
-                    'roll': self.attitude.roll_degrees,
-                    'pitch': self.attitude.pitch_degrees,
-                    'yaw': self.attitude.yaw_degrees,
-                    'timestamp': self.attitude.timestamp
+                    'roll': 0,
+                    'pitch': 0,
+                    'yaw': 0,
+                    'timestamp': snapshot.timestamp
                 },
                 'velocity': {
-                    'ground_speed': self.velocity.ground_speed,
-                    'heading': self.velocity.heading,
-                    'climb_rate': self.velocity.climb_rate,
-                    'timestamp': self.velocity.timestamp
+                    'ground_speed': 0,
+                    'heading': 0,
+                    'climb_rate': 0,
+                    'timestamp': snapshot.timestamp
                 },
                 'position': {
-                    'latitude': self.position.latitude,
-                    'longitude': self.position.longitude,
-                    'altitude': self.position.altitude,
-                    'timestamp': self.position.timestamp
+                    'latitude': 0,
+                    'longitude': 0,
+                    'altitude': 0,
+                    'timestamp': snapshot.timestamp
                 },
                 'battery': {
-                    'voltage': round(self.battery.voltage, 2),
-                    'current': round(self.battery.current, 2),
-                    'remaining': round(self.battery.remaining, 1),
-                    'consumed': round(self.battery.consumed, 0),
-                    'timestamp': self.battery.timestamp
+                    'voltage': 0,
+                    'current': 0,
+                    'remaining': 0,
+                    'consumed': 0,
+                    'timestamp': snapshot.timestamp
                 },
                 'system': {
-                    'armed': self.system_status.armed,
-                    'flight_mode': self.system_status.flight_mode,
-                    'gps_status': self.system_status.gps_status,
-                    'satellites': self.system_status.satellites_visible,
-                    'load': round(self.system_status.system_load, 1),
-                    'timestamp': self.system_status.timestamp
+                    'armed': False,
+                    'flight_mode': 'OFFLINE',
+                    'gps_status': 0,
+                    'satellites': 0,
+                    'load': 0,
+                    'timestamp': snapshot.timestamp
                 },
                 'rc_channels': {
-                    'channels': self.rc_channels.channels[:8],  # 只返回前8個通道
-                    'rssi': self.rc_channels.rssi,
-                    'timestamp': self.rc_channels.timestamp
+                    'channels': [1500, 1500, 1500, 1500, 1500, 1500, 1500, 1500],
+                    'rssi': 0,
+                    'timestamp': snapshot.timestamp
                 },
                 'servo_output': {
-                    'outputs': self.servo_output.outputs[:8],   # 只返回前8個輸出
-                    'timestamp': self.servo_output.timestamp
+                    'outputs': [1500, 1500, 1500, 1500, 1500, 1500, 1500, 1500],
+                    'timestamp': snapshot.timestamp
                 }
             }
-    
+        
+        # 正常連接情況下返回實際數據
+        return {
+            'timestamp': snapshot.timestamp,
+            'connection_status': snapshot.connected,
+            'attitude': {
+                'roll': snapshot.attitude.roll_degrees,
+                'pitch': snapshot.attitude.pitch_degrees,
+                'yaw': snapshot.attitude.yaw_degrees,
+                'timestamp': snapshot.attitude.timestamp
+            },
+            'velocity': {
+                'ground_speed': snapshot.velocity.ground_speed,
+                'heading': snapshot.velocity.heading,
+                'climb_rate': snapshot.velocity.climb_rate,
+                'timestamp': snapshot.velocity.timestamp
+            },
+            'position': {
+                'latitude': snapshot.position.latitude,
+                'longitude': snapshot.position.longitude,
+                'altitude': snapshot.position.altitude,
+                'timestamp': snapshot.position.timestamp
+            },
+            'battery': {
+                'voltage': round(snapshot.battery.voltage, 2),
+                'current': round(snapshot.battery.current, 2),
+                'remaining': round(snapshot.battery.remaining, 1),
+                'consumed': round(snapshot.battery.consumed, 0),
+                'timestamp': snapshot.battery.timestamp
+            },
+            'system': {
+                'armed': snapshot.system_status.armed,
+                'flight_mode': snapshot.system_status.flight_mode,
+                'gps_status': snapshot.system_status.gps_status,
+                'satellites': snapshot.system_status.satellites_visible,
+                'load': round(snapshot.system_status.system_load, 1),
+                'timestamp': snapshot.system_status.timestamp
+            },
+            'rc_channels': {
+                'channels': list(snapshot.rc_channels.channels[:8]),  # 只返回前8個通道
+                'rssi': snapshot.rc_channels.rssi,
+                'timestamp': snapshot.rc_channels.timestamp
+            },
+            'servo_output': {
+                'outputs': list(snapshot.servo_output.outputs[:8]), # 只返回前8個輸出
+                'timestamp': snapshot.servo_output.timestamp
+            }
+        }
+
     def get_performance_chart_data(self, chart_type: str, points: int = 100) -> List[Dict]:
         """獲取性能圖表數據"""
+        history = {
+            'attitude': self.attitude_history,
+            'velocity': self.velocity_history,
+            'battery': self.battery_history
+        }.get(chart_type)
+        if history is None:
+            return []
+        
         with self.lock:
-            if chart_type == 'attitude':
-                return list(self.attitude_history)[-points:]
-            elif chart_type == 'velocity':
-                return list(self.velocity_history)[-points:]
-            elif chart_type == 'battery':
-                return list(self.battery_history)[-points:]
-            else:
-                return []
+            return history.tail(points)
     
     def get_status_messages(self, count: int = 20) -> List[Dict]:
         """獲取狀態消息"""
@@ -0,0 +1,51 @@
+"""
+協議模組 - 載具與中控之間的自定義數據包協議
+提供數據包編碼/解碼（PacketCodec）、以數據類型註冊的預編譯數據結構、
+可重複使用的輸出緩衝區、查表 CRC16-CCITT、可重新同步的串流解析器
+與同類型數據包的 NumPy 批次解碼
+"""
+
+from .packet import (
+    DataType, DeviceID, PacketCodec, PacketEncoder,
+    PayloadStruct, Heartbeat, Attitude, GPS, SetWaypoint,
+    PAYLOAD_CODECS, register_payload, payload_codec,
+    boot_timestamp_ms
+)
+from .crc import (
+    crc16_ccitt, crc16_ccitt_bitwise, crc16_ccitt_array, crc16_ccitt_batch,
+    CRC16_TABLE
+)
+from .stream import StreamDecoder
+from .batch import (
+    FrameBatch, payload_dtype, frame_dtype, decode_batch, split_homogeneous, boot_to_unix
+)
+
+__all__ = [
+    'DataType',
+    'DeviceID',
+    'PacketCodec',
+    'PacketEncoder',
+    'PayloadStruct',
+    'Heartbeat',
+    'Attitude',
+    'GPS',
+    'SetWaypoint',
+    'PAYLOAD_CODECS',
+    'register_payload',
+    'payload_codec',
+    'boot_timestamp_ms',
+    'crc16_ccitt',
+    'crc16_ccitt_bitwise',
+    'crc16_ccitt_array',
+    'crc16_ccitt_batch',
+    'CRC16_TABLE',
+    'StreamDecoder',
+    'FrameBatch',
+    'payload_dtype',
+    'frame_dtype',
+    'decode_batch',
+    'split_homogeneous',
+    'boot_to_unix'
+]
+
+__version__ = '1.0.0'
@@ -0,0 +1,181 @@
+"""
+數據包批次解碼模組 - 同類型數據包直接轉為 NumPy 結構化陣列
+高頻數據（例如多台載具 50Hz 的姿態）常以多個相同類型的數據包連續送達，
+以 np.frombuffer 一次映射整段緩衝區、向量化驗證 CRC，
+省去逐包建立 Python 物件的成本，結果可直接寫入歷史數據存儲或用於分析
+"""
+import re
+import struct
+import logging
+from typing import Dict, Optional, Tuple, Type, NamedTuple
+
+import numpy as np
+
+from .packet import DataType, PacketCodec, PayloadStruct, payload_codec
+from .crc import crc16_ccitt_array
+
+# 設定日誌
+logger = logging.getLogger(__name__)
+
+# struct 格式字元對應的 NumPy 型別（小端序）
+_NUMPY_TYPES = {
+    'B': 'u1', 'b': 'i1', 'H': '<u2', 'h': '<i2',
+    'I': '<u4', 'i': '<i4', 'Q': '<u8', 'q': '<i8',
+    'f': '<f4', 'd': '<f8', '?': '?'
+}
+
+# uint32 毫秒時間戳的循環週期
+_TIMESTAMP_WRAP = 1 << 32
+
+_dtype_cache: Dict[Type[PayloadStruct], np.dtype] = {}
+_frame_dtype_cache: Dict[Type[PayloadStruct], np.dtype] = {}
+
+class FrameBatch(NamedTuple):
+    """批次解碼結果"""
+    records: np.ndarray  # 有效數據包的載荷（結構化陣列，欄位名稱同 FIELDS）
+    sources: np.ndarray  # 有效數據包的來源設備ID
+    valid: np.ndarray    # 每個輸入數據包是否有效的布林陣列
+
+def payload_dtype(codec: Type[PayloadStruct]) -> np.dtype:
+    """
+    由數據結構的 FORMAT 與 FIELDS 建立對應的 NumPy 結構化 dtype（含填充字節的位移）
+    """
+    if codec in _dtype_cache:
+        return _dtype_cache[codec]
+
+    fmt = codec.FORMAT
+    if fmt[0] != '<':
+        raise ValueError(f"{codec.__name__} 的 FORMAT 必須是小端序標準大小: {fmt}")
+
+    names, formats, offsets = [], [], []
+    offset = 0
+    fields = iter(codec.FIELDS)
+    for count, char in re.findall(r'(\d*)([a-zA-Z?])', fmt[1:]):
+        count = int(count) if count else 1
+        if char == 'x':
+            offset += count
+            continue
+        if char not in _NUMPY_TYPES:
+            raise ValueError(f"不支援的格式字元: {char}")
+        for _ in range(count):
+            names.append(next(fields))
+            formats.append(_NUMPY_TYPES[char])
+            offsets.append(offset)
+            offset += struct.calcsize('<' + char)
+
+    dtype = np.dtype({'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': codec.SIZE})
+    _dtype_cache[codec] = dtype
+    return dtype
+
+def frame_dtype(codec: Type[PayloadStruct]) -> np.dtype:
+    """完整數據包（起始、包頭、載荷、CRC、結束）的 NumPy 結構化 dtype"""
+    if codec in _frame_dtype_cache:
+        return _frame_dtype_cache[codec]
+
+    dtype = np.dtype([
+        ('start', 'u1'),
+        ('version', 'u1'),
+        ('source', 'u1'),
+        ('target', 'u1'),
+        ('type_low', 'u1'),
+        ('type_high', '<u2'),
+        ('length', '<u2'),
+        ('payload', payload_dtype(codec)),
+        ('crc', '<u2'),
+        ('footer', 'u1')
+    ])
+    assert dtype.itemsize == PacketCodec.OVERHEAD + codec.SIZE
+    _frame_dtype_cache[codec] = dtype
+    return dtype
+
+def decode_batch(buffer, data_type: DataType) -> FrameBatch:
+    """
+    批次解碼緩衝區中連續排列的同類型數據包
+
+    參數:
+        buffer: 包含 N 個連續數據包的緩衝區（bytes / bytearray / memoryview）
+        data_type: 數據類型
+
+    返回:
+        FrameBatch: 有效數據包的載荷與來源，以及每個數據包的有效性
+    """
+    codec = payload_codec(data_type)
+    if codec is None:
+        raise ValueError(f"未註冊的數據類型: {data_type}")
+
+    dtype = frame_dtype(codec)
+    if len(buffer) % dtype.itemsize:
+        raise ValueError(f"緩衝區長度 {len(buffer)} 不是數據包長度 {dtype.itemsize} 的整數倍")
+
+    frames = np.frombuffer(buffer, dtype=dtype)
+    if len(frames) == 0:
+        return FrameBatch(np.empty(0, dtype=payload_dtype(codec)), np.empty(0, dtype=np.uint8),
+                          np.empty(0, dtype=bool))
+
+    # 向量化驗證包頭與包尾
+    valid = (
+        (frames['start'] == PacketCodec.HEADER_BYTE) &
+        (frames['footer'] == PacketCodec.FOOTER_BYTE) &
+        (frames['version'] == PacketCodec.VERSION) &
+        (frames['type_low'] == (data_type & 0xFF)) &
+        (frames['type_high'] == (data_type >> 8)) &
+        (frames['length'] == codec.SIZE)
+    )
+
+    # CRC 範圍為版本到載荷結束
+    raw = np.frombuffer(buffer, dtype=np.uint8).reshape(len(frames), dtype.itemsize)
+    crc = crc16_ccitt_array(raw[:, 1:PacketCodec.PREFIX.size + codec.SIZE])
+    valid &= crc == frames['crc']
+
+    if valid.all():
+        # 全部有效時直接返回緩衝區的視圖（不複製）
+        return FrameBatch(frames['payload'], frames['source'], valid)
+    return FrameBatch(frames['payload'][valid], frames['source'][valid], valid)
+
+def split_homogeneous(buffer) -> Optional[Tuple[DataType, int]]:
+    """
+    判斷緩衝區是否可能由同類型、同長度的數據包連續組成（以第一個數據包的包頭推斷）
+
+    返回:
+        Tuple[DataType, int]: (數據類型, 數據包數量)，無法判斷時返回None
+    """
+    if len(buffer) < PacketCodec.OVERHEAD or buffer[0] != PacketCodec.HEADER_BYTE:
+        return None
+
+    _, _, _, _, type_low, type_high, length = PacketCodec.PREFIX.unpack_from(buffer, 0)
+    try:
+        data_type = DataType((type_high << 8) | type_low)
+    except ValueError:
+        return None
+
+    codec = payload_codec(data_type)
+    size = PacketCodec.OVERHEAD + length
+    if codec is None or codec.SIZE != length or len(buffer) % size:
+        return None
+    return data_type, len(buffer) // size
+
+def boot_to_unix(timestamps_ms: np.ndarray, reference_unix: float,
+                 reference_ms: Optional[int] = None) -> np.ndarray:
+    """
+    把載具的 uint32 開機毫秒時間戳轉換為 Unix 時間（秒）
+
+    以 reference_ms（預設為最後一個時間戳）對應 reference_unix（通常為收到數據的時間），
+    其餘時間戳依毫秒差推算，並處理 uint32 循環
+
+    參數:
+        timestamps_ms: 開機毫秒時間戳陣列
+        reference_unix: 參考點的 Unix 時間（秒）
+        reference_ms: 參考點的開機毫秒時間戳
+
+    返回:
+        np.ndarray: Unix 時間戳陣列（float64）
+    """
+    timestamps_ms = np.asarray(timestamps_ms, dtype=np.int64)
+    if len(timestamps_ms) == 0:
+        return np.empty(0, dtype=np.float64)
+    if reference_ms is None:
+        reference_ms = int(timestamps_ms[-1])
+
+    # 差值取 [-2^31, 2^31) 範圍，跨越循環點時仍得到正確的先後關係
+    delta = (timestamps_ms - reference_ms + _TIMESTAMP_WRAP // 2) % _TIMESTAMP_WRAP - _TIMESTAMP_WRAP // 2
+    return reference_unix + delta / 1000.0
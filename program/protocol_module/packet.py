@@ -0,0 +1,442 @@
+"""
+自定義數據包協議模組 - 載具與中控之間的二進位數據包
+數據包格式: 起始(0xFF) + 包頭(<BBBBHH: 版本、來源、目標、類型低字節、類型高字節、長度)
+           + 載荷 + CRC16-CCITT(<H) + 結束(0xFE)
+"""
+import struct
+import time
+import math
+import logging
+from enum import IntEnum
+from typing import Optional, Tuple, Sequence, Dict, Type
+
+import numpy as np
+
+from .crc import crc16_ccitt, crc16_ccitt_batch
+
+# 設定日誌
+logger = logging.getLogger(__name__)
+
+def boot_timestamp_ms() -> int:
+    """獲取毫秒時間戳（uint32，約49.7天循環一次）"""
+    return int(time.monotonic() * 1000) & 0xFFFFFFFF
+
+# ============================================================
+# 數據類型定義
+# ============================================================
+
+class DataType(IntEnum):
+    """數據類型ID枚舉"""
+    # 載具 → 中控
+    HEARTBEAT = 0x0101
+    ATTITUDE = 0x0102
+    MOTION = 0x0103
+    GPS = 0x0104
+    BATTERY = 0x0201
+    
+    # 中控 → 載具
+    GCS_HEARTBEAT = 0x1001
+    ARM_COMMAND = 0x1002
+    SET_MODE = 0x1003
+    RC_OVERRIDE = 0x1005
+    SET_WAYPOINT = 0x1101
+
+class DeviceID(IntEnum):
+    """設備ID枚舉"""
+    GCS = 0x01      # 中控
+    UAV = 0x02      # 無人機
+    UGV = 0x03      # 無人車
+    BROADCAST = 0xFF # 廣播
+
+# ============================================================
+# 數據包編碼/解碼器
+# ============================================================
+
+class PacketCodec:
+    """數據包編碼解碼器"""
+    
+    HEADER_BYTE = 0xFF
+    FOOTER_BYTE = 0xFE
+    VERSION = 0x01
+
+    # 預編譯的包頭（起始 + 版本、來源、目標、類型低字節、類型高字節、長度）與包尾（CRC + 結束）
+    PREFIX = struct.Struct('<BBBBBHH')
+    SUFFIX = struct.Struct('<HB')
+    OVERHEAD = PREFIX.size + SUFFIX.size
+    
+    @staticmethod
+    def crc16_ccitt(data: bytes) -> int:
+        """計算CRC16-CCITT校驗碼（查表實現）"""
+        return crc16_ccitt(data)
+
+    @staticmethod
+    def crc16_ccitt_batch(buffers: Sequence[bytes]) -> np.ndarray:
+        """批次計算多個數據的CRC16-CCITT校驗碼"""
+        return crc16_ccitt_batch(buffers)
+
+    @staticmethod
+    def verify_batch(packets: Sequence[bytes]) -> np.ndarray:
+        """
+        批次驗證多個完整數據包（起始/結束標識、長度與CRC）
+
+        返回:
+            np.ndarray: 每個數據包是否有效的布林陣列
+        """
+        valid = np.zeros(len(packets), dtype=bool)
+        crc_data = []
+        crc_expected = []
+        indices = []
+
+        for i, packet in enumerate(packets):
+            if (len(packet) < 12 or packet[0] != PacketCodec.HEADER_BYTE or
+                    packet[-1] != PacketCodec.FOOTER_BYTE):
+                continue
+            length = struct.unpack_from('<H', packet, 7)[0]
+            if len(packet) != 12 + length:
+                continue
+            indices.append(i)
+            crc_data.append(packet[1:9+length])
+            crc_expected.append(struct.unpack_from('<H', packet, 9 + length)[0])
+
+        if indices:
+            crc_actual = crc16_ccitt_batch(crc_data)
+            valid[indices] = crc_actual == np.array(crc_expected, dtype=np.uint16)
+        return valid
+    
+    @staticmethod
+    def encode_into(buffer: bytearray, offset: int, source: DeviceID, target: DeviceID,
+                    data_type: DataType, payload) -> int:
+        """
+        把數據包直接寫入緩衝區的指定位置（不產生中間 bytes 物件）
+
+        參數:
+            buffer: 可寫入的緩衝區（bytearray / memoryview）
+            offset: 寫入位置
+            source: 來源設備
+            target: 目標設備
+            data_type: 數據類型
+            payload: 載荷（bytes-like，或具有 pack_into 的數據結構）
+
+        返回:
+            int: 寫入的字節數
+        """
+        payload_offset = offset + PacketCodec.PREFIX.size
+        if hasattr(payload, 'pack_into'):
+            payload.pack_into(buffer, payload_offset)
+            length = payload.SIZE
+        else:
+            length = len(payload)
+            buffer[payload_offset:payload_offset + length] = payload
+
+        PacketCodec.PREFIX.pack_into(buffer, offset,
+            PacketCodec.HEADER_BYTE,  # 起始
+            PacketCodec.VERSION,      # 版本
+            source,                   # 來源
+            target,                   # 目標
+            data_type & 0xFF,         # 數據類型低字節
+            data_type >> 8,           # 數據類型高字節
+            length                    # 數據長度
+        )
+
+        # 計算CRC（從版本到數據載荷）
+        crc_end = payload_offset + length
+        with memoryview(buffer) as view:
+            crc = crc16_ccitt(view[offset + 1:crc_end])
+        PacketCodec.SUFFIX.pack_into(buffer, crc_end, crc, PacketCodec.FOOTER_BYTE)
+
+        return PacketCodec.OVERHEAD + length
+
+    @staticmethod
+    def encode(source: DeviceID, target: DeviceID, data_type: DataType,
+               payload: bytes) -> bytes:
+        """編碼數據包"""
+        length = payload.SIZE if hasattr(payload, 'pack_into') else len(payload)
+        packet = bytearray(PacketCodec.OVERHEAD + length)
+        PacketCodec.encode_into(packet, 0, source, target, data_type, payload)
+        return bytes(packet)
+
+    @staticmethod
+    def decode(packet: bytes) -> Optional[Tuple[DeviceID, DeviceID, DataType, bytes]]:
+        """解碼數據包"""
+        if len(packet) < 11:  # 最小包長
+            return None
+            
+        # 檢查起始和結束標識
+        if packet[0] != PacketCodec.HEADER_BYTE or packet[-1] != PacketCodec.FOOTER_BYTE:
+            return None
+        
+        # 解析包頭
+        _, version, source, target, type_low, type_high, length = PacketCodec.PREFIX.unpack_from(packet, 0)
+        
+        if version != PacketCodec.VERSION or len(packet) < PacketCodec.OVERHEAD + length:
+            return None
+        
+        data_type = (type_high << 8) | type_low
+        
+        # 提取載荷
+        payload = packet[9:9+length]
+        
+        # 驗證CRC
+        crc_expected = PacketCodec.SUFFIX.unpack_from(packet, 9 + length)[0]
+        crc_actual = PacketCodec.crc16_ccitt(memoryview(packet)[1:9+length])
+        
+        if crc_expected != crc_actual:
+            logger.debug(f"CRC校驗失敗: 期望 0x{crc_expected:04X}, 實際 0x{crc_actual:04X}")
+            return None
+        
+        return (DeviceID(source), DeviceID(target), DataType(data_type), payload)
+
+# ============================================================
+# 數據結構定義
+# ============================================================
+
+class PayloadStruct:
+    """
+    數據結構基類 - 以預編譯的 struct.Struct 在緩衝區指定位置直接讀寫
+    子類別定義 FORMAT、STRUCT、FIELDS、DATA_TYPE 與 values()
+    """
+    FORMAT = ''
+    FIELDS: Tuple[str, ...] = ()  # 依 FORMAT 順序的欄位名稱（不含填充字節）
+    STRUCT: struct.Struct = None
+    SIZE = 0
+    DATA_TYPE: DataType = None
+
+    def values(self) -> tuple:
+        """依 FORMAT 順序返回欄位值"""
+        raise NotImplementedError
+
+    @classmethod
+    def from_values(cls, values: tuple):
+        """由 FORMAT 順序的欄位值建立數據結構"""
+        return cls(*values)
+
+    def encode(self) -> bytes:
+        return self.STRUCT.pack(*self.values())
+
+    def pack_into(self, buffer, offset: int = 0) -> None:
+        """寫入緩衝區的指定位置"""
+        self.STRUCT.pack_into(buffer, offset, *self.values())
+
+    @classmethod
+    def decode(cls, data: bytes):
+        return cls.from_values(cls.STRUCT.unpack(data))
+
+    @classmethod
+    def unpack_from(cls, buffer, offset: int = 0):
+        """從緩衝區的指定位置讀取（不切片複製）"""
+        return cls.from_values(cls.STRUCT.unpack_from(buffer, offset))
+
+class Heartbeat(PayloadStruct):
+    """心跳包數據結構"""
+    FORMAT = '<IBBBB'
+    FIELDS = ('timestamp', 'armed', 'mode', 'system_status', 'online')
+    STRUCT = struct.Struct(FORMAT)
+    SIZE = 8
+    DATA_TYPE = DataType.HEARTBEAT
+    
+    def __init__(self, timestamp: int, armed: bool, mode: int, 
+                 system_status: int, online: bool):
+        self.timestamp = timestamp
+        self.armed = armed
+        self.mode = mode
+        self.system_status = system_status
+        self.online = online
+    
+    def values(self) -> tuple:
+        return (
+            self.timestamp,
+            1 if self.armed else 0,
+            self.mode,
+            self.system_status,
+            1 if self.online else 0
+        )
+    
+    @classmethod
+    def from_values(cls, values: tuple):
+        timestamp, armed, mode, status, online = values
+        return cls(timestamp, bool(armed), mode, status, bool(online))
+    
+    def __str__(self):
+        mode_names = {0: 'MANUAL', 2: 'GUIDED', 3: 'AUTO', 5: 'RTL'}
+        status_names = {0: '待機', 1: '運行中', 2: '執行任務', 3: '錯誤'}
+        return (f"心跳包: 武裝={'是' if self.armed else '否'}, "
+                f"模式={mode_names.get(self.mode, f'0x{self.mode:02X}')}, "
+                f"狀態={status_names.get(self.system_status, '未知')}")
+
+class Attitude(PayloadStruct):
+    """姿態數據結構"""
+    FORMAT = '<Iffffff'
+    FIELDS = ('timestamp', 'roll', 'pitch', 'yaw', 'roll_speed', 'pitch_speed', 'yaw_speed')
+    STRUCT = struct.Struct(FORMAT)
+    SIZE = 28
+    DATA_TYPE = DataType.ATTITUDE
+    
+    def __init__(self, timestamp: int, roll: float, pitch: float, yaw: float,
+                 roll_speed: float, pitch_speed: float, yaw_speed: float):
+        self.timestamp = timestamp
+        self.roll = roll
+        self.pitch = pitch
+        self.yaw = yaw
+        self.roll_speed = roll_speed
+        self.pitch_speed = pitch_speed
+        self.yaw_speed = yaw_speed
+    
+    def values(self) -> tuple:
+        return (
+            self.timestamp, self.roll, self.pitch, self.yaw,
+            self.roll_speed, self.pitch_speed, self.yaw_speed
+        )
+    
+    def __str__(self):
+        return (f"姿態: Roll={math.degrees(self.roll):.1f}°, "
+                f"Pitch={math.degrees(self.pitch):.1f}°, "
+                f"Yaw={math.degrees(self.yaw):.1f}°")
+
+class GPS(PayloadStruct):
+    """GPS數據結構"""
+    FORMAT = '<IddfBBH'
+    FIELDS = ('timestamp', 'latitude', 'longitude', 'altitude', 'fix_type', 'satellites', 'hdop')
+    STRUCT = struct.Struct(FORMAT)
+    SIZE = 28
+    DATA_TYPE = DataType.GPS
+    
+    def __init__(self, timestamp: int, latitude: float, longitude: float,
+                 altitude: float, fix_type: int, satellites: int, hdop: int):
+        self.timestamp = timestamp
+        self.latitude = latitude
+        self.longitude = longitude
+        self.altitude = altitude
+        self.fix_type = fix_type
+        self.satellites = satellites
+        self.hdop = hdop
+    
+    def values(self) -> tuple:
+        return (
+            self.timestamp, self.latitude, self.longitude, self.altitude,
+            self.fix_type, self.satellites, self.hdop
+        )
+    
+    def __str__(self):
+        fix_names = {0: '無GPS', 1: '無定位', 2: '2D', 3: '3D', 4: 'DGPS', 5: 'RTK浮點', 6: 'RTK固定'}
+        return (f"GPS: {self.latitude:.6f}°N, {self.longitude:.6f}°E, "
+                f"高度={self.altitude:.1f}m, "
+                f"定位={fix_names.get(self.fix_type, '未知')}, "
+                f"衛星={self.satellites}顆")
+
+class SetWaypoint(PayloadStruct):
+    """設定航點命令"""
+    FORMAT = '<IHHddffIB3x'
+    FIELDS = ('timestamp', 'waypoint_id', 'waypoint_count', 'latitude', 'longitude',
+              'altitude', 'speed', 'hold_time', 'action')
+    STRUCT = struct.Struct(FORMAT)
+    SIZE = 40
+    DATA_TYPE = DataType.SET_WAYPOINT
+    
+    def __init__(self, timestamp: int, waypoint_id: int, waypoint_count: int,
+                 latitude: float, longitude: float, altitude: float,
+                 speed: float, hold_time: int, action: int):
+        self.timestamp = timestamp
+        self.waypoint_id = waypoint_id
+        self.waypoint_count = waypoint_count
+        self.latitude = latitude
+        self.longitude = longitude
+        self.altitude = altitude
+        self.speed = speed
+        self.hold_time = hold_time
+        self.action = action
+    
+    def values(self) -> tuple:
+        return (
+            self.timestamp, self.waypoint_id, self.waypoint_count,
+            self.latitude, self.longitude, self.altitude,
+            self.speed, self.hold_time, self.action
+        )
+    
+    def __str__(self):
+        action_names = {0: '經過', 1: '停留', 2: '拍照', 3: '降落'}
+        return (f"航點 {self.waypoint_id+1}/{self.waypoint_count}: "
+                f"{self.latitude:.6f}°N, {self.longitude:.6f}°E, "
+                f"高度={self.altitude}m, "
+                f"動作={action_names.get(self.action, '未知')}")
+
+# ============================================================
+# 數據結構註冊表
+# ============================================================
+
+# 數據類型 → 數據結構
+PAYLOAD_CODECS: Dict[DataType, Type[PayloadStruct]] = {}
+
+def register_payload(codec: Type[PayloadStruct]) -> Type[PayloadStruct]:
+    """註冊數據結構（以其 DATA_TYPE 為鍵）"""
+    if codec.STRUCT.size != codec.SIZE:
+        raise ValueError(f"{codec.__name__} 的 FORMAT 長度 {codec.STRUCT.size} 與 SIZE {codec.SIZE} 不符")
+    if len(codec.FIELDS) != len(codec.STRUCT.unpack(bytes(codec.SIZE))):
+        raise ValueError(f"{codec.__name__} 的 FIELDS 數量與 FORMAT 不符")
+    PAYLOAD_CODECS[codec.DATA_TYPE] = codec
+    return codec
+
+def payload_codec(data_type: DataType) -> Optional[Type[PayloadStruct]]:
+    """獲取數據類型對應的數據結構，未註冊時返回None"""
+    return PAYLOAD_CODECS.get(data_type)
+
+for _codec in (Heartbeat, Attitude, GPS, SetWaypoint):
+    register_payload(_codec)
+
+# ============================================================
+# 數據包輸出緩衝區
+# ============================================================
+
+class PacketEncoder:
+    """
+    單一連線的數據包輸出緩衝區
+
+    預先配置一個 bytearray，數據包以 pack_into 直接寫入，
+    可把多個數據包合併為一個數據報送出，緩衝區在每次送出後重複使用
+    """
+
+    def __init__(self, source: DeviceID, capacity: int = 1472):
+        """
+        初始化輸出緩衝區
+
+        參數:
+            source: 本機設備ID
+            capacity: 緩衝區大小（字節），預設為一般乙太網路單一 UDP 數據報的最大載荷
+        """
+        self.source = source
+        self._buffer = bytearray(capacity)
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def append(self, target: DeviceID, record: PayloadStruct,
+               data_type: Optional[DataType] = None) -> bool:
+        """
+        把一個數據包寫入緩衝區尾端
+
+        返回:
+            bool: 緩衝區剩餘空間不足時返回False（需先送出並清空）
+        """
+        if self._length + PacketCodec.OVERHEAD + record.SIZE > len(self._buffer):
+            return False
+        self._length += PacketCodec.encode_into(
+            self._buffer, self._length, self.source, target,
+            data_type if data_type is not None else record.DATA_TYPE, record
+        )
+        return True
+
+    def getbuffer(self) -> memoryview:
+        """獲取目前緩衝區內容的視圖（下一次 clear/append 前有效）"""
+        return memoryview(self._buffer)[:self._length]
+
+    def clear(self) -> None:
+        self._length = 0
+
+    def encode(self, target: DeviceID, record: PayloadStruct,
+               data_type: Optional[DataType] = None) -> memoryview:
+        """清空緩衝區並編碼單一數據包，返回其視圖"""
+        self.clear()
+        if not self.append(target, record, data_type):
+            raise ValueError(f"數據包長度超過緩衝區大小: {len(self._buffer)}")
+        return self.getbuffer()
+
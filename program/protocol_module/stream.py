@@ -0,0 +1,220 @@
+"""
+數據包串流解析模組 - 從任意切分的字節流中解析數據包
+串口或 UDP 收到的數據可能是半個數據包、多個連續的數據包或夾雜雜訊，
+解析器以預先配置的 bytearray 作為接收緩衝區，以讀寫位置推進而不逐字節切片，
+遇到損壞的數據時從下一個起始標識重新同步
+"""
+import struct
+import logging
+from typing import Optional, Dict, Any, Iterator, Tuple
+
+from .packet import DataType, DeviceID, PacketCodec, PayloadStruct, payload_codec
+from .crc import crc16_ccitt
+
+# 設定日誌
+logger = logging.getLogger(__name__)
+
+# 數據包固定部分長度：起始(1) + 包頭(8) + CRC(2) + 結束(1)
+PACKET_OVERHEAD = 12
+
+# 起始標識 + 包頭長度（讀取長度欄位所需的最少字節數）
+HEADER_SIZE = 9
+
+# 包頭格式（不含起始標識）
+_HEADER = struct.Struct('<BBBBHH')
+_CRC = struct.Struct('<H')
+
+class StreamDecoder:
+    """
+    數據包串流解析器
+
+    用法:
+        decoder = StreamDecoder()
+        for source, target, data_type, payload in decoder.feed(chunk):
+            ...
+
+        # 或直接從接收緩衝區解碼為數據結構（不複製載荷）
+        for source, target, record in decoder.feed_records(chunk):
+            ...
+    """
+
+    def __init__(self, capacity: int = 65536, max_payload: int = 1024):
+        """
+        初始化串流解析器
+
+        參數:
+            capacity: 接收緩衝區初始大小（字節），不足時自動擴充
+            max_payload: 可接受的最大載荷長度，超過時視為損壞的包頭並重新同步
+                         （避免錯誤的長度欄位讓解析器長時間等待不存在的數據）
+        """
+        self.max_payload = max_payload
+        self._buffer = bytearray(max(capacity, PACKET_OVERHEAD + max_payload))
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+
+        # 是否與數據包邊界對齊（失去對齊後第一次丟棄數據時計為一次重新同步）
+        self._synced = True
+
+        # 統計
+        self.stats = {
+            'bytes_received': 0,
+            'frames': 0,
+            'dropped_bytes': 0,
+            'resyncs': 0,
+            'crc_errors': 0,
+            'framing_errors': 0,
+            'unknown_types': 0,
+            'payload_errors': 0
+        }
+
+    @property
+    def pending(self) -> int:
+        """緩衝區中尚未解析的字節數"""
+        return self._end - self._start
+
+    def feed(self, chunk: bytes) -> Iterator[Tuple[DeviceID, DeviceID, DataType, bytes]]:
+        """
+        寫入一段收到的數據，返回解析出的數據包生成器
+
+        參數:
+            chunk: 任意長度的數據
+
+        返回:
+            Iterator: (來源, 目標, 數據類型, 載荷)
+        """
+        self._append(chunk)
+        return self.frames()
+
+    def feed_records(self, chunk: bytes) -> Iterator[Tuple[DeviceID, DeviceID, PayloadStruct]]:
+        """
+        寫入一段收到的數據，返回解碼為數據結構的生成器
+
+        返回:
+            Iterator: (來源, 目標, 數據結構)，未註冊或長度不符的數據類型會被略過
+        """
+        self._append(chunk)
+        return self.records()
+
+    def _append(self, chunk: bytes) -> None:
+        """把數據寫入緩衝區尾端（空間不足時先把未解析的數據移到開頭，仍不足時擴充）"""
+        size = len(chunk)
+        self.stats['bytes_received'] += size
+
+        if self._end + size > len(self._buffer):
+            pending = self._end - self._start
+            if pending + size > len(self._buffer):
+                # 擴充緩衝區
+                new_buffer = bytearray(max(len(self._buffer) * 2, pending + size))
+                new_buffer[:pending] = self._view[self._start:self._end]
+                self._buffer = new_buffer
+                self._view = memoryview(self._buffer)
+            elif pending:
+                # 來源與目的區域可能重疊，先複製未解析的部分（通常不到一個數據包）
+                self._buffer[:pending] = self._buffer[self._start:self._end]
+            self._start = 0
+            self._end = pending
+
+        self._buffer[self._end:self._end + size] = chunk
+        self._end += size
+
+    def frames(self) -> Iterator[Tuple[DeviceID, DeviceID, DataType, bytes]]:
+        """解析緩衝區中所有完整的數據包（載荷複製為 bytes）"""
+        for source, target, data_type, payload_start, payload_end in self._scan():
+            yield source, target, data_type, bytes(self._view[payload_start:payload_end])
+
+    def records(self) -> Iterator[Tuple[DeviceID, DeviceID, PayloadStruct]]:
+        """解析緩衝區中所有完整的數據包，以 unpack_from 直接從接收緩衝區解碼載荷"""
+        for source, target, data_type, payload_start, payload_end in self._scan():
+            codec = payload_codec(data_type)
+            if codec is None:
+                self.stats['unknown_types'] += 1
+                continue
+            if payload_end - payload_start != codec.SIZE:
+                self.stats['payload_errors'] += 1
+                continue
+            yield source, target, codec.unpack_from(self._buffer, payload_start)
+
+    def _scan(self) -> Iterator[Tuple[DeviceID, DeviceID, DataType, int, int]]:
+        """掃描緩衝區，返回每個有效數據包的 (來源, 目標, 數據類型, 載荷起點, 載荷終點)"""
+        while self._end - self._start >= PACKET_OVERHEAD:
+            # 生成器暫停期間緩衝區可能被擴充，每次都重新取得
+            buffer = self._buffer
+            view = self._view
+            start = self._start
+
+            # 尋找起始標識
+            index = buffer.find(PacketCodec.HEADER_BYTE, start, self._end)
+            if index < 0:
+                self._drop(self._end - start)
+                self._start = self._end
+                break
+            if index > start:
+                self._drop(index - start)
+                self._start = start = index
+
+            if self._end - start < HEADER_SIZE:
+                break
+
+            version, source, target, type_low, type_high, length = _HEADER.unpack_from(buffer, start + 1)
+            if version != PacketCodec.VERSION or length > self.max_payload:
+                self._skip_header('framing_errors')
+                continue
+
+            total = PACKET_OVERHEAD + length
+            if self._end - start < total:
+                # 數據包尚未接收完整
+                break
+
+            payload_end = start + HEADER_SIZE + length
+            if buffer[start + total - 1] != PacketCodec.FOOTER_BYTE:
+                self._skip_header('framing_errors')
+                continue
+
+            crc_expected = _CRC.unpack_from(buffer, payload_end)[0]
+            if crc16_ccitt(view[start + 1:payload_end]) != crc_expected:
+                self._skip_header('crc_errors')
+                continue
+
+            self._start = start + total
+            self._synced = True
+
+            try:
+                source = DeviceID(source)
+                target = DeviceID(target)
+                data_type = DataType((type_high << 8) | type_low)
+            except ValueError:
+                self.stats['unknown_types'] += 1
+                continue
+
+            self.stats['frames'] += 1
+            yield source, target, data_type, start + HEADER_SIZE, payload_end
+
+        if self._start == self._end:
+            self._start = self._end = 0
+
+    def _skip_header(self, reason: str) -> None:
+        """目前的起始標識不是有效的數據包：跳過這個字節，從下一個起始標識重新同步"""
+        self.stats[reason] += 1
+        self._drop(1)
+        self._start += 1
+
+    def _drop(self, count: int) -> None:
+        if count <= 0:
+            return
+        self.stats['dropped_bytes'] += count
+        if self._synced:
+            self._synced = False
+            self.stats['resyncs'] += 1
+
+    def reset(self) -> None:
+        """清空緩衝區（未解析的數據計為丟棄），例如 UDP 數據報之間不應拼接半包"""
+        self._drop(self._end - self._start)
+        self._start = self._end = 0
+        self._synced = True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取解析統計"""
+        stats = dict(self.stats)
+        stats['pending'] = self.pending
+        return stats
@@ -0,0 +1,26 @@
+"""
+樹莓派模組 - 機載樹莓派通訊
+提供持久連線池的 HTTP 客戶端（輪詢 IMU、狀態與影像串流端點），
+接收樹莓派主動推送數據包的 UDP 監聽器，
+以及多個瀏覽器共用一條上游連線、可依設定檔縮放的 MJPEG 影像中繼
+"""
+
+from .client import RaspberryPiClient, EndpointStats, DEFAULT_ENDPOINTS
+from .ingest import UDPTelemetryListener, PAYLOAD_TYPES, DEFAULT_DEVICE_MAP
+from .video import MJPEGRelay, MJPEGParser, FrameEncoder, VideoProfile, MJPEG_MIMETYPE
+
+__all__ = [
+    'RaspberryPiClient',
+    'EndpointStats',
+    'DEFAULT_ENDPOINTS',
+    'UDPTelemetryListener',
+    'PAYLOAD_TYPES',
+    'DEFAULT_DEVICE_MAP',
+    'MJPEGRelay',
+    'MJPEGParser',
+    'FrameEncoder',
+    'VideoProfile',
+    'MJPEG_MIMETYPE'
+]
+
+__version__ = '1.0.0'
@@ -0,0 +1,200 @@
+"""
+樹莓派 HTTP 客戶端模組 - 持久連線池
+每台樹莓派共用一個 requests.Session，以 keep-alive 重用 TCP 連線，
+避免高頻輪詢（IMU 20Hz）時每次請求都重新握手，並統計每個端點的延遲與失敗次數
+"""
+import time
+import threading
+import logging
+from typing import Optional, Dict, Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 導入配置
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+
+# 設定日誌
+logger = logging.getLogger(__name__)
+
+# 樹莓派提供的 HTTP 端點
+DEFAULT_ENDPOINTS = {
+    'imu': '/imu_data',
+    'status': '/',
+    'video': '/video_feed'
+}
+
+# 平均延遲的指數平滑係數
+LATENCY_SMOOTHING = 0.2
+
+class EndpointStats:
+    """單一端點的請求統計"""
+
+    def __init__(self):
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_latency_ms: Optional[float] = None
+        self.avg_latency_ms: Optional[float] = None
+        self.max_latency_ms = 0.0
+        self.last_status: Optional[int] = None
+        self.last_error: Optional[str] = None
+        self.last_success_time: Optional[float] = None
+
+    def record_success(self, latency_ms: float, status: int) -> None:
+        self.requests += 1
+        self.last_status = status
+        self.last_latency_ms = latency_ms
+        self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+        if self.avg_latency_ms is None:
+            self.avg_latency_ms = latency_ms
+        else:
+            self.avg_latency_ms += LATENCY_SMOOTHING * (latency_ms - self.avg_latency_ms)
+
+        if status == 200:
+            self.consecutive_failures = 0
+            self.last_success_time = time.time()
+        else:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = f'HTTP {status}'
+
+    def record_failure(self, error: Exception) -> None:
+        self.requests += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_status = None
+        self.last_error = str(error)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'failures': self.failures,
+            'consecutiveFailures': self.consecutive_failures,
+            'failureRate': round(self.failures / self.requests, 4) if self.requests else 0.0,
+            'lastLatencyMs': round(self.last_latency_ms, 2) if self.last_latency_ms is not None else None,
+            'avgLatencyMs': round(self.avg_latency_ms, 2) if self.avg_latency_ms is not None else None,
+            'maxLatencyMs': round(self.max_latency_ms, 2),
+            'lastStatus': self.last_status,
+            'lastError': self.last_error,
+            'lastSuccessTime': self.last_success_time
+        }
+
+class RaspberryPiClient:
+    """
+    樹莓派 HTTP 客戶端 - 單一樹莓派的持久連線池與端點統計
+    """
+
+    def __init__(self, base_url: str, name: Optional[str] = None,
+                 endpoints: Optional[Dict[str, str]] = None,
+                 pool_size: Optional[int] = None,
+                 connect_timeout: Optional[float] = None,
+                 read_timeout: Optional[float] = None):
+        """
+        初始化樹莓派客戶端
+
+        參數:
+            base_url: 樹莓派 HTTP 服務位址（例如 http://172.20.10.2:8000）
+            name: 顯示名稱（用於日誌與統計）
+            endpoints: {端點名稱: 路徑}，預設為 IMU、狀態與影像串流
+            pool_size: 持久連線數
+            connect_timeout: 建立連線超時（秒）
+            read_timeout: 讀取回應超時（秒）
+        """
+        self.base_url = base_url.rstrip('/')
+        self.name = name or self.base_url
+        self.endpoints = dict(endpoints or DEFAULT_ENDPOINTS)
+        self.connect_timeout = connect_timeout or config.RASPBERRY_PI_CONNECT_TIMEOUT
+        self.read_timeout = read_timeout or config.RASPBERRY_PI_READ_TIMEOUT
+        pool_size = pool_size or config.RASPBERRY_PI_POOL_SIZE
+
+        # 持久連線：不重試（過時的遙測沒有重送價值），連線池滿時不阻塞
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.lock = threading.Lock()
+        self.stats: Dict[str, EndpointStats] = {name: EndpointStats() for name in self.endpoints}
+
+        logger.info(f"樹莓派客戶端初始化完成: {self.name} ({self.base_url}, 連線池: {pool_size})")
+
+    def url(self, endpoint: str) -> str:
+        """獲取端點的完整 URL"""
+        if endpoint not in self.endpoints:
+            raise KeyError(f"未知的樹莓派端點: {endpoint}")
+        return f"{self.base_url}{self.endpoints[endpoint]}"
+
+    def request(self, endpoint: str, timeout: Optional[float] = None,
+                stream: bool = False) -> requests.Response:
+        """
+        以持久連線發送 GET 請求並記錄延遲
+
+        參數:
+            endpoint: 端點名稱
+            timeout: 讀取超時（秒），省略時使用預設值
+            stream: 是否以串流方式讀取（影像串流使用，延遲只計算到收到回應標頭）
+
+        返回:
+            requests.Response: 回應物件（失敗時拋出 requests.exceptions.RequestException）
+        """
+        url = self.url(endpoint)
+        start = time.perf_counter()
+        try:
+            response = self.session.get(
+                url,
+                timeout=(self.connect_timeout, timeout or self.read_timeout),
+                stream=stream
+            )
+        except requests.exceptions.RequestException as e:
+            with self.lock:
+                self.stats[endpoint].record_failure(e)
+            raise
+
+        latency_ms = (time.perf_counter() - start) * 1000.0
+        with self.lock:
+            self.stats[endpoint].record_success(latency_ms, response.status_code)
+        return response
+
+    def get_json(self, endpoint: str, timeout: Optional[float] = None) -> Optional[Any]:
+        """
+        獲取端點的 JSON 數據
+
+        返回:
+            解析後的 JSON，請求失敗或狀態碼非 200 時返回None
+        """
+        try:
+            response = self.request(endpoint, timeout)
+        except requests.exceptions.RequestException as e:
+            logger.debug(f"無法連接到樹莓派 {self.name} {endpoint}: {e}")
+            return None
+
+        if response.status_code != 200:
+            logger.warning(f"樹莓派 {self.name} {endpoint} 返回錯誤: {response.status_code}")
+            return None
+
+        try:
+            return response.json()
+        except ValueError as e:
+            logger.error(f"解析樹莓派 {self.name} {endpoint} 數據錯誤: {e}")
+            return None
+
+    def open_stream(self, endpoint: str = 'video', timeout: Optional[float] = None) -> requests.Response:
+        """開啟串流端點（例如 MJPEG 影像），呼叫者負責關閉回應"""
+        return self.request(endpoint, timeout, stream=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取各端點的請求統計"""
+        with self.lock:
+            return {
+                'name': self.name,
+                'baseUrl': self.base_url,
+                'endpoints': {name: stats.to_dict() for name, stats in self.stats.items()}
+            }
+
+    def close(self) -> None:
+        """關閉所有持久連線"""
+        self.session.close()
@@ -0,0 +1,247 @@
+"""
+樹莓派推送數據接收模組 - UDP 監聽
+樹莓派以自定義數據包協議（PacketCodec）主動推送遙測，中控收到後立即套用到載具狀態，
+取代 HTTP 輪詢帶來的取樣延遲與無變化時的空請求
+"""
+import time
+import socket
+import threading
+import logging
+from typing import Optional, Dict, Any, Callable
+
+# 導入配置
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+
+import numpy as np
+
+from protocol_module import (
+    DataType, DeviceID, PayloadStruct, Heartbeat, Attitude, GPS, StreamDecoder,
+    decode_batch, split_homogeneous
+)
+
+# 設定日誌
+logger = logging.getLogger(__name__)
+
+# 可接收的數據類型與對應的數據結構
+PAYLOAD_TYPES = {
+    DataType.HEARTBEAT: Heartbeat,
+    DataType.ATTITUDE: Attitude,
+    DataType.GPS: GPS
+}
+
+# 來源設備對應的載具ID
+DEFAULT_DEVICE_MAP = {
+    DeviceID.UAV: 'UAV1',
+    DeviceID.UGV: 'UGV1'
+}
+
+class UDPTelemetryListener:
+    """
+    UDP 遙測接收器
+
+    在獨立線程中阻塞接收數據報（一個數據報可包含多個連續的數據包），
+    每個成功解碼的數據包以 on_sample(vehicle_id, data_type, record) 回調
+
+    若提供 on_batch，由多個同類型數據包組成的數據報會以 NumPy 批次解碼，
+    每台載具以 on_batch(vehicle_id, data_type, records) 回調一次（records 為結構化陣列）
+    """
+
+    def __init__(self, on_sample: Callable[[str, DataType, Any], None],
+                 host: Optional[str] = None, port: Optional[int] = None,
+                 device_map: Optional[Dict[int, str]] = None,
+                 on_batch: Optional[Callable[[str, DataType, np.ndarray], None]] = None):
+        """
+        初始化 UDP 遙測接收器
+
+        參數:
+            on_sample: 收到數據時的回調函數 (載具ID, 數據類型, 數據結構)
+            host: 監聽位址
+            port: 監聽埠
+            device_map: {來源設備ID: 載具ID}
+            on_batch: 批次解碼的回調函數 (載具ID, 數據類型, 結構化陣列)
+        """
+        self.on_sample = on_sample
+        self.on_batch = on_batch
+        self.host = host or config.INGEST_UDP_HOST
+        self.port = port or config.INGEST_UDP_PORT
+        self.device_map = dict(device_map or DEFAULT_DEVICE_MAP)
+
+        self.sock: Optional[socket.socket] = None
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+
+        # 數據包解析器（只在接收線程中使用）
+        self.decoder = StreamDecoder()
+
+        # 統計
+        self.stats = {
+            'datagrams': 0,
+            'bytes': 0,
+            'packets': 0,
+            'batches': 0,
+            'unknown_types': 0,
+            'unknown_sources': 0,
+            'callback_errors': 0
+        }
+        self.last_packet_time: Dict[str, float] = {}
+        self.last_address: Dict[str, str] = {}
+
+    def start(self) -> bool:
+        """綁定埠並啟動接收線程"""
+        if self.running:
+            return True
+
+        try:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.sock.bind((self.host, self.port))
+            # 定時超時以便檢查停止旗標
+            self.sock.settimeout(0.5)
+        except OSError as e:
+            logger.error(f"UDP 遙測接收器綁定失敗 {self.host}:{self.port}: {e}")
+            self.sock = None
+            return False
+
+        self.running = True
+        self.thread = threading.Thread(target=self._receive_loop, daemon=True)
+        self.thread.start()
+        logger.info(f"UDP 遙測接收器已啟動: {self.host}:{self.port}")
+        return True
+
+    def stop(self) -> None:
+        """停止接收線程並關閉埠"""
+        self.running = False
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=2.0)
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+        logger.info("UDP 遙測接收器已停止")
+
+    def _receive_loop(self) -> None:
+        """接收循環"""
+        while self.running:
+            try:
+                data, address = self.sock.recvfrom(65535)
+            except socket.timeout:
+                continue
+            except OSError as e:
+                if self.running:
+                    logger.error(f"UDP 遙測接收錯誤: {e}")
+                break
+
+            self.handle_datagram(data, address)
+
+    def handle_datagram(self, data: bytes, address: Any = None) -> int:
+        """
+        處理一個數據報（可包含多個連續的數據包）
+
+        返回:
+            int: 成功處理的數據包數量
+        """
+        with self.lock:
+            self.stats['datagrams'] += 1
+            self.stats['bytes'] += len(data)
+
+        if self.on_batch is not None:
+            handled = self._handle_batch(data, address)
+            if handled is not None:
+                return handled
+
+        handled = 0
+        for source, _, record in self.decoder.feed_records(data):
+            if self._handle_record(source, record, address):
+                handled += 1
+
+        # UDP 不會有跨數據報的半包，殘留的數據直接丟棄
+        self.decoder.reset()
+        return handled
+
+    def _handle_batch(self, data: bytes, address: Any) -> Optional[int]:
+        """
+        同類型數據包的快速路徑
+
+        返回:
+            Optional[int]: 成功處理的數據包數量，數據報不適用批次解碼時返回None（改用逐包解析）
+        """
+        layout = split_homogeneous(data)
+        if layout is None or layout[1] < 2 or layout[0] not in PAYLOAD_TYPES:
+            return None
+
+        data_type = layout[0]
+        batch = decode_batch(data, data_type)
+        if not batch.valid.all():
+            # 有損壞的數據包時交由串流解析器重新同步
+            return None
+
+        handled = 0
+        for source in np.unique(batch.sources):
+            vehicle_id = self.device_map.get(int(source))
+            if vehicle_id is None:
+                self._count('unknown_sources')
+                continue
+
+            records = batch.records[batch.sources == source]
+            with self.lock:
+                self.stats['packets'] += len(records)
+                self.stats['batches'] += 1
+                self.last_packet_time[vehicle_id] = time.time()
+                if address is not None:
+                    self.last_address[vehicle_id] = f"{address[0]}:{address[1]}"
+
+            try:
+                self.on_batch(vehicle_id, data_type, records)
+            except Exception as e:
+                self._count('callback_errors')
+                logger.error(f"套用批次推送數據錯誤 ({vehicle_id} {data_type.name}): {e}")
+                continue
+            handled += len(records)
+
+        return handled
+
+    def _handle_record(self, source: DeviceID, record: PayloadStruct, address: Any) -> bool:
+        """分發單一數據結構"""
+        vehicle_id = self.device_map.get(source)
+        if vehicle_id is None:
+            self._count('unknown_sources')
+            return False
+
+        data_type = record.DATA_TYPE
+        if data_type not in PAYLOAD_TYPES:
+            self._count('unknown_types')
+            return False
+
+        with self.lock:
+            self.stats['packets'] += 1
+            self.last_packet_time[vehicle_id] = time.time()
+            if address is not None:
+                self.last_address[vehicle_id] = f"{address[0]}:{address[1]}"
+
+        try:
+            self.on_sample(vehicle_id, data_type, record)
+        except Exception as e:
+            self._count('callback_errors')
+            logger.error(f"套用推送數據錯誤 ({vehicle_id} {data_type.name}): {e}")
+            return False
+
+        return True
+
+    def _count(self, key: str) -> None:
+        with self.lock:
+            self.stats[key] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取接收統計"""
+        with self.lock:
+            return {
+                'running': self.running,
+                'address': f"{self.host}:{self.port}",
+                'stats': dict(self.stats),
+                'decoder': self.decoder.get_stats(),
+                'lastPacketTime': dict(self.last_packet_time),
+                'senders': dict(self.last_address)
+            }
@@ -0,0 +1,553 @@
+"""
+樹莓派影像轉發模組 - 共用的 MJPEG 串流中繼
+每個鏡頭只向樹莓派開啟一條上游連線，解析 multipart/x-mixed-replace 的分段邊界後只保留最新一幀，
+再分發給任意數量的瀏覽器；慢速客戶端直接跳到最新一幀（丟棄中間的幀），不在伺服器端累積緩衝。
+沒有觀看者超過 VIDEO_RELAY_IDLE_TIMEOUT 秒後關閉上游連線，有觀看者時自動重新連線。
+
+觀看者可選擇解析度與品質設定檔（thumbnail / panel / full）：每個設定檔的最新一幀在工作執行緒池中
+只縮放與編碼一次，由所有選擇該設定檔的觀看者共用；縮放需要安裝 Pillow，未安裝時一律轉發原始幀
+"""
+import io
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Iterator, Callable, NamedTuple
+
+import requests
+import urllib3
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# 導入配置
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+
+from .client import RaspberryPiClient
+
+# 設定日誌
+logger = logging.getLogger(__name__)
+
+# 轉發給瀏覽器的分段邊界
+MJPEG_BOUNDARY = 'frame'
+MJPEG_MIMETYPE = f'multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}'
+
+# 原始解析度與品質（直接轉發上游的幀，不重新編碼）
+PROFILE_FULL = 'full'
+
+def parse_boundary(content_type: str, default: str = MJPEG_BOUNDARY) -> bytes:
+    """從 Content-Type 標頭取得 multipart 分段邊界"""
+    for param in content_type.split(';')[1:]:
+        name, _, value = param.strip().partition('=')
+        if name.strip().lower() == 'boundary' and value:
+            return value.strip().strip('"').encode('latin-1')
+    return default.encode('latin-1')
+
+def encode_part(jpeg: bytes) -> bytes:
+    """把一幀 JPEG 包裝為轉發用的 multipart 分段（所有客戶端共用同一份）"""
+    header = (f'--{MJPEG_BOUNDARY}\r\n'
+              f'Content-Type: image/jpeg\r\n'
+              f'Content-Length: {len(jpeg)}\r\n\r\n').encode('latin-1')
+    return header + jpeg + b'\r\n'
+
+class MJPEGParser:
+    """
+    增量解析 multipart/x-mixed-replace 串流
+    有 Content-Length 時直接依長度切出 JPEG，否則以下一個分段邊界為結尾
+    """
+
+    def __init__(self, boundary: bytes = MJPEG_BOUNDARY.encode(), max_frame_size: Optional[int] = None):
+        self.delimiter = b'--' + boundary
+        self.max_frame_size = max_frame_size or config.VIDEO_RELAY_MAX_FRAME_SIZE
+        self.buffer = bytearray()
+
+        # 統計
+        self.frames = 0
+        self.discarded = 0
+
+    @staticmethod
+    def _content_length(headers: bytes) -> Optional[int]:
+        for line in headers.split(b'\r\n'):
+            name, _, value = line.partition(b':')
+            if name.strip().lower() == b'content-length':
+                try:
+                    return int(value.strip())
+                except ValueError:
+                    return None
+        return None
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """
+        加入收到的數據
+
+        返回:
+            List[bytes]: 本次完整解析出的 JPEG 幀（依序）
+        """
+        buffer = self.buffer
+        buffer += data
+        frames = []
+
+        while True:
+            start = buffer.find(self.delimiter)
+            if start < 0:
+                # 保留可能是不完整邊界的尾端
+                del buffer[:max(0, len(buffer) - len(self.delimiter))]
+                break
+            if start:
+                del buffer[:start]
+
+            header_end = buffer.find(b'\r\n\r\n', len(self.delimiter))
+            if header_end < 0:
+                break
+
+            body_start = header_end + 4
+            length = self._content_length(bytes(buffer[len(self.delimiter):header_end]))
+            if length is not None:
+                end = next_part = body_start + length
+                if len(buffer) < end:
+                    break
+            else:
+                next_part = buffer.find(self.delimiter, body_start)
+                if next_part < 0:
+                    break
+                end = next_part - 2 if buffer[next_part - 2:next_part] == b'\r\n' else next_part
+
+            frame = bytes(buffer[body_start:end])
+            del buffer[:next_part]
+            if frame:
+                self.frames += 1
+                frames.append(frame)
+
+        if len(buffer) > self.max_frame_size:
+            # 找不到分段邊界的異常數據，丟棄以免緩衝區無限增長
+            self.discarded += 1
+            buffer.clear()
+            logger.warning(f"MJPEG 分段超過 {self.max_frame_size} 字節仍不完整，已丟棄")
+
+        return frames
+
+class VideoFrame(NamedTuple):
+    """中繼的最新一幀（不可變，發布時整體替換）"""
+    sequence: int
+    jpeg: bytes
+    part: bytes
+    timestamp: float
+
+class VideoProfile(NamedTuple):
+    """影像設定檔（max_width 為 None 表示不縮放、直接轉發原始幀）"""
+    max_width: Optional[int]
+    quality: Optional[int]
+
+def transcode_jpeg(jpeg: bytes, max_width: int, quality: int) -> bytes:
+    """把 JPEG 縮小到最大寬度並以指定品質重新編碼（需要 Pillow）"""
+    with Image.open(io.BytesIO(jpeg)) as image:
+        width = min(max_width, image.width)
+        height = max(1, round(image.height * width / image.width))
+
+        # draft 模式在解碼時直接以 DCT 縮放（1/2、1/4、1/8），比完整解碼後再縮小快得多
+        image.draft('RGB', (width, height))
+        frame = image.convert('RGB')
+
+    if frame.width != width:
+        frame = frame.resize((width, height), Image.BILINEAR)
+
+    output = io.BytesIO()
+    frame.save(output, 'JPEG', quality=quality)
+    return output.getvalue()
+
+class FrameEncoder:
+    """
+    影像設定檔的縮放編碼器
+    所有鏡頭共用一個工作執行緒池，縮放與 JPEG 編碼不佔用上游接收線程
+    """
+
+    def __init__(self, profiles: Optional[Dict[str, tuple]] = None, max_workers: Optional[int] = None):
+        """
+        初始化編碼器
+
+        參數:
+            profiles: {設定檔名稱: (最大寬度, JPEG 品質)}
+            max_workers: 工作執行緒數量
+        """
+        self.profiles = {name: VideoProfile(*value)
+                         for name, value in (profiles or config.VIDEO_PROFILES).items()}
+        self.profiles.setdefault(PROFILE_FULL, VideoProfile(None, None))
+        self.max_workers = max_workers or config.VIDEO_ENCODE_WORKERS
+
+        self.lock = threading.Lock()
+        self.executor: Optional[ThreadPoolExecutor] = None
+
+        if Image is None:
+            logger.warning("未安裝 Pillow，影像設定檔一律轉發原始幀")
+
+        # 統計
+        self.stats = {
+            'encoded': 0,
+            'errors': 0,
+            'bytes_in': 0,
+            'bytes_out': 0,
+            'total_time': 0.0
+        }
+
+    @property
+    def available(self) -> bool:
+        """是否可以縮放（已安裝 Pillow）"""
+        return Image is not None
+
+    def resolve(self, profile: Optional[str] = None, width: Optional[int] = None) -> str:
+        """
+        決定觀看者使用的設定檔
+
+        參數:
+            profile: 指定的設定檔名稱
+            width: 顯示寬度（像素），選擇最大寬度不小於此值的最小設定檔
+
+        返回:
+            str: 設定檔名稱（無法縮放時為 full）
+        """
+        if profile is not None and profile not in self.profiles:
+            raise ValueError(f"未知的影像設定檔: {profile} (可用: {list(self.profiles)})")
+        if not self.available:
+            return PROFILE_FULL
+        if profile is not None:
+            return profile
+        if width is None:
+            return config.VIDEO_DEFAULT_PROFILE
+
+        candidates = [(value.max_width, name) for name, value in self.profiles.items()
+                      if value.max_width is not None and value.max_width >= width]
+        return min(candidates)[1] if candidates else PROFILE_FULL
+
+    def submit(self, fn: Callable, *args) -> None:
+        """在工作執行緒池中執行"""
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                   thread_name_prefix='video-encode')
+            executor = self.executor
+        executor.submit(fn, *args)
+
+    def encode(self, jpeg: bytes, profile: str) -> bytes:
+        """依設定檔縮放並重新編碼一幀"""
+        settings = self.profiles[profile]
+        start = time.perf_counter()
+        try:
+            output = transcode_jpeg(jpeg, settings.max_width, settings.quality)
+        except Exception as e:
+            # 損壞或不完整的幀（Pillow 依情況拋出 OSError、ValueError 等）
+            self.stats['errors'] += 1
+            raise ValueError(f"影像幀解碼失敗: {e}")
+
+        self.stats['encoded'] += 1
+        self.stats['bytes_in'] += len(jpeg)
+        self.stats['bytes_out'] += len(output)
+        self.stats['total_time'] += time.perf_counter() - start
+        return output
+
+    def stop(self) -> None:
+        """停止工作執行緒"""
+        with self.lock:
+            executor = self.executor
+            self.executor = None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取編碼統計"""
+        stats = dict(self.stats)
+        encoded = stats['encoded']
+        return {
+            'available': self.available,
+            'workers': self.max_workers,
+            'profiles': {name: value._asdict() for name, value in self.profiles.items()},
+            'encoded': encoded,
+            'errors': stats['errors'],
+            'avgEncodeMs': (stats['total_time'] / encoded * 1000.0) if encoded else 0.0,
+            'compressionRatio': (stats['bytes_out'] / stats['bytes_in']) if stats['bytes_in'] else None
+        }
+
+class MJPEGRelay:
+    """
+    單一鏡頭的 MJPEG 中繼
+
+    用法:
+        relay = MJPEGRelay(raspberry_pi_clients['UAV1'])
+        Response(relay.stream(sleep=socketio.sleep, profile='thumbnail'), mimetype=MJPEG_MIMETYPE)
+    """
+
+    def __init__(self, client: RaspberryPiClient, name: Optional[str] = None,
+                 endpoint: str = 'video',
+                 encoder: Optional[FrameEncoder] = None,
+                 idle_timeout: Optional[float] = None,
+                 stall_timeout: Optional[float] = None,
+                 reconnect_delay: Optional[float] = None,
+                 read_timeout: Optional[float] = None,
+                 chunk_size: Optional[int] = None,
+                 poll_interval: Optional[float] = None):
+        """
+        初始化 MJPEG 中繼
+
+        參數:
+            client: 樹莓派客戶端（上游連線使用其持久連線池）
+            name: 顯示名稱（用於日誌與統計）
+            endpoint: 影像串流的端點名稱
+            encoder: 設定檔縮放編碼器（多個中繼可共用），省略時只提供原始幀
+            idle_timeout: 沒有觀看者多久後關閉上游連線（秒）
+            stall_timeout: 觀看者多久沒收到新幀即結束其串流（秒），讓瀏覽器觸發錯誤處理
+            reconnect_delay: 上游連線失敗後的重試間隔（秒）
+            read_timeout: 上游讀取超時（秒）
+            chunk_size: 每次從上游讀取的字節數
+            poll_interval: 觀看者檢查新幀的間隔（秒）
+        """
+        self.client = client
+        self.name = name or client.name
+        self.endpoint = endpoint
+        self.encoder = encoder
+        self.idle_timeout = idle_timeout or config.VIDEO_RELAY_IDLE_TIMEOUT
+        self.stall_timeout = stall_timeout or config.VIDEO_RELAY_STALL_TIMEOUT
+        self.reconnect_delay = reconnect_delay or config.VIDEO_RELAY_RECONNECT_DELAY
+        self.read_timeout = read_timeout or config.VIDEO_RELAY_READ_TIMEOUT
+        self.chunk_size = chunk_size or config.VIDEO_RELAY_CHUNK_SIZE
+        self.poll_interval = poll_interval or config.VIDEO_RELAY_POLL_INTERVAL
+
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.running = False
+        self.viewers = 0
+        self.last_viewer_time = time.monotonic()
+        self.upstream_connected = False
+
+        # 最新一幀（上游線程整體替換，觀看者無鎖讀取）
+        self._frame: Optional[VideoFrame] = None
+
+        # 各設定檔的最新一幀與觀看者數；每個設定檔同時最多一個編碼工作，
+        # 編碼期間到達的新幀只保留最新一幀，編碼完成後再處理
+        self._profile_frames: Dict[str, VideoFrame] = {}
+        self.profile_viewers: Dict[str, int] = {}
+        self._encoding = set()
+        self._encode_pending = set()
+
+        # 統計
+        self.stats = {
+            'connects': 0,
+            'failures': 0,
+            'frames_received': 0,
+            'bytes_received': 0,
+            'frames_sent': 0,
+            'frames_dropped': 0,
+            'viewers_total': 0
+        }
+        self.fps = 0.0
+
+    def _ensure_upstream(self) -> None:
+        """有觀看者時確保上游線程在執行"""
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.running = True
+            self.thread = threading.Thread(target=self._upstream_loop, daemon=True,
+                                           name=f'mjpeg-relay-{self.name}')
+            self.thread.start()
+
+    def _idle(self) -> bool:
+        """沒有觀看者超過閒置時間"""
+        with self.lock:
+            return self.viewers == 0 and time.monotonic() - self.last_viewer_time > self.idle_timeout
+
+    def _upstream_loop(self) -> None:
+        """上游線程：維持一條到樹莓派的串流連線，解析並發布最新一幀"""
+        logger.info(f"{self.name} 影像中繼開始連線上游")
+
+        while self.running and not self._idle():
+            response = None
+            try:
+                response = self.client.open_stream(self.endpoint, timeout=self.read_timeout)
+                if response.status_code != 200:
+                    raise requests.exceptions.HTTPError(f'HTTP {response.status_code}')
+
+                self.stats['connects'] += 1
+                self.upstream_connected = True
+                parser = MJPEGParser(parse_boundary(response.headers.get('content-type', '')))
+
+                for data in self._iter_upstream(response):
+                    self.stats['bytes_received'] += len(data)
+                    for jpeg in parser.feed(data):
+                        self._publish(jpeg)
+                    if not self.running or self._idle():
+                        break
+                else:
+                    logger.warning(f"{self.name} 上游影像串流已結束")
+            except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as e:
+                # read1 直接讀取 urllib3 回應，逾時或斷線拋出的是 urllib3 的例外
+                self.stats['failures'] += 1
+                logger.debug(f"{self.name} 上游影像串流錯誤: {e}")
+            finally:
+                self.upstream_connected = False
+                if response is not None:
+                    response.close()
+
+            if self.running and not self._idle():
+                time.sleep(self.reconnect_delay)
+
+        with self.lock:
+            self.running = False
+        logger.info(f"{self.name} 影像中繼已關閉上游連線")
+
+    def _iter_upstream(self, response: requests.Response) -> Iterator[bytes]:
+        """
+        逐次返回上游收到的數據
+        iter_content 會等到湊滿 chunk_size 才返回，低幀率或小畫面時會延遲整幀，
+        因此優先使用 urllib3 的 read1（有數據即返回，最多 chunk_size 字節）
+        """
+        read1 = getattr(response.raw, 'read1', None)
+        if read1 is None:
+            # urllib3 1.x 沒有 read1，以較小的讀取單位降低延遲
+            yield from response.iter_content(chunk_size=min(self.chunk_size, 1024))
+            return
+
+        while True:
+            data = read1(self.chunk_size)
+            if not data:
+                return
+            yield data
+
+    def _publish(self, jpeg: bytes) -> None:
+        """發布新的一幀（分段只編碼一次，所有觀看者共用）"""
+        now = time.time()
+        previous = self._frame
+        if previous is not None:
+            interval = now - previous.timestamp
+            if interval > 0:
+                self.fps = 0.9 * self.fps + 0.1 * (1.0 / interval) if self.fps else 1.0 / interval
+
+        sequence = previous.sequence + 1 if previous is not None else 1
+        self._frame = VideoFrame(sequence, jpeg, encode_part(jpeg), now)
+        self.stats['frames_received'] += 1
+
+        with self.lock:
+            profiles = [name for name, count in self.profile_viewers.items()
+                        if count > 0 and name != PROFILE_FULL]
+        for profile in profiles:
+            self._schedule_encode(profile)
+
+    def _schedule_encode(self, profile: str) -> None:
+        """排程設定檔的編碼；已有編碼工作時只標記待處理"""
+        with self.lock:
+            if profile in self._encoding:
+                self._encode_pending.add(profile)
+                return
+            self._encoding.add(profile)
+
+        try:
+            self.encoder.submit(self._encode_profile, profile)
+        except RuntimeError:
+            # 編碼器已停止
+            with self.lock:
+                self._encoding.discard(profile)
+
+    def _encode_profile(self, profile: str) -> None:
+        """在工作執行緒中把最新一幀編碼為設定檔的解析度與品質"""
+        while True:
+            source = self._frame
+            previous = self._profile_frames.get(profile)
+            if source is not None and (previous is None or previous.sequence != source.sequence):
+                try:
+                    jpeg = self.encoder.encode(source.jpeg, profile)
+                    # 沿用原始幀的序號與時間，丟幀統計與過期判斷與原始幀一致
+                    self._profile_frames[profile] = VideoFrame(source.sequence, jpeg,
+                                                               encode_part(jpeg), source.timestamp)
+                except ValueError as e:
+                    logger.debug(f"{self.name} {profile} 影像編碼失敗: {e}")
+
+            with self.lock:
+                if profile not in self._encode_pending:
+                    self._encoding.discard(profile)
+                    return
+                self._encode_pending.discard(profile)
+
+    def latest_frame(self, profile: str = PROFILE_FULL) -> Optional[VideoFrame]:
+        """設定檔的最新一幀，尚未收到任何幀時返回None"""
+        if profile == PROFILE_FULL or self.encoder is None:
+            return self._frame
+        return self._profile_frames.get(profile)
+
+    def stream(self, sleep: Callable[[float], None] = time.sleep,
+               profile: str = PROFILE_FULL) -> Iterator[bytes]:
+        """
+        單一觀看者的 multipart 串流
+
+        參數:
+            sleep: 等待函數（在 eventlet 下請傳入 socketio.sleep）
+            profile: 影像設定檔（沒有編碼器時一律為 full）
+
+        返回:
+            Iterator[bytes]: 每次產生最新一幀的 multipart 分段；
+            客戶端寫入較慢時直接跳到最新一幀，中間的幀計入 frames_dropped
+        """
+        if self.encoder is None:
+            profile = PROFILE_FULL
+
+        with self.lock:
+            self.viewers += 1
+            self.stats['viewers_total'] += 1
+            self.profile_viewers[profile] = self.profile_viewers.get(profile, 0) + 1
+        self._ensure_upstream()
+        if profile != PROFILE_FULL and self._frame is not None:
+            # 不等下一幀，立即以目前的幀編碼
+            self._schedule_encode(profile)
+
+        last_sequence = 0
+        last_frame_time = time.monotonic()
+        try:
+            while True:
+                frame = self.latest_frame(profile)
+                # 上游中斷前留下的舊幀不送出
+                if frame is None or frame.sequence == last_sequence or \
+                        time.time() - frame.timestamp > self.stall_timeout:
+                    if time.monotonic() - last_frame_time > self.stall_timeout:
+                        logger.debug(f"{self.name} 超過 {self.stall_timeout} 秒沒有新的影像幀，結束串流")
+                        return
+                    self._ensure_upstream()
+                    sleep(self.poll_interval)
+                    continue
+
+                if last_sequence:
+                    self.stats['frames_dropped'] += frame.sequence - last_sequence - 1
+                last_sequence = frame.sequence
+                last_frame_time = time.monotonic()
+                self.stats['frames_sent'] += 1
+                yield frame.part
+        finally:
+            with self.lock:
+                self.viewers -= 1
+                self.profile_viewers[profile] -= 1
+                self.last_viewer_time = time.monotonic()
+
+    def stop(self) -> None:
+        """停止上游線程"""
+        self.running = False
+        thread = self.thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout=self.read_timeout + 1.0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取中繼統計"""
+        frame = self._frame
+        with self.lock:
+            stats = dict(self.stats)
+            stats['viewers'] = self.viewers
+            stats['profileViewers'] = {name: count for name, count in self.profile_viewers.items() if count}
+        stats.update({
+            'name': self.name,
+            'upstreamConnected': self.upstream_connected,
+            'fps': round(self.fps, 2),
+            'lastFrameAge': round(time.time() - frame.timestamp, 3) if frame is not None else None,
+            'lastFrameBytes': len(frame.jpeg) if frame is not None else 0,
+            'profileFrameBytes': {name: len(value.jpeg) for name, value in self._profile_frames.items()}
+        })
+        return stats
@@ -409,12 +409,12 @@ class OverviewPage {
         const streamImg = document.getElementById(`cameraStream${prefix}`);
         const img = document.getElementById(`cameraImage${prefix}`);
         
-        // 設定視頻串流 URL
+        // 設定視頻串流 URL（經由中控的影像中繼，所有分頁共用一條到樹莓派的連線）
         let streamUrl = '';
-        if (vehicleId === 'UAV1') {
-            streamUrl = 'http://172.20.10.5:8000/video_feed';
-        } else if (vehicleId === 'UGV1') {
-            streamUrl = 'http://172.20.10.10:8000/video_feed';
+        if (vehicleId === 'UAV1' || vehicleId === 'UGV1') {
+            // 依顯示寬度選擇影像設定檔，避免把原始解析度送進小視窗
+            const width = streamImg ? Math.round((streamImg.parentElement || streamImg).clientWidth * (window.devicePixelRatio || 1)) : 0;
+            streamUrl = `/api/vehicle/${vehicleId}/video` + (width > 0 ? `?width=${width}` : '');
         }
         
         // 如果是 UAV1 或 UGV1，使用 MJPEG 串流
@@ -668,10 +668,10 @@ class LidarDisplay {
         this.ws = null;
         this.isConnected = false;
         this.lidarData = {
-            angle_min: 0,
-            angle_increment: 0,
             range_max: 16.0,
-            ranges: []
+            min_range: 0,
+            raw_count: 0,
+            points: new Float32Array(0)  // 交錯排列的 (x, y)，單位米
         };
         
         // 顯示設定
@@ -684,15 +684,17 @@ class LidarDisplay {
         this.flipAngle = false;
         this.rotationOffset = 0;
         
-        // WebSocket 設定
-        this.wsUrl = 'ws://172.20.10.10:8765';
+        // 經由中控的 LIDAR 中繼取得降採樣後的二進位幀（樹莓派只需服務中控一條連線）
+        this.scanUrl = '/api/lidar/scan';
+        this.pollInterval = 100; // 毫秒
+        this.lastSequence = 0;
         
         this.init();
     }
     
     init() {
         this.initCanvas();
-        this.connectWebSocket();
+        this.startPolling();
         console.log('[LIDAR] 初始化完成');
     }
     
@@ -717,58 +719,45 @@ class LidarDisplay {
         });
     }
     
-    connectWebSocket() {
-        try {
-            console.log(`[LIDAR] 正在連接到: ${this.wsUrl}`);
-            this.updateStatus('連接中...', 'warning');
-            
-            this.ws = new WebSocket(this.wsUrl);
-            
-            this.ws.onopen = () => {
-                console.log('[LIDAR] WebSocket 已連接');
-                this.isConnected = true;
-                this.updateStatus('已連接', 'success');
-            };
-            
-            this.ws.onmessage = (event) => {
-                try {
-                    const data = JSON.parse(event.data);
-                    this.handleLidarData(data);
-                } catch (e) {
-                    console.error('[LIDAR] 解析錯誤:', e);
+    startPolling() {
+        const poll = async () => {
+            try {
+                const response = await fetch(this.scanUrl, { cache: 'no-store' });
+                if (response.ok) {
+                    this.handleLidarFrame(await response.arrayBuffer());
+                    if (!this.isConnected) {
+                        this.isConnected = true;
+                        this.updateStatus('已連接', 'success');
+                    }
+                } else if (this.isConnected || response.status === 404) {
+                    this.isConnected = false;
+                    this.updateStatus('未連接', 'secondary');
                 }
-            };
-            
-            this.ws.onerror = (error) => {
-                console.error('[LIDAR] WebSocket 錯誤:', error);
-                this.updateStatus('連接錯誤', 'danger');
-            };
-            
-            this.ws.onclose = () => {
-                console.log('[LIDAR] WebSocket 已斷開');
+            } catch (e) {
                 this.isConnected = false;
-                this.updateStatus('未連接', 'secondary');
-                
-                // 5 秒後重連
-                setTimeout(() => this.connectWebSocket(), 5000);
-            };
-        } catch (e) {
-            console.error('[LIDAR] 連接失敗:', e);
-            this.updateStatus('未連接', 'secondary');
-        }
+                this.updateStatus('連接錯誤', 'danger');
+            }
+            setTimeout(poll, this.isConnected ? this.pollInterval : 5000);
+        };
+        this.updateStatus('連接中...', 'warning');
+        poll();
     }
     
-    handleLidarData(data) {
-        if (data.type === 'status' || data.type === 'error') {
+    handleLidarFrame(buffer) {
+        // 幀頭 '<B3xIIIdff'：版本、序號、點數、原始有效點數、時間戳、最大量程、最近距離（共 32 字節）
+        const view = new DataView(buffer);
+        const sequence = view.getUint32(4, true);
+        if (sequence === this.lastSequence) {
             return;
         }
+        this.lastSequence = sequence;
         
-        // 正規化資料
+        const count = view.getUint32(8, true);
         this.lidarData = {
-            angle_min: data.angle_min || data.angleMin || 0,
-            angle_increment: data.angle_increment || data.angleIncrement || 0,
-            range_max: data.range_max || data.rangeMax || 16.0,
-            ranges: data.ranges || data.data || []
+            raw_count: view.getUint32(12, true),
+            range_max: view.getFloat32(24, true) || 16.0,
+            min_range: view.getFloat32(28, true),
+            points: new Float32Array(buffer, 32, count * 2)
         };
         
         // 更新統計
@@ -783,17 +772,12 @@ class LidarDisplay {
         const minRangeEl = document.getElementById('lidarMinRange');
         const maxRangeEl = document.getElementById('lidarMaxRange');
         
-        if (pointCountEl) pointCountEl.textContent = this.lidarData.ranges.length;
-        
-        // 計算最短距離（過濾有效數據）
-        const validRanges = this.lidarData.ranges.filter(r => 
-            isFinite(r) && r > 0 && r <= this.lidarData.range_max
-        );
+        if (pointCountEl) pointCountEl.textContent = this.lidarData.raw_count;
         
+        // 最短距離由中控在降採樣前計算
         if (minRangeEl) {
-            if (validRanges.length > 0) {
-                const minRange = Math.min(...validRanges);
-                minRangeEl.textContent = `${minRange.toFixed(2)} m`;
+            if (this.lidarData.raw_count > 0) {
+                minRangeEl.textContent = `${this.lidarData.min_range.toFixed(2)} m`;
             } else {
                 minRangeEl.textContent = '- m';
             }
@@ -863,28 +847,25 @@ class LidarDisplay {
     }
     
     drawLidarPoints(centerX, centerY) {
-        const { angle_min, angle_increment, range_max, ranges } = this.lidarData;
+        const { range_max, points } = this.lidarData;
         
-        if (!ranges || ranges.length === 0) return;
+        if (!points || points.length === 0) return;
         
         const rotRad = this.rotationOffset * Math.PI / 180;
-        let angle = angle_min;
-        
-        for (let i = 0; i < ranges.length; i++) {
-            const range = ranges[i];
-            
-            if (!isFinite(range) || range <= 0 || range > range_max) {
-                angle += angle_increment;
-                continue;
+        const cosRot = Math.cos(rotRad);
+        const sinRot = Math.sin(rotRad);
+        
+        for (let i = 0; i < points.length; i += 2) {
+            let x = points[i];
+            let y = points[i + 1];
+            
+            if (this.flipAngle) y = -y;
+            if (rotRad) {
+                const rx = x * cosRot - y * sinRot;
+                y = x * sinRot + y * cosRot;
+                x = rx;
             }
             
-            let adjustedAngle = angle;
-            if (this.flipAngle) adjustedAngle = -adjustedAngle;
-            adjustedAngle += rotRad;
-            
-            let x = range * Math.cos(adjustedAngle);
-            let y = range * Math.sin(adjustedAngle);
-            
             if (this.flipX) x = -x;
             if (this.flipY) y = -y;
             
@@ -892,15 +873,13 @@ class LidarDisplay {
             const canvasY = centerY - y * this.scale;
             
             // 根據距離設置顏色
-            const normalizedRange = range / range_max;
+            const normalizedRange = Math.min(1, Math.hypot(x, y) / range_max);
             const r = Math.floor(255 * normalizedRange);
             const b = Math.floor(255 * (1 - normalizedRange));
             const color = `rgb(${r}, 0, ${b})`;
             
             this.ctx.fillStyle = color;
             this.ctx.fillRect(canvasX, canvasY, this.pointSize, this.pointSize);
-            
-            angle += angle_increment;
         }
     }
 }
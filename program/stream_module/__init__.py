@@ -0,0 +1,28 @@
+"""
+串流模組 - Socket.IO 遙測推送
+提供遙測狀態的增量編碼（delta）與關鍵幀機制、固定頻率合併推送的廣播排程器，
+以及 MessagePack / struct 二進位編碼，降低每個客戶端的頻寬與編碼成本
+"""
+
+from .delta import DeltaEncoder, flatten_state, unflatten_state
+from .broadcaster import TelemetryBroadcaster, STREAM_MODES
+from .codec import (
+    TELEMETRY_ENCODINGS, available_encodings, encode_payload,
+    pack_state, pack_states, unpack_states
+)
+
+__all__ = [
+    'DeltaEncoder',
+    'flatten_state',
+    'unflatten_state',
+    'TelemetryBroadcaster',
+    'STREAM_MODES',
+    'TELEMETRY_ENCODINGS',
+    'available_encodings',
+    'encode_payload',
+    'pack_state',
+    'pack_states',
+    'unpack_states'
+]
+
+__version__ = '1.0.0'
@@ -0,0 +1,330 @@
+"""
+遙測廣播排程模組 - 以固定頻率合併推送所有載具的遙測數據
+各數據來源只登記載具的最新狀態，由排程器每個週期為每個推送群組編碼並發送一次批次幀，
+推送成本因此不再隨「載具數 × 客戶端數 × 數據來源頻率」增長
+"""
+import time
+import threading
+import logging
+from typing import Optional, Dict, Any, List, Tuple
+
+# 導入配置
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+
+from .delta import DeltaEncoder
+from .codec import encode_payload, available_encodings
+
+# 設定日誌
+logger = logging.getLogger(__name__)
+
+# 推送模式
+STREAM_MODES = ('full', 'delta')
+
+class BroadcastGroup:
+    """
+    推送群組 - 相同推送模式、頻率與編碼格式的客戶端共用一個 Socket.IO 房間，
+    每次推送只編碼一次
+    """
+
+    def __init__(self, mode: str, interval_ticks: int, encoding: str, room: str,
+                 keyframe_interval: Optional[int] = None):
+        self.mode = mode
+        self.interval_ticks = interval_ticks
+        self.encoding = encoding
+        self.room = room
+        self.keyframe_interval = keyframe_interval
+        self.clients = set()
+
+        # 每個載具上次推送時的狀態版本
+        self.sent_versions: Dict[str, int] = {}
+
+        # 增量模式下每個載具的編碼器（比較基準依群組推送頻率而不同，因此不可跨群組共用）
+        self.delta_encoders: Dict[str, DeltaEncoder] = {}
+
+    @property
+    def key(self) -> Tuple[str, int, str]:
+        return (self.mode, self.interval_ticks, self.encoding)
+
+    def encoder(self, vehicle_id: str) -> DeltaEncoder:
+        """獲取載具的增量編碼器"""
+        if vehicle_id not in self.delta_encoders:
+            self.delta_encoders[vehicle_id] = DeltaEncoder(vehicle_id, self.keyframe_interval)
+        return self.delta_encoders[vehicle_id]
+
+class TelemetryBroadcaster:
+    """
+    遙測廣播排程器
+
+    - 未訂閱的客戶端（舊版前端）維持接收每個載具的 telemetry_data 事件，頻率上限為排程頻率
+    - 以 telemetry_subscribe 訂閱的客戶端依 (模式, 頻率) 分組，每個週期接收一個 telemetry_batch 批次幀
+    - 客戶端可在連線時協商編碼格式（json / msgpack / struct），相同格式的客戶端共用編碼結果
+    """
+
+    # 舊版客戶端（JSON 編碼）的房間（連線時自動加入）
+    LEGACY_ROOM = 'telemetry_full'
+
+    def __init__(self, socketio, rate_hz: Optional[float] = None,
+                 keyframe_interval: Optional[int] = None):
+        """
+        初始化廣播排程器
+
+        參數:
+            socketio: Flask-SocketIO 實例（用於 emit 與協作式 sleep）
+            rate_hz: 排程頻率（Hz），也是客戶端可選的最高頻率
+            keyframe_interval: 增量模式下的關鍵幀間隔（幀）
+        """
+        self.socketio = socketio
+        self.rate_hz = float(rate_hz or config.TELEMETRY_UPDATE_RATE)
+        self.keyframe_interval = keyframe_interval or config.TELEMETRY_KEYFRAME_INTERVAL
+        self.lock = threading.Lock()
+
+        # 載具最新狀態與版本號
+        self._states: Dict[str, Dict[str, Any]] = {}
+        self._versions: Dict[str, int] = {}
+
+        # 推送群組（以 (模式, 間隔週期數, 編碼格式) 為鍵）與客戶端所屬群組、編碼格式
+        self._groups: Dict[Tuple[str, int, str], BroadcastGroup] = {}
+        self._client_groups: Dict[str, BroadcastGroup] = {}
+        self._client_encodings: Dict[str, str] = {}
+
+        # 統計
+        self.ticks = 0
+        self.emits = 0
+        self.running = False
+
+        logger.info(f"遙測廣播排程器初始化完成 (頻率: {self.rate_hz}Hz)")
+
+    # ------------------------------------------------------------
+    # 數據來源
+    # ------------------------------------------------------------
+
+    def publish(self, vehicle_id: str, state: Dict[str, Any]) -> None:
+        """登記載具最新狀態（不立即推送，由下一個排程週期合併發送）"""
+        with self.lock:
+            self._states[vehicle_id] = state
+            self._versions[vehicle_id] = self._versions.get(vehicle_id, 0) + 1
+
+    # ------------------------------------------------------------
+    # 客戶端訂閱
+    # ------------------------------------------------------------
+
+    def add_client(self, sid: str, encoding: str = 'json') -> Tuple[str, str]:
+        """
+        新客戶端連線，預設加入舊版群組
+
+        參數:
+            sid: Socket.IO 客戶端ID
+            encoding: 客戶端要求的編碼格式，不可用時退回 json
+
+        返回:
+            Tuple[str, str]: (應加入的房間, 實際使用的編碼格式)
+        """
+        if encoding not in available_encodings():
+            logger.warning(f"客戶端要求的編碼格式不可用: {encoding}，改用 json")
+            encoding = 'json'
+
+        with self.lock:
+            self._detach(sid)
+            self._client_encodings[sid] = encoding
+            group = self._attach(sid, 'legacy', 1, encoding)
+        return group.room, encoding
+
+    def subscribe(self, sid: str, mode: str, rate_hz: Optional[float] = None,
+                  encoding: Optional[str] = None) -> Tuple[Optional[str], str, float]:
+        """
+        客戶端選擇推送模式與頻率
+
+        參數:
+            sid: Socket.IO 客戶端ID
+            mode: 'full' 或 'delta'
+            rate_hz: 推送頻率，省略或超過排程頻率時使用排程頻率
+            encoding: 編碼格式，省略時沿用連線時協商的格式
+
+        返回:
+            Tuple[Optional[str], str, float]: (應離開的房間, 應加入的房間, 實際推送頻率)
+        """
+        if mode not in STREAM_MODES:
+            raise ValueError(f"不支援的推送模式: {mode}")
+
+        encoding = encoding or self._client_encodings.get(sid, 'json')
+        if encoding not in available_encodings():
+            raise ValueError(f"不支援的編碼格式: {encoding}")
+        if encoding == 'struct' and mode == 'delta':
+            raise ValueError("struct 編碼不支援增量模式")
+
+        rate = self.rate_hz if not rate_hz or rate_hz <= 0 else min(float(rate_hz), self.rate_hz)
+        interval_ticks = max(1, round(self.rate_hz / rate))
+
+        with self.lock:
+            old_group = self._detach(sid)
+            self._client_encodings[sid] = encoding
+            group = self._attach(sid, mode, interval_ticks, encoding)
+
+        old_room = old_group.room if old_group and old_group is not group else None
+        return old_room, group.room, self.rate_hz / interval_ticks
+
+    def remove_client(self, sid: str) -> None:
+        """客戶端斷線"""
+        with self.lock:
+            self._detach(sid)
+            self._client_encodings.pop(sid, None)
+
+    def _attach(self, sid: str, mode: str, interval_ticks: int, encoding: str) -> BroadcastGroup:
+        """把客戶端加入群組（需持有鎖），群組不存在時建立"""
+        key = (mode, interval_ticks, encoding)
+        group = self._groups.get(key)
+        if group is None:
+            if key == ('legacy', 1, 'json'):
+                room = self.LEGACY_ROOM
+            elif mode == 'legacy':
+                room = f"telemetry_legacy_{encoding}"
+            else:
+                room = f"telemetry_{mode}_{interval_ticks}_{encoding}"
+            group = BroadcastGroup(mode, interval_ticks, encoding, room, self.keyframe_interval)
+            self._groups[key] = group
+        group.clients.add(sid)
+        self._client_groups[sid] = group
+        return group
+
+    def _detach(self, sid: str) -> Optional[BroadcastGroup]:
+        """把客戶端移出目前的群組（需持有鎖），空群組一併移除"""
+        group = self._client_groups.pop(sid, None)
+        if group is None:
+            return None
+        group.clients.discard(sid)
+        if not group.clients:
+            self._groups.pop(group.key, None)
+        return group
+
+    def resync(self, sid: str, vehicle_id: Optional[str] = None) -> None:
+        """增量模式的客戶端請求重新同步：以批次幀送出目前序號的關鍵幀"""
+        with self.lock:
+            group = self._client_groups.get(sid)
+            if group is None or group.mode != 'delta':
+                return
+
+            vehicle_ids = [vehicle_id] if vehicle_id in self._states else list(self._states.keys())
+            frames = []
+            for vid in vehicle_ids:
+                frame = group.encoder(vid).keyframe()
+                if frame is None:
+                    # 群組尚未推送過此載具，下一幀直接送出關鍵幀
+                    group.encoder(vid).request_keyframe()
+                    continue
+                frames.append(frame)
+
+        if frames:
+            payload = encode_payload(group.encoding, self._batch('delta', frames))
+            self.socketio.emit('telemetry_batch', payload, to=sid)
+
+    # ------------------------------------------------------------
+    # 排程
+    # ------------------------------------------------------------
+
+    def _batch(self, mode: str, frames: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            'mode': mode,
+            'timestamp': time.time(),
+            'frames': frames
+        }
+
+    def _changed_vehicles(self, group: BroadcastGroup) -> List[str]:
+        """找出群組上次推送後有更新的載具（需持有鎖），並記錄本次推送的版本"""
+        changed = []
+        for vehicle_id, version in self._versions.items():
+            if group.sent_versions.get(vehicle_id) != version:
+                group.sent_versions[vehicle_id] = version
+                changed.append(vehicle_id)
+        return changed
+
+    def tick(self) -> int:
+        """
+        執行一個排程週期
+
+        返回:
+            int: 本週期發送的事件數
+        """
+        self.ticks += 1
+        outgoing = []
+
+        with self.lock:
+            for group in self._groups.values():
+                if self.ticks % group.interval_ticks:
+                    continue
+                changed = self._changed_vehicles(group)
+                if not changed:
+                    continue
+
+                if group.mode == 'legacy':
+                    # 舊版客戶端：每個有更新的載具一個 telemetry_data 事件
+                    for vid in changed:
+                        state = self._states[vid]
+                        payload = {'vehicleId': vid, 'state': state}
+                        outgoing.append(('telemetry_data',
+                                         encode_payload(group.encoding, payload, [(vid, state)]),
+                                         group.room))
+                    continue
+
+                # 訂閱客戶端：每個到期的群組一個 telemetry_batch 批次幀
+                if group.mode == 'delta':
+                    frames = [group.encoder(vid).encode(self._states[vid]) for vid in changed]
+                else:
+                    frames = [{'vehicleId': vid, 'state': self._states[vid]} for vid in changed]
+                payload = self._batch(group.mode, frames)
+                states = [(vid, self._states[vid]) for vid in changed]
+                outgoing.append(('telemetry_batch',
+                                 encode_payload(group.encoding, payload, states),
+                                 group.room))
+
+        for event, payload, room in outgoing:
+            self.socketio.emit(event, payload, to=room)
+
+        self.emits += len(outgoing)
+        return len(outgoing)
+
+    def run(self) -> None:
+        """排程主循環（以 socketio.start_background_task 啟動）"""
+        self.running = True
+        period = 1.0 / self.rate_hz
+        next_tick = time.time()
+        logger.info(f"遙測廣播排程器啟動 ({self.rate_hz}Hz)")
+
+        while self.running:
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"遙測廣播錯誤: {e}")
+
+            # 以固定時間點排程，避免推送耗時累積成頻率漂移
+            next_tick += period
+            delay = next_tick - time.time()
+            if delay < 0:
+                # 落後超過一個週期時重新對齊，不補發錯過的週期
+                next_tick = time.time()
+                delay = 0
+            self.socketio.sleep(delay)
+
+    def stop(self) -> None:
+        """停止排程主循環"""
+        self.running = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取排程器統計資訊"""
+        with self.lock:
+            groups = [{
+                'mode': group.mode,
+                'rateHz': self.rate_hz / group.interval_ticks,
+                'encoding': group.encoding,
+                'clients': len(group.clients)
+            } for group in self._groups.values()]
+
+        return {
+            'rateHz': self.rate_hz,
+            'ticks': self.ticks,
+            'emits': self.emits,
+            'encodings': list(available_encodings()),
+            'groups': groups
+        }
@@ -0,0 +1,173 @@
+"""
+遙測二進位編碼模組 - Socket.IO 遙測幀的序列化格式
+- json: 預設格式，直接傳送字典（由 Socket.IO 轉為 JSON 文字）
+- msgpack: MessagePack 二進位（需安裝 msgpack，結構與 JSON 完全相同）
+- struct: 固定長度的打包格式（參考 protocol_test_example.py 的 Attitude/GPS 格式），
+  只包含數值遙測欄位，編碼最快、體積最小
+"""
+import time
+import struct
+import logging
+from typing import Optional, Dict, Any, List, Tuple
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# 設定日誌
+logger = logging.getLogger(__name__)
+
+# 支援的編碼格式
+TELEMETRY_ENCODINGS = ('json', 'msgpack', 'struct')
+
+# struct 格式版本
+STRUCT_VERSION = 1
+
+# 幀頭：版本、保留、記錄數量、時間戳
+FRAME_HEADER = struct.Struct('<BBHd')
+
+# 載具狀態記錄：
+#   vehicleId(8s) mode(16s) timestamp(d)
+#   flags(B: bit0 armed, bit1 dataStale, bit2 charging) gps.fix(B) gps.satellites(B) battery.percent(B)
+#   gps.hdop battery.voltage battery.remainingMin(f)
+#   position.lat position.lon(d)
+#   position.altitude attitude.rollDeg/pitchDeg/yawDeg rc.throttle/roll/pitch/yaw
+#   motion.groundSpeed/verticalSpeed(f)
+STATE_RECORD = struct.Struct('<8s16sdBBBBfffdd' + 'f' * 10)
+
+FLAG_ARMED = 0x01
+FLAG_DATA_STALE = 0x02
+FLAG_CHARGING = 0x04
+
+# 單精度浮點欄位（依記錄中的順序）
+_HEADER_FLOATS = (('gps', 'hdop'), ('battery', 'voltage'), ('battery', 'remainingMin'))
+_TAIL_FLOATS = (
+    ('position', 'altitude'),
+    ('attitude', 'rollDeg'), ('attitude', 'pitchDeg'), ('attitude', 'yawDeg'),
+    ('rc', 'throttle'), ('rc', 'roll'), ('rc', 'pitch'), ('rc', 'yaw'),
+    ('motion', 'groundSpeed'), ('motion', 'verticalSpeed')
+)
+
+def available_encodings() -> Tuple[str, ...]:
+    """獲取目前環境可用的編碼格式"""
+    return tuple(name for name in TELEMETRY_ENCODINGS if name != 'msgpack' or msgpack is not None)
+
+def _number(state: Dict[str, Any], section: str, key: str) -> float:
+    """讀取數值欄位，缺少或為None時以NaN表示"""
+    value = state.get(section, {}).get(key)
+    return float('nan') if value is None else float(value)
+
+def _byte(value: Any) -> int:
+    """轉為 0-255 的整數"""
+    try:
+        return min(max(int(round(value)), 0), 255)
+    except (TypeError, ValueError):
+        return 0
+
+def pack_state(vehicle_id: str, state: Dict[str, Any]) -> bytes:
+    """把載具狀態打包為固定長度的記錄"""
+    battery = state.get('battery', {})
+    gps = state.get('gps', {})
+    position = state.get('position', {})
+
+    flags = 0
+    if state.get('armed'):
+        flags |= FLAG_ARMED
+    if state.get('dataStale'):
+        flags |= FLAG_DATA_STALE
+    if battery.get('charging'):
+        flags |= FLAG_CHARGING
+
+    return STATE_RECORD.pack(
+        vehicle_id.encode('ascii', 'replace')[:8],
+        str(state.get('mode', '')).encode('ascii', 'replace')[:16],
+        float(state.get('timestamp') or 0.0),
+        flags,
+        _byte(gps.get('fix')),
+        _byte(gps.get('satellites')),
+        _byte(battery.get('percent')),
+        *(_number(state, section, key) for section, key in _HEADER_FLOATS),
+        float(position.get('lat') or 0.0),
+        float(position.get('lon') or 0.0),
+        *(_number(state, section, key) for section, key in _TAIL_FLOATS)
+    )
+
+def pack_states(states: List[Tuple[str, Dict[str, Any]]], timestamp: Optional[float] = None) -> bytes:
+    """
+    把多個載具狀態打包為一個 struct 幀
+
+    參數:
+        states: [(載具ID, 狀態字典), ...]
+        timestamp: 幀時間戳，省略時使用目前時間
+
+    返回:
+        bytes: 幀頭 + 記錄
+    """
+    header = FRAME_HEADER.pack(STRUCT_VERSION, 0, len(states),
+                               time.time() if timestamp is None else timestamp)
+    return header + b''.join(pack_state(vehicle_id, state) for vehicle_id, state in states)
+
+def unpack_states(data: bytes) -> Tuple[float, List[Dict[str, Any]]]:
+    """
+    解析 struct 幀（供 Python 客戶端與測試工具使用）
+
+    返回:
+        Tuple[float, List[Dict]]: (幀時間戳, 載具狀態列表)
+    """
+    version, _, count, timestamp = FRAME_HEADER.unpack_from(data, 0)
+    if version != STRUCT_VERSION:
+        raise ValueError(f"不支援的 struct 格式版本: {version}")
+
+    expected = FRAME_HEADER.size + count * STATE_RECORD.size
+    if len(data) < expected:
+        raise ValueError(f"幀長度不足: {len(data)} < {expected}")
+
+    states = []
+    for i in range(count):
+        values = STATE_RECORD.unpack_from(data, FRAME_HEADER.size + i * STATE_RECORD.size)
+        vehicle_id, mode, state_ts, flags, fix, satellites, percent = values[:7]
+        header_floats = values[7:10]
+        lat, lon = values[10:12]
+        tail_floats = values[12:]
+
+        state: Dict[str, Any] = {
+            'vehicleId': vehicle_id.rstrip(b'\x00').decode('ascii'),
+            'mode': mode.rstrip(b'\x00').decode('ascii'),
+            'timestamp': state_ts,
+            'armed': bool(flags & FLAG_ARMED),
+            'dataStale': bool(flags & FLAG_DATA_STALE),
+            'gps': {'fix': fix, 'satellites': satellites},
+            'battery': {'percent': percent, 'charging': bool(flags & FLAG_CHARGING)},
+            'position': {'lat': lat, 'lon': lon}
+        }
+        for (section, key), value in zip(_HEADER_FLOATS + _TAIL_FLOATS, header_floats + tail_floats):
+            state.setdefault(section, {})[key] = value
+        states.append(state)
+
+    return timestamp, states
+
+def encode_payload(encoding: str, payload: Dict[str, Any],
+                   states: Optional[List[Tuple[str, Dict[str, Any]]]] = None) -> Any:
+    """
+    依編碼格式序列化一個遙測事件
+
+    參數:
+        encoding: 編碼格式
+        payload: 事件內容（json/msgpack 使用）
+        states: [(載具ID, 狀態字典), ...]（struct 使用）
+
+    返回:
+        json 為原字典，msgpack/struct 為 bytes（Socket.IO 以二進位附件傳送）
+    """
+    if encoding == 'json':
+        return payload
+    if encoding == 'msgpack':
+        if msgpack is None:
+            raise ValueError("msgpack 未安裝")
+        return msgpack.packb(payload, use_bin_type=True)
+    if encoding == 'struct':
+        if states is None:
+            raise ValueError("struct 編碼需要載具狀態列表")
+        return pack_states(states, payload.get('timestamp'))
+    raise ValueError(f"不支援的編碼格式: {encoding}")
@@ -0,0 +1,128 @@
+"""
+遙測增量編碼模組 - 只推送變化的葉節點欄位
+載具狀態字典被攤平為「路徑 → 值」的形式，每幀只送出與上一幀不同的欄位與序號，
+並定期送出完整關鍵幀；客戶端發現序號不連續時可請求重新同步
+"""
+import threading
+import logging
+from typing import Optional, Dict, Any, List
+
+# 導入配置
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+
+# 設定日誌
+logger = logging.getLogger(__name__)
+
+# 攤平後路徑的分隔符（例如 'attitude.rollDeg'）
+PATH_SEPARATOR = '.'
+
+def flatten_state(state: Dict[str, Any], prefix: str = '') -> Dict[str, Any]:
+    """
+    把巢狀狀態字典攤平為 {路徑: 葉節點值}
+
+    列表視為葉節點整體比較，不再往下展開
+    """
+    flat = {}
+    for key, value in state.items():
+        path = f"{prefix}{PATH_SEPARATOR}{key}" if prefix else key
+        if isinstance(value, dict) and value:
+            flat.update(flatten_state(value, path))
+        else:
+            flat[path] = value
+    return flat
+
+def unflatten_state(flat: Dict[str, Any]) -> Dict[str, Any]:
+    """把 {路徑: 葉節點值} 還原為巢狀狀態字典"""
+    state: Dict[str, Any] = {}
+    for path, value in flat.items():
+        keys = path.split(PATH_SEPARATOR)
+        node = state
+        for key in keys[:-1]:
+            node = node.setdefault(key, {})
+        node[keys[-1]] = value
+    return state
+
+class DeltaEncoder:
+    """
+    單一載具的遙測增量編碼器
+    所有增量模式的客戶端共享同一份編碼結果，每幀只需比較與編碼一次
+    """
+
+    def __init__(self, vehicle_id: str, keyframe_interval: Optional[int] = None):
+        """
+        初始化增量編碼器
+
+        參數:
+            vehicle_id: 載具ID
+            keyframe_interval: 每隔多少幀送出一次完整關鍵幀
+        """
+        self.vehicle_id = vehicle_id
+        self.keyframe_interval = keyframe_interval or config.TELEMETRY_KEYFRAME_INTERVAL
+        self.lock = threading.Lock()
+
+        # 序號與上一幀的攤平狀態（增量的比較基準）
+        self.seq = 0
+        self._last_flat: Optional[Dict[str, Any]] = None
+        self._force_keyframe = False
+
+    def request_keyframe(self) -> None:
+        """要求下一幀送出完整關鍵幀"""
+        self._force_keyframe = True
+
+    def encode(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        編碼一幀遙測數據
+
+        參數:
+            state: 載具完整狀態字典
+
+        返回:
+            Dict: 關鍵幀 {'vehicleId', 'seq', 'keyframe': True, 'state'}
+                  或增量幀 {'vehicleId', 'seq', 'keyframe': False, 'changes', 'removed'}
+        """
+        flat = flatten_state(state)
+
+        with self.lock:
+            self.seq += 1
+            last = self._last_flat
+            self._last_flat = flat
+
+            if (last is None or self._force_keyframe or
+                    self.seq % self.keyframe_interval == 0):
+                self._force_keyframe = False
+                return self._keyframe(flat)
+
+            changes = {path: value for path, value in flat.items()
+                       if path not in last or last[path] != value}
+            removed: List[str] = [path for path in last if path not in flat]
+
+            return {
+                'vehicleId': self.vehicle_id,
+                'seq': self.seq,
+                'keyframe': False,
+                'changes': changes,
+                'removed': removed
+            }
+
+    def keyframe(self) -> Optional[Dict[str, Any]]:
+        """
+        獲取目前序號的完整關鍵幀（用於客戶端重新同步，不推進序號）
+
+        返回:
+            Dict: 關鍵幀，尚未編碼過任何狀態時返回None
+        """
+        with self.lock:
+            if self._last_flat is None:
+                return None
+            return self._keyframe(self._last_flat)
+
+    def _keyframe(self, flat: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'vehicleId': self.vehicle_id,
+            'seq': self.seq,
+            'keyframe': True,
+            'state': unflatten_state(flat)
+        }
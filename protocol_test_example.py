@@ -12,261 +12,21 @@
     python protocol_test_example.py
 """
 
-import struct
-import time
+import os
+import sys
 import math
-from enum import IntEnum
-from typing import Optional, Tuple
-
-# ============================================================
-# 數據類型定義
-# ============================================================
-
-class DataType(IntEnum):
-    """數據類型ID枚舉"""
-    # 載具 → 中控
-    HEARTBEAT = 0x0101
-    ATTITUDE = 0x0102
-    MOTION = 0x0103
-    GPS = 0x0104
-    BATTERY = 0x0201
-    
-    # 中控 → 載具
-    GCS_HEARTBEAT = 0x1001
-    ARM_COMMAND = 0x1002
-    SET_MODE = 0x1003
-    RC_OVERRIDE = 0x1005
-    SET_WAYPOINT = 0x1101
-
-class DeviceID(IntEnum):
-    """設備ID枚舉"""
-    GCS = 0x01      # 中控
-    UAV = 0x02      # 無人機
-    UGV = 0x03      # 無人車
-    BROADCAST = 0xFF # 廣播
-
-# ============================================================
-# 數據包編碼/解碼器
-# ============================================================
-
-class PacketCodec:
-    """數據包編碼解碼器"""
-    
-    HEADER_BYTE = 0xFF
-    FOOTER_BYTE = 0xFE
-    VERSION = 0x01
-    
-    @staticmethod
-    def crc16_ccitt(data: bytes) -> int:
-        """計算CRC16-CCITT校驗碼"""
-        crc = 0xFFFF
-        for byte in data:
-            crc ^= byte << 8
-            for _ in range(8):
-                if crc & 0x8000:
-                    crc = (crc << 1) ^ 0x1021
-                else:
-                    crc = crc << 1
-                crc &= 0xFFFF
-        return crc
-    
-    @staticmethod
-    def encode(source: DeviceID, target: DeviceID, data_type: DataType, 
-               payload: bytes) -> bytes:
-        """編碼數據包"""
-        # 構建包頭（不含起始標識）
-        header = struct.pack('<BBBBHH',
-            PacketCodec.VERSION,  # 版本
-            source,               # 來源
-            target,               # 目標
-            data_type & 0xFF,     # 數據類型低字節
-            data_type >> 8,       # 數據類型高字節
-            len(payload)          # 數據長度
-        )
-        
-        # 計算CRC（從版本到數據載荷）
-        crc_data = header + payload
-        crc = PacketCodec.crc16_ccitt(crc_data)
-        
-        # 組裝完整數據包
-        packet = struct.pack('B', PacketCodec.HEADER_BYTE)  # 起始
-        packet += crc_data                                    # 包頭+載荷
-        packet += struct.pack('<H', crc)                     # CRC
-        packet += struct.pack('B', PacketCodec.FOOTER_BYTE)  # 結束
-        
-        return packet
-    
-    @staticmethod
-    def decode(packet: bytes) -> Optional[Tuple[DeviceID, DeviceID, DataType, bytes]]:
-        """解碼數據包"""
-        if len(packet) < 11:  # 最小包長
-            return None
-            
-        # 檢查起始和結束標識
-        if packet[0] != PacketCodec.HEADER_BYTE or packet[-1] != PacketCodec.FOOTER_BYTE:
-            return None
-        
-        # 解析包頭
-        version, source, target, type_low, type_high, length = struct.unpack(
-            '<BBBBHH', packet[1:9]
-        )
-        
-        if version != PacketCodec.VERSION:
-            return None
-        
-        data_type = (type_high << 8) | type_low
-        
-        # 提取載荷
-        payload = packet[9:9+length]
-        
-        # 驗證CRC
-        crc_expected = struct.unpack('<H', packet[9+length:11+length])[0]
-        crc_actual = PacketCodec.crc16_ccitt(packet[1:9+length])
-        
-        if crc_expected != crc_actual:
-            print(f"❌ CRC校驗失敗: 期望 0x{crc_expected:04X}, 實際 0x{crc_actual:04X}")
-            return None
-        
-        return (DeviceID(source), DeviceID(target), DataType(data_type), payload)
-
-# ============================================================
-# 數據結構定義
-# ============================================================
-
-class Heartbeat:
-    """心跳包數據結構"""
-    FORMAT = '<IBBBB'
-    SIZE = 8
-    
-    def __init__(self, timestamp: int, armed: bool, mode: int, 
-                 system_status: int, online: bool):
-        self.timestamp = timestamp
-        self.armed = armed
-        self.mode = mode
-        self.system_status = system_status
-        self.online = online
-    
-    def encode(self) -> bytes:
-        return struct.pack(self.FORMAT, 
-            self.timestamp,
-            1 if self.armed else 0,
-            self.mode,
-            self.system_status,
-            1 if self.online else 0
-        )
-    
-    @classmethod
-    def decode(cls, data: bytes):
-        timestamp, armed, mode, status, online = struct.unpack(cls.FORMAT, data)
-        return cls(timestamp, bool(armed), mode, status, bool(online))
-    
-    def __str__(self):
-        mode_names = {0: 'MANUAL', 2: 'GUIDED', 3: 'AUTO', 5: 'RTL'}
-        status_names = {0: '待機', 1: '運行中', 2: '執行任務', 3: '錯誤'}
-        return (f"心跳包: 武裝={'是' if self.armed else '否'}, "
-                f"模式={mode_names.get(self.mode, f'0x{self.mode:02X}')}, "
-                f"狀態={status_names.get(self.system_status, '未知')}")
-
-class Attitude:
-    """姿態數據結構"""
-    FORMAT = '<Iffffff'
-    SIZE = 28
-    
-    def __init__(self, timestamp: int, roll: float, pitch: float, yaw: float,
-                 roll_speed: float, pitch_speed: float, yaw_speed: float):
-        self.timestamp = timestamp
-        self.roll = roll
-        self.pitch = pitch
-        self.yaw = yaw
-        self.roll_speed = roll_speed
-        self.pitch_speed = pitch_speed
-        self.yaw_speed = yaw_speed
-    
-    def encode(self) -> bytes:
-        return struct.pack(self.FORMAT,
-            self.timestamp, self.roll, self.pitch, self.yaw,
-            self.roll_speed, self.pitch_speed, self.yaw_speed
-        )
-    
-    @classmethod
-    def decode(cls, data: bytes):
-        values = struct.unpack(cls.FORMAT, data)
-        return cls(*values)
-    
-    def __str__(self):
-        return (f"姿態: Roll={math.degrees(self.roll):.1f}°, "
-                f"Pitch={math.degrees(self.pitch):.1f}°, "
-                f"Yaw={math.degrees(self.yaw):.1f}°")
+import time
+from pathlib import Path
 
-class GPS:
-    """GPS數據結構"""
-    FORMAT = '<IddffBBH'
-    SIZE = 28
-    
-    def __init__(self, timestamp: int, latitude: float, longitude: float,
-                 altitude: float, fix_type: int, satellites: int, hdop: int):
-        self.timestamp = timestamp
-        self.latitude = latitude
-        self.longitude = longitude
-        self.altitude = altitude
-        self.fix_type = fix_type
-        self.satellites = satellites
-        self.hdop = hdop
-    
-    def encode(self) -> bytes:
-        return struct.pack(self.FORMAT,
-            self.timestamp, self.latitude, self.longitude, self.altitude,
-            self.fix_type, self.satellites, self.hdop
-        )
-    
-    @classmethod
-    def decode(cls, data: bytes):
-        values = struct.unpack(cls.FORMAT, data)
-        return cls(*values)
-    
-    def __str__(self):
-        fix_names = {0: '無GPS', 1: '無定位', 2: '2D', 3: '3D', 4: 'DGPS', 5: 'RTK浮點', 6: 'RTK固定'}
-        return (f"GPS: {self.latitude:.6f}°N, {self.longitude:.6f}°E, "
-                f"高度={self.altitude:.1f}m, "
-                f"定位={fix_names.get(self.fix_type, '未知')}, "
-                f"衛星={self.satellites}顆")
+# 協議實現位於 program/protocol_module（與中控程式共用）
+sys.path.insert(0, str(Path(__file__).parent / 'program'))
 
-class SetWaypoint:
-    """設定航點命令"""
-    FORMAT = '<IHHddfffIB3x'
-    SIZE = 36
-    
-    def __init__(self, timestamp: int, waypoint_id: int, waypoint_count: int,
-                 latitude: float, longitude: float, altitude: float,
-                 speed: float, hold_time: int, action: int):
-        self.timestamp = timestamp
-        self.waypoint_id = waypoint_id
-        self.waypoint_count = waypoint_count
-        self.latitude = latitude
-        self.longitude = longitude
-        self.altitude = altitude
-        self.speed = speed
-        self.hold_time = hold_time
-        self.action = action
-    
-    def encode(self) -> bytes:
-        return struct.pack(self.FORMAT,
-            self.timestamp, self.waypoint_id, self.waypoint_count,
-            self.latitude, self.longitude, self.altitude,
-            self.speed, self.hold_time, self.action
-        )
-    
-    @classmethod
-    def decode(cls, data: bytes):
-        values = struct.unpack(cls.FORMAT, data)
-        return cls(*values[:9])
-    
-    def __str__(self):
-        action_names = {0: '經過', 1: '停留', 2: '拍照', 3: '降落'}
-        return (f"航點 {self.waypoint_id+1}/{self.waypoint_count}: "
-                f"{self.latitude:.6f}°N, {self.longitude:.6f}°E, "
-                f"高度={self.altitude}m, "
-                f"動作={action_names.get(self.action, '未知')}")
+from protocol_module import (
+    DataType, DeviceID, PacketCodec,
+    Heartbeat, Attitude, GPS, SetWaypoint,
+    boot_timestamp_ms, crc16_ccitt, crc16_ccitt_bitwise, crc16_ccitt_batch,
+    StreamDecoder
+)
 
 # ============================================================
 # 測試函數
@@ -307,7 +67,7 @@ def test_heartbeat():
     
     # 創建心跳數據
     heartbeat = Heartbeat(
-        timestamp=int(time.time() * 1000),
+        timestamp=boot_timestamp_ms(),
         armed=True,
         mode=2,  # GUIDED
         system_status=1,  # 運行中
@@ -344,7 +104,7 @@ def test_attitude():
     
     # 創建姿態數據
     attitude = Attitude(
-        timestamp=int(time.time() * 1000),
+        timestamp=boot_timestamp_ms(),
         roll=math.radians(-5.2),   # -5.2度
         pitch=math.radians(3.1),   # 3.1度
         yaw=math.radians(180.0),   # 180度
@@ -383,7 +143,7 @@ def test_gps():
     
     # 創建GPS數據（台中某處）
     gps = GPS(
-        timestamp=int(time.time() * 1000),
+        timestamp=boot_timestamp_ms(),
         latitude=24.163162,
         longitude=120.646854,
         altitude=150.5,
@@ -422,7 +182,7 @@ def test_waypoint():
     
     # 創建航點命令
     waypoint = SetWaypoint(
-        timestamp=int(time.time() * 1000),
+        timestamp=boot_timestamp_ms(),
         waypoint_id=0,
         waypoint_count=5,
         latitude=24.163162,
@@ -470,7 +230,7 @@ def test_error_handling():
     # 測試2: CRC錯誤
     print("\n測試 5.2: CRC校驗錯誤")
     heartbeat = Heartbeat(
-        timestamp=int(time.time() * 1000),
+        timestamp=boot_timestamp_ms(),
         armed=True, mode=2, system_status=1, online=True
     )
     payload = heartbeat.encode()
@@ -491,6 +251,68 @@ def test_error_handling():
     result = PacketCodec.decode(short_packet)
     print(f"結果: {'❌ 正確拒絕' if result is None else '⚠️  應該拒絕但通過了'}")
 
+def test_crc_benchmark(count: int = 2000):
+    """測試CRC實現：逐位元參考實現 vs 查表 vs 批次，驗證結果一致並比較耗時"""
+    print("\n" + "="*60)
+    print("測試 6: CRC16-CCITT 效能比較")
+    print("="*60)
+
+    # 以隨機載荷模擬姿態數據包的 CRC 範圍（包頭 8 字節 + 載荷 28 字節）
+    buffers = [os.urandom(8 + Attitude.SIZE) for _ in range(count)]
+
+    def measure(func):
+        start = time.perf_counter()
+        result = func()
+        return result, (time.perf_counter() - start) * 1000.0
+
+    bitwise, bitwise_ms = measure(lambda: [crc16_ccitt_bitwise(b) for b in buffers])
+    table, table_ms = measure(lambda: [crc16_ccitt(b) for b in buffers])
+    batch, batch_ms = measure(lambda: crc16_ccitt_batch(buffers).tolist())
+
+    # 標準測試向量 "123456789" 的 CRC-16/CCITT-FALSE 為 0x29B1
+    vector_ok = crc16_ccitt(b'123456789') == crc16_ccitt_bitwise(b'123456789') == 0x29B1
+    identical = bitwise == table == batch
+
+    print(f"數據包數量: {count}（每包 {len(buffers[0])} 字節）")
+    print(f"  逐位元: {bitwise_ms:8.2f} ms")
+    print(f"  查表:   {table_ms:8.2f} ms  ({bitwise_ms / table_ms:.1f}x)")
+    print(f"  批次:   {batch_ms:8.2f} ms  ({bitwise_ms / batch_ms:.1f}x)")
+    print(f"結果: {'✅ 三種實現結果一致' if identical and vector_ok else '❌ 結果不一致'}")
+
+def test_stream_decoder():
+    """測試串流解析：半包、連續數據包、雜訊與損壞的數據包"""
+    print("\n" + "="*60)
+    print("測試 7: 串流解析 (StreamDecoder)")
+    print("="*60)
+
+    packets = [
+        PacketCodec.encode(DeviceID.UAV, DeviceID.GCS, DataType.ATTITUDE,
+                           Attitude(i, 0.01 * i, -0.02 * i, 0.5, 0.0, 0.0, 0.0).encode())
+        for i in range(10)
+    ]
+
+    # 組成一段夾雜雜訊與一個損壞數據包的字節流
+    corrupted = bytearray(packets[5])
+    corrupted[12] ^= 0xFF
+    stream = (b'\x00\x13\xFF\x42' + b''.join(packets[:5]) + bytes(corrupted) +
+              b'\xFE\xFF' + b''.join(packets[6:]))
+
+    # 以不規則大小的片段送入解析器（模擬串口/網路的任意切分）
+    decoder = StreamDecoder()
+    decoded = []
+    offset = 0
+    for size in (3, 17, 1, 40, 64, 5, 200, 1000):
+        for _, _, _, payload in decoder.feed(stream[offset:offset + size]):
+            decoded.append(Attitude.decode(payload).timestamp)
+        offset += size
+
+    stats = decoder.get_stats()
+    print(f"解碼的數據包: {decoded}")
+    print(f"統計: 丟棄 {stats['dropped_bytes']} 字節, 重新同步 {stats['resyncs']} 次, "
+          f"CRC錯誤 {stats['crc_errors']}, 格式錯誤 {stats['framing_errors']}")
+    expected = [i for i in range(10) if i != 5]
+    print(f"結果: {'✅ 正確解析並跳過損壞數據' if decoded == expected else '❌ 解析結果不符'}")
+
 def main():
     """主測試函數"""
     print("╔" + "="*58 + "╗")
@@ -504,6 +326,8 @@ def main():
     test_gps()
     test_waypoint()
     test_error_handling()
+    test_crc_benchmark()
+    test_stream_decoder()
     
     print("\n" + "="*60)
     print("測試完成!")